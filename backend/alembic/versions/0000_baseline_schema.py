@@ -0,0 +1,229 @@
+"""Baseline schema
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Основные таблицы в том виде, в каком они создавались через Base.metadata.create_all до перехода
+на миграции (индексы под горячие запросы добавляет 0001). Позволяет поднять пустую БД одной
+командой alembic upgrade head. Если таблица уже есть (БД поднималась create_all), она пропускается.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0000'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Объекты, созданные миграциями (а не найденные готовыми после create_all): downgrade удаляет только их
+CREATED_OBJECTS_TABLE = 'alembic_created_objects'
+
+ENUMS = {
+    'userrole': ('operator', 'admin', 'superadmin'),
+    'clientstatus': ('active', 'inactive', 'blocked'),
+    'locationstatus': ('active', 'inactive', 'under_construction'),
+    'stationstatus': ('active', 'inactive', 'maintenance'),
+    'maintenancestatus': ('pending', 'in_progress', 'completed', 'cancelled'),
+    'chargingsessionstatus': ('started', 'stopped', 'error'),
+    'limittype': ('none', 'energy', 'amount'),
+}
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _enum(name: str) -> sa.Enum:
+    # Тип создаётся явно в upgrade(), create_table его не трогает
+    return sa.Enum(*ENUMS[name], name=name, create_type=False)
+
+
+def _ensure_created_objects() -> None:
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS {CREATED_OBJECTS_TABLE} "
+        "(revision VARCHAR NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (revision, name))"
+    )
+
+
+def _mark_created(name: str) -> None:
+    op.execute(
+        sa.text(f"INSERT INTO {CREATED_OBJECTS_TABLE} (revision, name) VALUES (:revision, :name) ON CONFLICT DO NOTHING")
+        .bindparams(revision=revision, name=name)
+    )
+
+
+def _created_here() -> set[str]:
+    if not _has_table(CREATED_OBJECTS_TABLE):
+        return set()
+    rows = op.get_bind().execute(
+        sa.text(f"SELECT name FROM {CREATED_OBJECTS_TABLE} WHERE revision = :revision"), {'revision': revision}
+    )
+    return {name for name, in rows}
+
+
+def _timestamps() -> list[sa.Column]:
+    return [
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ]
+
+
+def _create_users() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('role', _enum('userrole'), nullable=False),
+        sa.Column('is_active', sa.Boolean()),
+        *_timestamps(),
+        sa.Column('admin_id', sa.String(), nullable=True),
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+
+def _create_clients() -> None:
+    op.create_table(
+        'clients',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('phone', sa.String()),
+        sa.Column('address', sa.String()),
+        sa.Column('contract_number', sa.String()),
+        sa.Column('contract_start_date', sa.Date()),
+        sa.Column('contract_end_date', sa.Date()),
+        sa.Column('status', _enum('clientstatus'), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        *_timestamps(),
+    )
+    op.create_index('ix_clients_email', 'clients', ['email'], unique=True)
+
+
+def _create_locations() -> None:
+    op.create_table(
+        'locations',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('address', sa.String(), nullable=False),
+        sa.Column('city', sa.String()),
+        sa.Column('region', sa.String()),
+        sa.Column('postal_code', sa.String()),
+        sa.Column('country', sa.String()),
+        sa.Column('latitude', sa.Float()),
+        sa.Column('longitude', sa.Float()),
+        sa.Column('client_id', sa.String()),
+        sa.Column('working_hours', sa.String()),
+        sa.Column('status', _enum('locationstatus'), nullable=False),
+        *_timestamps(),
+    )
+
+
+def _create_stations() -> None:
+    op.create_table(
+        'stations',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('serial_number', sa.String(), nullable=False, unique=True),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('manufacturer', sa.String(), nullable=False),
+        sa.Column('location_id', sa.String(), sa.ForeignKey('locations.id'), nullable=False),
+        sa.Column('power_capacity', sa.Float(), nullable=False),
+        sa.Column('connector_types', sa.ARRAY(sa.String()), nullable=False),
+        sa.Column('installation_date', sa.String()),
+        sa.Column('firmware_version', sa.String()),
+        sa.Column('status', _enum('stationstatus'), nullable=False),
+        sa.Column('admin_id', sa.String(), nullable=False),
+        *_timestamps(),
+    )
+
+
+def _create_maintenance() -> None:
+    op.create_table(
+        'maintenance',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('station_id', sa.String(), sa.ForeignKey('stations.id'), nullable=False),
+        sa.Column('request_date', sa.String()),
+        sa.Column('description', sa.String()),
+        sa.Column('assigned_to', sa.String()),
+        sa.Column('notes', sa.String()),
+        sa.Column('status', _enum('maintenancestatus'), nullable=False),
+        *_timestamps(),
+    )
+
+
+def _create_tariffs() -> None:
+    op.create_table(
+        'tariffs',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('station_id', sa.String(), sa.ForeignKey('stations.id'), nullable=False),
+        sa.Column('price_per_kwh', sa.Float(), nullable=False),
+        sa.Column('currency', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def _create_charging_sessions() -> None:
+    op.create_table(
+        'charging_sessions',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('user_id', sa.String(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('station_id', sa.String(), sa.ForeignKey('stations.id'), nullable=False),
+        sa.Column('start_time', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('stop_time', sa.DateTime(timezone=True)),
+        sa.Column('energy', sa.Float()),
+        sa.Column('amount', sa.Float()),
+        sa.Column('status', _enum('chargingsessionstatus'), nullable=False),
+        sa.Column('transaction_id', sa.String()),
+        sa.Column('limit_type', _enum('limittype'), nullable=False),
+        sa.Column('limit_value', sa.Float()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+# В порядке зависимостей по внешним ключам
+TABLES = [
+    ('users', _create_users),
+    ('clients', _create_clients),
+    ('locations', _create_locations),
+    ('stations', _create_stations),
+    ('maintenance', _create_maintenance),
+    ('tariffs', _create_tariffs),
+    ('charging_sessions', _create_charging_sessions),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    for name, values in ENUMS.items():
+        sa.Enum(*values, name=name).create(bind, checkfirst=True)
+
+    _ensure_created_objects()
+    for name, create in TABLES:
+        if not _has_table(name):
+            create()
+            _mark_created(name)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Таблицы, поднятые через create_all до перехода на миграции, не трогаем
+    created = _created_here()
+    for name, _ in reversed(TABLES):
+        if name in created and _has_table(name):
+            op.drop_table(name)
+    op.execute(
+        sa.text(f"DELETE FROM {CREATED_OBJECTS_TABLE} WHERE revision = :revision").bindparams(revision=revision)
+    )
+    if created >= {name for name, _ in TABLES}:
+        bind = op.get_bind()
+        for name, values in ENUMS.items():
+            sa.Enum(*values, name=name).drop(bind, checkfirst=True)
+    if not op.get_bind().execute(sa.text(f"SELECT EXISTS (SELECT 1 FROM {CREATED_OBJECTS_TABLE})")).scalar():
+        op.drop_table(CREATED_OBJECTS_TABLE)
@@ -0,0 +1,58 @@
+"""Indexes for hot query predicates
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-18 00:00:00
+
+Индексы под фильтры и keyset-пагинацию списков (станции, сессии, тарифы, обслуживание,
+локации, операторы) и частичный индекс активных сессий. Строятся CONCURRENTLY, чтобы
+не блокировать запись в рабочей БД; IF NOT EXISTS — для БД, где таблицы и часть индексов
+уже созданы через Base.metadata.create_all.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = '0000'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя, таблица, колонки, доп. параметры)
+HOT_INDEXES = [
+    ('ix_charging_sessions_stop_time', 'charging_sessions', ['stop_time'], {}),
+    ('ix_charging_sessions_created', 'charging_sessions', ['created_at', 'id'], {}),
+    ('ix_charging_sessions_user_created', 'charging_sessions', ['user_id', 'created_at', 'id'], {}),
+    ('ix_charging_sessions_station_created', 'charging_sessions', ['station_id', 'created_at', 'id'], {}),
+    ('ix_charging_sessions_station_start', 'charging_sessions', ['station_id', 'start_time'], {}),
+    ('ix_charging_sessions_active_station', 'charging_sessions', ['station_id'],
+     {'postgresql_where': sa.text("status = 'started'")}),
+    ('ix_tariffs_station_created', 'tariffs', ['station_id', 'created_at', 'id'], {}),
+    ('ix_stations_admin_created', 'stations', ['admin_id', 'created_at', 'id'], {}),
+    ('ix_stations_location_id', 'stations', ['location_id'], {}),
+    ('ix_stations_created', 'stations', ['created_at', 'id'], {}),
+    ('ix_maintenance_station_created', 'maintenance', ['station_id', 'created_at', 'id'], {}),
+    ('ix_maintenance_created', 'maintenance', ['created_at', 'id'], {}),
+    ('ix_locations_status_created', 'locations', ['status', 'created_at', 'id'], {}),
+    ('ix_locations_created', 'locations', ['created_at', 'id'], {}),
+    ('ix_users_role_admin_created', 'users', ['role', 'admin_id', 'created_at', 'id'], {}),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in HOT_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(HOT_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
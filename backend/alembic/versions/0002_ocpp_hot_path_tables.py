@@ -0,0 +1,137 @@
+"""Meter values, OCPP transactions and report rollup tables
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:01
+
+Таблицы, которые до перехода на миграции создавались через Base.metadata.create_all при старте.
+Если таблица уже есть (БД поднималась create_all), она пропускается — ревизия лишь фиксирует схему;
+созданное записывается в alembic_created_objects, и downgrade удаляет только это.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CREATED_OBJECTS_TABLE = 'alembic_created_objects'
+TABLES = ['meter_values', 'ocpp_transactions', 'report_rollups_hourly', 'report_rollups_daily']
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _has_sequence(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_sequence(name)
+
+
+def _mark_created(name: str) -> None:
+    # Таблица учёта создаётся в 0000; для БД, помеченных 0001 до её появления, — здесь
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS {CREATED_OBJECTS_TABLE} "
+        "(revision VARCHAR NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (revision, name))"
+    )
+    op.execute(
+        sa.text(f"INSERT INTO {CREATED_OBJECTS_TABLE} (revision, name) VALUES (:revision, :name) ON CONFLICT DO NOTHING")
+        .bindparams(revision=revision, name=name)
+    )
+
+
+def _created_here() -> set[str]:
+    if not _has_table(CREATED_OBJECTS_TABLE):
+        return set()
+    rows = op.get_bind().execute(
+        sa.text(f"SELECT name FROM {CREATED_OBJECTS_TABLE} WHERE revision = :revision"), {'revision': revision}
+    )
+    return {name for name, in rows}
+
+
+def _create_rollup_table(name: str) -> None:
+    op.create_table(
+        name,
+        sa.Column('station_id', sa.String(), primary_key=True),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), primary_key=True),
+        sa.Column('sessions', sa.Integer(), nullable=False),
+        sa.Column('energy', sa.Float(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(f'ix_{name}_bucket', name, ['bucket_start'])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_sequence('ocpp_transaction_id_seq'):
+        op.execute("CREATE SEQUENCE ocpp_transaction_id_seq START WITH 1 INCREMENT BY 100")
+        _mark_created('ocpp_transaction_id_seq')
+
+    if not _has_table('meter_values'):
+        op.create_table(
+            'meter_values',
+            sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+            sa.Column('station_id', sa.String(), nullable=False),
+            sa.Column('connector_id', sa.Integer(), nullable=False),
+            sa.Column('transaction_id', sa.Integer(), nullable=True),
+            sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('measurand', sa.String(), nullable=False),
+            sa.Column('value', sa.Float(), nullable=False),
+            sa.Column('unit', sa.String(), nullable=True),
+            sa.Column('phase', sa.String(), nullable=True),
+            sa.Column('context', sa.String(), nullable=True),
+            sa.Column('location', sa.String(), nullable=True),
+            sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index('ix_meter_values_station_timestamp', 'meter_values', ['station_id', 'timestamp'])
+        op.create_index('ix_meter_values_transaction_id', 'meter_values', ['transaction_id'])
+        _mark_created('meter_values')
+
+    if not _has_table('ocpp_transactions'):
+        op.create_table(
+            'ocpp_transactions',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+            sa.Column('station_id', sa.String(), nullable=False),
+            sa.Column('connector_id', sa.Integer(), nullable=False),
+            sa.Column('id_tag', sa.String(), nullable=False),
+            sa.Column('session_id', sa.String(), sa.ForeignKey('charging_sessions.id'), nullable=True),
+            sa.Column('meter_start', sa.Float(), nullable=False),
+            sa.Column('start_timestamp', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('meter_stop', sa.Float(), nullable=True),
+            sa.Column('stop_timestamp', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('stop_reason', sa.String(), nullable=True),
+            sa.Column('status', postgresql.ENUM(name='chargingsessionstatus', create_type=False), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.UniqueConstraint('station_id', 'connector_id', 'start_timestamp', name='uq_ocpp_transactions_start'),
+        )
+        op.create_index('ix_ocpp_transactions_station_start', 'ocpp_transactions', ['station_id', 'start_timestamp'])
+        _mark_created('ocpp_transactions')
+    op.create_index('ix_ocpp_transactions_start', 'ocpp_transactions', ['start_timestamp', 'id'], if_not_exists=True)
+
+    for name in ('report_rollups_hourly', 'report_rollups_daily'):
+        if not _has_table(name):
+            _create_rollup_table(name)
+            _mark_created(name)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Таблицы и последовательность, найденные готовыми (create_all, рабочие данные), не трогаем
+    created = _created_here()
+    for name in reversed(TABLES):
+        if name in created and _has_table(name):
+            op.drop_table(name)
+    if 'ocpp_transaction_id_seq' in created:
+        op.execute("DROP SEQUENCE IF EXISTS ocpp_transaction_id_seq")
+    if created:
+        op.execute(
+            sa.text(f"DELETE FROM {CREATED_OBJECTS_TABLE} WHERE revision = :revision").bindparams(revision=revision)
+        )
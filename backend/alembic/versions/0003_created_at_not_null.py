@@ -0,0 +1,46 @@
+"""created_at NOT NULL on paginated tables and tariffs
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:02
+
+Списки листаются keyset-курсором по (created_at, id): строка с NULL в created_at не проходит
+сравнение с курсором и пропадает со всех страниц, кроме первой. Активный тариф станции — последний
+по (created_at, id): NULL при сортировке DESC идёт первым и всегда выигрывал бы. Пустые значения
+заполняются (updated_at / start_time, иначе now(); тарифы — началом эпохи, чтобы тариф без даты
+не стал активным), затем колонка становится NOT NULL.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# таблица -> чем заполнить пустой created_at
+CREATED_AT_BACKFILL = {
+    'users': 'COALESCE(updated_at, now())',
+    'stations': 'COALESCE(updated_at, now())',
+    'maintenance': 'COALESCE(updated_at, now())',
+    'locations': 'COALESCE(updated_at, now())',
+    'charging_sessions': 'COALESCE(start_time, now())',
+    'tariffs': 'to_timestamp(0)',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, backfill in CREATED_AT_BACKFILL.items():
+        op.execute(f"UPDATE {name} SET created_at = {backfill} WHERE created_at IS NULL")
+        op.alter_column(name, 'created_at', nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in CREATED_AT_BACKFILL:
+        op.alter_column(name, 'created_at', nullable=True)
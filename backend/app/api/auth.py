@@ -1,22 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Path, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.user import UserOut, ChangePasswordRequest, ForgotPasswordRequest, ResetPasswordRequest, UserUpdate, UserCreateWithRole, UserCreate
 from app.schemas.auth import LoginRequest, LoginResponse, RefreshRequest, RefreshResponse
-from app.crud import users as crud_users
-from app.core.security import verify_password, create_access_token, decode_access_token
-from app.db.models.user import UserRole
+from app.crud import users_async as crud_users
+from app.core.security import verify_password_async, create_access_token, decode_access_token
+from app.db.models.user import User, UserRole
 from app.core.deps import get_current_user, require_role
 from datetime import timedelta
-from app.crud.users import create_user_with_role, create_operator, get_operators_by_admin, update_operator, delete_operator
+from app.crud.users_async import create_user_with_role, create_operator, get_operators_by_admin, update_operator, delete_operator
 from sqlalchemy import select
+from typing import Optional, Literal
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.post("/login", response_model=LoginResponse)
-async def login_user(login_in: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login_user(login_in: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     user = await crud_users.get_user_by_email(db, login_in.email)
-    if not user or not verify_password(login_in.password, user.hashed_password):
+    if not user or not await verify_password_async(login_in.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Неверный email или пароль")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Пользователь заблокирован")
@@ -42,7 +44,7 @@ async def logout():
 async def change_password(
     req: ChangePasswordRequest,
     user=Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     result = await crud_users.change_password(db, user.id, req.old_password, req.new_password)
     if result is None:
@@ -54,7 +56,7 @@ async def change_password(
 @router.post("/forgot-password", status_code=200)
 async def forgot_password(
     req: ForgotPasswordRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # TODO: Реализовать генерацию токена и отправку email
     user = await crud_users.get_user_by_email(db, req.email)
@@ -67,7 +69,7 @@ async def forgot_password(
 @router.post("/reset-password", status_code=200)
 async def reset_password(
     req: ResetPasswordRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # TODO: Реализовать сброс пароля по токену
     # result = await crud_users.reset_password(db, req.token, req.new_password)
@@ -79,7 +81,7 @@ async def reset_password(
 async def update_profile(
     update_in: UserUpdate,
     user=Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     updated = await crud_users.update_user(db, user.id, update_in)
     if not updated:
@@ -89,7 +91,7 @@ async def update_profile(
 @router.post("/register", response_model=UserOut, summary="Регистрация пользователя (только для superadmin)")
 async def register_user(
     user_in: UserCreateWithRole,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(require_role('superadmin'))
 ):
     db_user = await create_user_with_role(db, user_in)
@@ -101,7 +103,7 @@ async def register_user(
 @router.post("/operators", response_model=UserOut, summary="Создать оператора (только для admin)")
 async def create_operator_endpoint(
     user_in: UserCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_role('admin', 'superadmin'))
 ):
     # Только admin может создавать операторов для себя
@@ -119,22 +121,25 @@ async def create_operator_endpoint(
 
 @router.get("/operators", response_model=list[UserOut], summary="Список своих операторов (только для admin)")
 async def list_operators_endpoint(
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+    order: Literal["asc", "desc"] = Query("desc", description="Сортировка по created_at"),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_role('admin', 'superadmin'))
 ):
+    # superadmin видит всех операторов
     admin_id = current_user.id if current_user.role == UserRole.admin else None
-    if current_user.role == UserRole.admin:
-        return await get_operators_by_admin(db, admin_id=admin_id)
-    else:
-        # superadmin видит всех операторов
-        result = await db.execute(select(User).where(User.role == UserRole.operator))
-        return result.scalars().all()
+    operators, next_cursor = await get_operators_by_admin(db, admin_id=admin_id, limit=limit, cursor=cursor, order=order)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return operators
 
 @router.put("/operators/{operator_id}", response_model=UserOut, summary="Редактировать оператора (только для admin)")
 async def update_operator_endpoint(
     operator_id: str = Path(...),
     user_in: UserUpdate = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_role('admin', 'superadmin'))
 ):
     # Проверка, что оператор принадлежит этому admin
@@ -151,7 +156,7 @@ async def update_operator_endpoint(
 @router.delete("/operators/{operator_id}", status_code=204, summary="Удалить оператора (только для admin)")
 async def delete_operator_endpoint(
     operator_id: str = Path(...),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_role('admin', 'superadmin'))
 ):
     operator = await crud_users.get_user_by_id(db, operator_id)
@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.client import ClientCreate, ClientLogin, ClientOut, ClientChangePasswordRequest, ClientForgotPasswordRequest, ClientResetPasswordRequest, ClientUpdate
-from app.crud import clients as crud_clients
-from app.core.security import verify_password, create_access_token, decode_access_token
+from app.crud import clients_async as crud_clients
+from app.core.security import verify_password_async, create_access_token, decode_access_token
 from datetime import timedelta
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
 @router.post("/register", response_model=ClientOut)
-async def register_client(client_in: ClientCreate, db: AsyncSession = Depends(get_db)):
+async def register_client(client_in: ClientCreate, db: AsyncSession = Depends(get_async_db)):
     existing = await crud_clients.get_client_by_email(db, client_in.email)
     if existing:
         raise HTTPException(status_code=400, detail="Клиент с таким email уже существует")
@@ -19,9 +19,9 @@ async def register_client(client_in: ClientCreate, db: AsyncSession = Depends(ge
     return client
 
 @router.post("/login")
-async def login_client(login_in: ClientLogin, db: AsyncSession = Depends(get_db)):
+async def login_client(login_in: ClientLogin, db: AsyncSession = Depends(get_async_db)):
     client = await crud_clients.get_client_by_email(db, login_in.email)
-    if not client or not verify_password(login_in.password, client.hashed_password):
+    if not client or not await verify_password_async(login_in.password, client.hashed_password):
         raise HTTPException(status_code=401, detail="Неверный email или пароль")
     if client.status != "active":
         raise HTTPException(status_code=403, detail="Клиент неактивен или заблокирован")
@@ -29,7 +29,7 @@ async def login_client(login_in: ClientLogin, db: AsyncSession = Depends(get_db)
     return {"token": access_token, "client": {"id": client.id, "email": client.email, "name": client.name}}
 
 @router.get("/me", response_model=ClientOut)
-async def get_me_client(request: Request, db: AsyncSession = Depends(get_db)):
+async def get_me_client(request: Request, db: AsyncSession = Depends(get_async_db)):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Требуется авторизация клиента")
@@ -47,7 +47,7 @@ async def get_me_client(request: Request, db: AsyncSession = Depends(get_db)):
 async def change_client_password(
     req: ClientChangePasswordRequest,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Получаем клиента по токену
     auth_header = request.headers.get("Authorization")
@@ -68,7 +68,7 @@ async def change_client_password(
 @router.post("/forgot-password", status_code=200)
 async def forgot_client_password(
     req: ClientForgotPasswordRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     client = await crud_clients.get_client_by_email(db, req.email)
     if not client:
@@ -80,7 +80,7 @@ async def forgot_client_password(
 @router.post("/reset-password", status_code=200)
 async def reset_client_password(
     req: ClientResetPasswordRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # TODO: Реализовать сброс пароля по токену
     # result = await crud_clients.reset_client_password(db, req.token, req.new_password)
@@ -92,7 +92,7 @@ async def reset_client_password(
 async def update_client_profile(
     update_in: ClientUpdate,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Получаем клиента по токену
     auth_header = request.headers.get("Authorization")
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.startup import startup_state
+from app.db.pool import pool_stats
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/live")
+async def live():
+    # Процесс жив и принимает соединения — без обращения к БД
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    # 200 только после проверки схемы и прогрева пула/кэшей — балансировщик не шлёт трафик на холодный воркер
+    state = startup_state.as_dict()
+    return JSONResponse(status_code=200 if startup_state.ready else 503, content=state)
+
+@router.get("/pool")
+async def pool():
+    # Занятость пулов и время ожидания соединения — для подбора числа воркеров под лимит соединений БД
+    return pool_stats()
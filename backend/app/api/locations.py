@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Path
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.schemas.location import LocationCreate, LocationUpdate, Location
 from app.crud import locations as crud_locations
-from typing import List, Optional
+from typing import List, Optional, Literal
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.core.deps import get_current_user
 from pydantic import BaseModel
 
@@ -17,40 +18,106 @@ class LocationMapPoint(BaseModel):
     address: str
     status: str
 
+class NearestLocation(LocationMapPoint):
+    distance_km: float
+
+class MapMarker(BaseModel):
+    # count > 1 — кластер (центр масс точек), count == 1 — одна локация с id
+    latitude: float
+    longitude: float
+    count: int
+    id: Optional[str] = None
+
+def _map_point(point: crud_locations.LocationPoint) -> LocationMapPoint:
+    return LocationMapPoint(
+        id=point.id,
+        name=point.name,
+        latitude=point.latitude,
+        longitude=point.longitude,
+        address=point.address,
+        status=point.status
+    )
+
 @router.get("/public", response_model=List[LocationMapPoint], summary="Публичные локации для карты")
 def public_locations(
     city: Optional[str] = Query(None),
     region: Optional[str] = Query(None),
     country: Optional[str] = Query(None),
     status: Optional[str] = Query("active"),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90, description="Видимая область карты: южная граница"),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180, description="Западная граница"),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90, description="Северная граница"),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180, description="Восточная граница (меньше западной — через 180-й меридиан)"),
     db: Session = Depends(get_db)
 ):
-    locs = crud_locations.get_locations(
+    # С видимой областью — только её точки из пространственного индекса; без неё — все точки
+    bounds = (min_lat, min_lon, max_lat, max_lon)
+    if any(value is not None for value in bounds) and any(value is None for value in bounds):
+        raise HTTPException(status_code=400, detail="Нужны все границы: min_lat, min_lon, max_lat, max_lon")
+    if min_lat is not None and min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat больше max_lat")
+    points = crud_locations.get_map_locations(
         db,
         status=status,
         city=city,
         region=region,
-        country=country
+        country=country,
+        bbox=bounds if min_lat is not None else None
     )
+    return [_map_point(point) for point in points]
+
+@router.get(
+    "/public/tiles/{z}/{x}/{y}",
+    response_model=List[MapMarker],
+    response_model_exclude_none=True,
+    summary="Кластеры локаций в тайле карты z/x/y"
+)
+def location_tile(
+    z: int = Path(..., ge=0, le=crud_locations.LOCATION_TILE_MAX_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    status: Optional[str] = Query("active"),
+    db: Session = Depends(get_db)
+):
+    # Тайлы Web Mercator (как у слоёв OSM/Google); не больше LOCATION_TILE_GRID² маркеров на тайл
+    if x >= 1 << z or y >= 1 << z:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    return crud_locations.get_location_tile(db, z, x, y, status=status)
+
+@router.get("/public/nearest", response_model=List[NearestLocation], summary="Ближайшие к точке локации")
+def nearest_locations(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(10, ge=1, le=100),
+    radius_km: Optional[float] = Query(None, gt=0, le=1000, description="Искать только в этом радиусе"),
+    status: Optional[str] = Query("active"),
+    db: Session = Depends(get_db)
+):
+    nearest = crud_locations.get_nearest_locations(db, lat, lon, limit=limit, radius_km=radius_km, status=status)
     return [
-        LocationMapPoint(
-            id=l.id,
-            name=l.name,
-            latitude=l.latitude,
-            longitude=l.longitude,
-            address=l.address,
-            status=l.status.value if hasattr(l.status, 'value') else l.status
-        )
-        for l in locs if l.latitude is not None and l.longitude is not None
+        NearestLocation(**_map_point(point).model_dump(), distance_km=round(distance, 3))
+        for distance, point in nearest
     ]
 
 @router.get("/", response_model=List[Location])
 def list_locations(
+    response: Response,
     status: Optional[str] = Query(None),
+    city: Optional[str] = Query(None),
+    region: Optional[str] = Query(None),
+    country: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+    order: Literal["asc", "desc"] = Query("desc", description="Сортировка по created_at"),
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
-    return crud_locations.get_locations(db, status=status)
+    locations, next_cursor = crud_locations.get_locations(
+        db, status=status, city=city, region=region, country=country, limit=limit, cursor=cursor, order=order
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return locations
 
 @router.post("/", response_model=Location)
 def create_location(location_in: LocationCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
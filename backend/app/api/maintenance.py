@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.schemas.maintenance import MaintenanceCreate, MaintenanceUpdate, MaintenanceRequest, MaintenanceStatus
 from app.crud import maintenance as crud_maintenance
-from typing import List, Optional
+from typing import List, Optional, Literal
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.core.deps import get_current_user
 from app.db.models.user import UserRole
 from app.db.models.station import Station
@@ -14,17 +15,25 @@ router = APIRouter(prefix="/maintenance", tags=["maintenance"])
 
 @router.get("/", response_model=List[MaintenanceRequest])
 def list_maintenance(
+    response: Response,
     status: Optional[MaintenanceStatus] = Query(None),
     station_id: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+    order: Literal["asc", "desc"] = Query("desc", description="Сортировка по created_at"),
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
+    page = dict(status=status, station_id=station_id, limit=limit, cursor=cursor, order=order)
     if user.role == UserRole.admin:
-        return get_maintenances_by_admin_id(db, user.id, status=status)
+        items, next_cursor = get_maintenances_by_admin_id(db, user.id, **page)
     elif user.role == UserRole.operator:
-        return get_maintenances_by_admin_id(db, user.admin_id, status=status)
+        items, next_cursor = get_maintenances_by_admin_id(db, user.admin_id, **page)
     else:
-        return crud_maintenance.get_maintenances(db, status=status, station_id=station_id)
+        items, next_cursor = crud_maintenance.get_maintenances(db, **page)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @router.post("/", response_model=MaintenanceRequest)
 def create_maintenance(
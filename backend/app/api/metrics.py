@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.core.metrics import registry, CONTENT_TYPE
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Формат Prometheus; значения этого процесса (у каждого воркера uvicorn свои)
+    return Response(await registry.render(), media_type=CONTENT_TYPE)
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, status, Body, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, Depends, status, Body, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Literal
+from datetime import datetime, timezone
+import json
+import time
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.crud.exports import charging_sessions_export_query, ocpp_transactions_export_query, iter_export_batches
+from app.utils.export import iter_ndjson, iter_csv, EXPORT_MEDIA_TYPES
 from app.schemas.ocpp import (
     OCPPConnection, OCPPConnectionCreate,
     OCPPTransaction, OCPPTransactionCreate,
     Tariff, TariffCreate, ChargingSession, ChargingSessionCreate, LimitType, ChargingSessionStatus
 )
-from app.core.deps import get_current_user, require_role, get_db
+from app.core.deps import get_current_user, require_role, get_db, get_scope_admin_id
+from app.db.session import get_async_db, SessionLocal
+from app.core.security import decode_access_token
+from app.core.live import live_hub
+from app.crud.users import get_principal
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 from pydantic import BaseModel, Field
 from app.schemas.user import UserCreateWithRole, UserOut
 from app.crud.users import create_user_with_role
@@ -13,9 +26,12 @@ from sqlalchemy.orm import Session
 from app.db.models.user import UserRole, User
 from app.db.models.station import Station
 from sqlalchemy import select
-from ocpp_ws_server.redis_manager import redis_manager
+from ocpp_ws_server.redis_manager import redis_manager, COMMAND_REPLY_TIMEOUT, PRESENCE_TTL
+from app.core.log import station_log_levels
+import logging
+from app.crud.ocpp_async import get_active_sessions_by_station, list_scope_station_ids
 from app.crud.ocpp import (
-    create_tariff, get_tariff, list_tariffs, update_tariff, delete_tariff,
+    create_tariff, get_tariff, list_tariffs, get_active_tariff, update_tariff, delete_tariff,
     create_charging_session, get_charging_session, list_charging_sessions, update_charging_session, delete_charging_session
 )
 
@@ -32,16 +48,38 @@ class OCPPConnection(BaseModel):
     status: str = Field(..., example="active")
     last_heartbeat: Optional[str] = Field(None, example="2024-06-01T12:00:00Z")
 
+class StationLogLevel(BaseModel):
+    level: Optional[Literal["DEBUG", "INFO", "WARNING", "ERROR"]] = Field(None, example="DEBUG", description="null — снять переопределение")
+
 class OCPPCommandRequest(BaseModel):
     station_id: str = Field(..., example="DE-BERLIN-001")
     command: str = Field(..., example="RemoteStartTransaction")
-    payload: Optional[dict] = Field(None, example={"connectorId": 1})
+    payload: Optional[dict] = Field(None, example={"connectorId": 1, "idTag": "USER-1"})
+    timeout: float = Field(COMMAND_REPLY_TIMEOUT, gt=0, le=120, description="Сколько ждать ответа станции, секунды")
 
 class OCPPCommandResponse(BaseModel):
-    status: str = Field(..., example="sent")
+    status: str = Field(..., example="completed", description="completed | rejected | error | timeout | not_connected | dropped")
     station_id: str = Field(..., example="DE-BERLIN-001")
     command: str = Field(..., example="RemoteStartTransaction")
-    result: Optional[dict] = Field(None, example={"status": "Accepted"})
+    result: Optional[dict] = Field(None, example={"status": "Accepted"}, description="Ответ станции (OCPP)")
+    error: Optional[str] = Field(None, description="CallError станции или ошибка шлюза")
+
+class StationStatusRequest(BaseModel):
+    station_ids: Optional[List[str]] = Field(
+        None, max_length=1000, example=["DE-BERLIN-001", "DE-BERLIN-002"],
+        description="Не указан — все станции пользователя (admin — свои, operator — своего admin)"
+    )
+
+class ActiveSessionInfo(BaseModel):
+    session_id: str
+    user_id: str
+    start_time: Optional[datetime] = None
+    energy: Optional[float] = None
+    limit_type: LimitType
+    limit_value: Optional[float] = None
+
+class StationStatus(OCPPConnection):
+    active_session: Optional[ActiveSessionInfo] = None
 
 def get_user_station_ids(db: Session, user) -> list[str]:
     if user.role == UserRole.admin:
@@ -54,54 +92,227 @@ def get_user_station_ids(db: Session, user) -> list[str]:
         result = db.execute(select(Station.id))
         return [row[0] for row in result.all()]
 
+def get_live_scope(user, db: Session, stations: Optional[List[str]]) -> Optional[set[str]]:
+    # Станции, события которых видит пользователь (правила get_user_station_ids); None — все станции
+    scope = set(get_user_station_ids(db, user)) if user.role in (UserRole.admin, UserRole.operator) else None
+    if stations:
+        return set(stations) if scope is None else scope & set(stations)
+    return scope
+
+def _live_ws_scope(token: str, stations: Optional[List[str]]):
+    # Браузер не передаёт заголовок Authorization в WebSocket — токен приходит в query
+    payload = decode_access_token(token)
+    if not payload or "sub" not in payload:
+        return False, None
+    with SessionLocal() as db:
+        user = get_principal(db, payload["sub"])
+        if not user or not user.is_active:
+            return False, None
+        return True, get_live_scope(user, db, stations)
+
 # --- Эндпоинты ---
 
+def _connection(station_id: str, last_seen: Optional[float], now: float) -> OCPPConnection:
+    # active — сообщение за последние PRESENCE_TTL секунд; stale — ещё не снята sweeper'ом
+    if last_seen is None:
+        return OCPPConnection(station_id=station_id, status="inactive", last_heartbeat=None)
+    return OCPPConnection(
+        station_id=station_id,
+        status="active" if now - last_seen <= PRESENCE_TTL else "stale",
+        last_heartbeat=datetime.fromtimestamp(last_seen, timezone.utc).isoformat()
+    )
+
 @router.get("/connections", response_model=List[OCPPConnection], summary="Список подключённых станций")
-async def list_ocpp_connections():
-    station_ids = await redis_manager.get_stations()
-    return [
-        OCPPConnection(station_id=station_id, status="active", last_heartbeat=None)
-        for station_id in station_ids
-    ]
+async def list_ocpp_connections(
+    seen_within: Optional[int] = Query(None, ge=1, description="Только станции, приславшие сообщение за последние N секунд")
+):
+    # Один ZRANGEBYSCORE по ocpp:presence
+    presence = await redis_manager.get_presence(seen_within)
+    now = time.time()
+    return [_connection(station_id, last_seen, now) for station_id, last_seen in presence]
 
 @router.post("/connections", response_model=OCPPConnection, status_code=status.HTTP_201_CREATED)
 async def create_ocpp_connection(connection_in: OCPPConnectionCreate):
     raise HTTPException(status_code=501, detail="Создание соединения реализуется через WebSocket-клиент.")
 
+def _to_epoch_ms(value: Optional[datetime]) -> Optional[int]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
 @router.get("/transactions", summary="List Ocpp Transactions")
-async def list_ocpp_transactions(station_id: Optional[str] = Query(None)):
-    txs = await redis_manager.get_transactions(station_id)
-    return txs
+async def list_ocpp_transactions(
+    station_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None, description="Начало периода (UTC, если без часового пояса)"),
+    until: Optional[datetime] = Query(None, description="Конец периода (UTC, если без часового пояса)"),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+    limit: int = Query(100, ge=1, le=1000),
+    order: Literal["asc", "desc"] = Query("asc")
+):
+    # Страница из потока Redis: время ответа зависит от limit, а не от объёма истории
+    txs, next_cursor = await redis_manager.get_transactions(
+        station_id,
+        since_ms=_to_epoch_ms(since),
+        until_ms=_to_epoch_ms(until),
+        cursor=cursor,
+        limit=limit,
+        reverse=order == "desc"
+    )
+
+    def iter_json():
+        yield "["
+        for i, tx in enumerate(txs):
+            yield ("," if i else "") + json.dumps(tx)
+        yield "]"
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return StreamingResponse(iter_json(), media_type="application/json", headers=headers)
+
+def _export_response(stmt, export_format: str, filename: str) -> StreamingResponse:
+    # Строки читаются из БД по мере отправки клиенту (sync-генератор выполняется в threadpool)
+    batches = iter_export_batches(stmt)
+    if export_format == "csv":
+        body = iter_csv(batches, list(stmt.selected_columns.keys()))
+    else:
+        body = iter_ndjson(batches)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
+
+@router.get("/transactions/export", summary="Выгрузка OCPP-транзакций (NDJSON/CSV)")
+def export_ocpp_transactions(
+    station_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None, description="Начало периода по start_timestamp"),
+    until: Optional[datetime] = Query(None, description="Конец периода (не включительно)"),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    user=Depends(get_current_user)
+):
+    stmt = ocpp_transactions_export_query(station_id, since, until, admin_id=get_scope_admin_id(user))
+    return _export_response(stmt, format, "ocpp_transactions")
 
 @router.post("/transactions", summary="Create Ocpp Transaction")
 async def create_ocpp_transaction(transaction_in: OCPPTransactionCreate):
-    # Публикуем команду StartTransaction через Redis
-    await redis_manager.publish_command(transaction_in.connection_id, {
+    # RemoteStartTransaction через узел шлюза станции; в ответе — ответ станции (Accepted/Rejected)
+    reply = await redis_manager.call_station(transaction_in.connection_id, {
         "command": "RemoteStartTransaction",
         "payload": {
-            "connectorId": 1  # Можно доработать передачу connectorId
+            "connectorId": 1,  # Можно доработать передачу connectorId
+            "idTag": "system"
         }
     })
-    return {"status": "sent", "station_id": transaction_in.connection_id}
+    return {"station_id": transaction_in.connection_id, **reply}
 
 @router.post("/send_command", response_model=OCPPCommandResponse, summary="Отправить команду на станцию через OCPP")
 async def send_command(request: OCPPCommandRequest):
-    await redis_manager.publish_command(request.station_id, {
+    # Ждём ответ станции (канал ответов по correlation_id) — без опроса /status и /transactions
+    reply = await redis_manager.call_station(request.station_id, {
         "command": request.command,
         "payload": request.payload or {}
-    })
-    return OCPPCommandResponse(
-        status="sent",
-        station_id=request.station_id,
-        command=request.command,
-        result={"info": "Команда отправлена через Redis Pub/Sub. Ожидайте выполнения на станции."}
-    )
+    }, timeout=request.timeout)
+    return OCPPCommandResponse(station_id=request.station_id, command=request.command, **reply)
 
 @router.get("/status/{station_id}", response_model=OCPPConnection, summary="Статус конкретной станции")
 async def get_station_status(station_id: str):
-    station_ids = await redis_manager.get_stations()
-    status = "active" if station_id in station_ids else "inactive"
-    return OCPPConnection(station_id=station_id, status=status, last_heartbeat=None)
+    return _connection(station_id, await redis_manager.get_last_seen(station_id), time.time())
+
+@router.post("/status", response_model=List[StationStatus], summary="Статус, последний heartbeat и активная сессия списка станций")
+async def get_station_statuses(
+    request: Optional[StationStatusRequest] = None,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    request = request or StationStatusRequest()
+    admin_id = get_scope_admin_id(user)
+    if admin_id is not None:
+        scope = await list_scope_station_ids(db, admin_id)
+        if request.station_ids is None:
+            station_ids = scope
+        else:
+            allowed = set(scope)
+            station_ids = [station_id for station_id in request.station_ids if station_id in allowed]
+    elif request.station_ids is None:
+        raise HTTPException(400, "Укажите station_ids")
+    else:
+        station_ids = request.station_ids
+    station_ids = list(dict.fromkeys(station_ids))
+    # SMISMEMBER + ZMSCORE одним pipeline и запрос активных сессий выполняются параллельно
+    statuses, sessions = await asyncio.gather(
+        redis_manager.get_station_statuses(station_ids),
+        get_active_sessions_by_station(db, station_ids)
+    )
+    now = time.time()
+    result = []
+    for station_id, (connected, last_seen) in zip(station_ids, statuses):
+        if last_seen is None:
+            # Подключена до появления ocpp:presence — времени последнего сообщения ещё нет
+            item = OCPPConnection(station_id=station_id, status="active" if connected else "inactive")
+        else:
+            item = _connection(station_id, last_seen, now)
+        session = sessions.get(station_id)
+        result.append(StationStatus(
+            **item.model_dump(),
+            active_session=ActiveSessionInfo(
+                session_id=session.id,
+                user_id=session.user_id,
+                start_time=session.start_time,
+                energy=session.energy,
+                limit_type=session.limit_type,
+                limit_value=session.limit_value
+            ) if session else None
+        ))
+    return result
+
+@router.get("/live", summary="Live-обновления станций (Server-Sent Events)")
+async def live_updates(
+    stations: Optional[List[str]] = Query(None, description="Только эти станции (в пределах доступных пользователю)"),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # События: station_status, connector_status, session_started, session_stopped, meter (не чаще раза в 5 с на коннектор)
+    scope = await asyncio.to_thread(get_live_scope, user, db, stations)
+    subscriber = live_hub.subscribe(scope)
+
+    async def stream():
+        try:
+            while True:
+                message = await subscriber.get()
+                # Комментарий SSE — keep-alive для прокси, заодно обнаруживает закрытое соединение
+                yield f"data: {message}\n\n" if message is not None else ": keep-alive\n\n"
+        finally:
+            live_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/live/ws")
+async def live_updates_ws(websocket: WebSocket, token: str = Query(...), stations: Optional[List[str]] = Query(None)):
+    authorized, scope = await asyncio.to_thread(_live_ws_scope, token, stations)
+    if not authorized:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscriber = live_hub.subscribe(scope)
+    try:
+        while True:
+            message = await subscriber.get()
+            await websocket.send_text(message if message is not None else '{"type": "keep-alive"}')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_hub.unsubscribe(subscriber)
+
+@router.get("/log_levels", summary="Переопределённые уровни логов станций")
+async def list_station_log_levels(user=Depends(require_role('admin', 'superadmin'))):
+    return {station_id: logging.getLevelName(level) for station_id, level in station_log_levels.levels.items()}
+
+@router.put("/stations/{station_id}/log_level", summary="Уровень логов для одной станции (например, DEBUG для отладки)")
+async def set_station_log_level(station_id: str, body: StationLogLevel, user=Depends(require_role('admin', 'superadmin'))):
+    # Применяется всеми процессами API и шлюза через шину инвалидации
+    await station_log_levels.set_level(station_id, logging.getLevelName(body.level) if body.level else None)
+    return {"station_id": station_id, "level": body.level}
 
 @router.post("/disconnect", summary="Отключить станцию от WebSocket")
 async def disconnect_station(station_id: str = Body(..., example="DE-BERLIN-001")):
@@ -136,8 +347,33 @@ def create_session_api(session_in: ChargingSessionCreate, db: Session = Depends(
     return create_charging_session(db, session_in)
 
 @router.get("/sessions", response_model=List[ChargingSession])
-def list_sessions_api(user_id: Optional[str] = None, station_id: Optional[str] = None, db: Session = Depends(get_db)):
-    return list_charging_sessions(db, user_id, station_id)
+def list_sessions_api(
+    response: Response,
+    user_id: Optional[str] = None,
+    station_id: Optional[str] = None,
+    status: Optional[ChargingSessionStatus] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+    order: Literal["asc", "desc"] = Query("desc", description="Сортировка по created_at"),
+    db: Session = Depends(get_db)
+):
+    sessions, next_cursor = list_charging_sessions(
+        db, user_id, station_id, status=status, limit=limit, cursor=cursor, order=order
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return sessions
+
+@router.get("/sessions/export", summary="Выгрузка сессий зарядки (NDJSON/CSV)")
+def export_sessions_api(
+    station_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None, description="Начало периода по start_time"),
+    until: Optional[datetime] = Query(None, description="Конец периода (не включительно)"),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    user=Depends(get_current_user)
+):
+    stmt = charging_sessions_export_query(station_id, since, until, admin_id=get_scope_admin_id(user))
+    return _export_response(stmt, format, "charging_sessions")
 
 @router.get("/sessions/{session_id}", response_model=ChargingSession)
 def get_session_api(session_id: str, db: Session = Depends(get_db)):
@@ -166,10 +402,9 @@ def start_charge(
     user = db.get(User, req.user_id)
     if not user:
         raise HTTPException(404, "User not found")
-    tariffs = list_tariffs(db, req.station_id)
-    if not tariffs:
+    tariff = get_active_tariff(db, req.station_id)
+    if not tariff:
         raise HTTPException(400, "No tariff for this station")
-    tariff = tariffs[0]
     if req.limit_type == LimitType.amount:
         if user.balance < req.limit_value:
             raise HTTPException(400, "Недостаточно средств на балансе")
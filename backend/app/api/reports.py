@@ -1,24 +1,57 @@
-from fastapi import APIRouter, Depends, Query, status
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Literal
+from datetime import datetime, timedelta, timezone
 from app.schemas.report import UsageReport, RevenueReport
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_scope_admin_id
+from app.db.session import get_async_db
+from app.crud.reports_async import get_usage_report as crud_usage_report, get_revenue_report as crud_revenue_report, REPORT_TIMEZONE
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+# Период по умолчанию, если start_date не задан
+DEFAULT_REPORT_DAYS = 30
+
+def _report_range(start_date: Optional[str], end_date: Optional[str]) -> tuple[datetime, datetime]:
+    # Даты в ISO-формате; дата без времени — сутки в REPORT_TIMEZONE, end_date включительно.
+    # start_date округляется вниз до начала часа/суток (granularity) — первый интервал входит в отчёт целиком
+    def parse(value: str, is_end: bool) -> datetime:
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Некорректная дата: {value}")
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=REPORT_TIMEZONE)
+        if is_end and len(value) == 10:
+            parsed += timedelta(days=1)
+        return parsed
+
+    end = parse(end_date, True) if end_date else datetime.now(timezone.utc)
+    start = parse(start_date, False) if start_date else end - timedelta(days=DEFAULT_REPORT_DAYS)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start_date должен быть раньше end_date")
+    return start, end
+
 @router.get("/usage", response_model=List[UsageReport])
 async def get_usage_report(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
+    granularity: Literal["hour", "day"] = Query("day"),
+    station_id: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(get_current_user)
 ):
-    # TODO: Реализовать бизнес-логику получения usage-отчёта
-    return []
+    start, end = _report_range(start_date, end_date)
+    return await crud_usage_report(db, start, end, granularity, admin_id=get_scope_admin_id(user), station_id=station_id)
 
 @router.get("/revenue", response_model=List[RevenueReport])
 async def get_revenue_report(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
+    granularity: Literal["hour", "day"] = Query("day"),
+    station_id: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(get_current_user)
 ):
-    # TODO: Реализовать бизнес-логику получения revenue-отчёта
-    return []
+    start, end = _report_range(start_date, end_date)
+    return await crud_revenue_report(db, start, end, granularity, admin_id=get_scope_admin_id(user), station_id=station_id)
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.schemas.station import StationCreate, StationUpdate, Station, StationStatusUpdate
 from app.crud import stations as crud_stations
-from typing import List, Optional
+from typing import List, Optional, Literal
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.core.deps import get_current_user, require_role
 from app.db.models.user import UserRole
 
@@ -11,15 +12,24 @@ router = APIRouter(prefix="/stations", tags=["stations"])
 
 @router.get("/", response_model=List[Station])
 def list_stations(
+    response: Response,
     status: Optional[str] = Query(None),
     location_id: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+    order: Literal["asc", "desc"] = Query("desc", description="Сортировка по created_at"),
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
     admin_id = None
     if user.role in [UserRole.admin, UserRole.operator]:
         admin_id = user.admin_id if user.role == UserRole.operator else user.id
-    return crud_stations.get_stations(db, status=status, location_id=location_id, admin_id=admin_id)
+    stations, next_cursor = crud_stations.get_stations(
+        db, status=status, location_id=location_id, admin_id=admin_id, limit=limit, cursor=cursor, order=order
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return stations
 
 @router.post("/", response_model=Station)
 def create_station(station_in: StationCreate, db: Session = Depends(get_db), user=Depends(require_role('admin', 'operator', 'superadmin'))):
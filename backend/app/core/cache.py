@@ -0,0 +1,162 @@
+# In-process кэши (TTL + LRU) с инвалидацией между процессами/узлами через Redis Pub/Sub
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import redis
+import redis.asyncio as aioredis
+from app.core.metrics import registry
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+logger = logging.getLogger(__name__)
+
+# Признак промаха (None — допустимое закэшированное значение)
+MISSING = object()
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        invalidation_bus.register(self)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        # Только локальный сброс
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def invalidate(self, key=None) -> None:
+        # Локальный сброс + рассылка остальным процессам (key=None — весь кэш)
+        if key is None:
+            self.clear()
+        else:
+            self.delete(key)
+        invalidation_bus.publish(self.name, key)
+
+    async def ainvalidate(self, key=None) -> None:
+        # То же для async-кода (без блокирующего вызова Redis в event loop)
+        if key is None:
+            self.clear()
+        else:
+            self.delete(key)
+        await invalidation_bus.apublish(self.name, key)
+
+    def __len__(self):
+        return len(self._data)
+
+class CacheInvalidationBus:
+    def __init__(self):
+        self.caches: dict[str, TTLCache] = {}
+        self._sync_redis = None
+        self._async_redis = None
+        self._task: asyncio.Task | None = None
+
+    def register(self, cache: TTLCache) -> None:
+        self.caches[cache.name] = cache
+
+    def stats(self) -> dict:
+        return {
+            name: {"size": len(cache), "hits": cache.hits, "misses": cache.misses}
+            for name, cache in self.caches.items() if isinstance(cache, TTLCache)
+        }
+
+    def publish(self, cache_name: str, key=None) -> None:
+        # Синхронная публикация: вызывается из CRUD, которые работают в threadpool
+        try:
+            if self._sync_redis is None:
+                self._sync_redis = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+            self._sync_redis.publish(INVALIDATION_CHANNEL, json.dumps({"cache": cache_name, "key": key}))
+        except Exception as e:
+            # Остальные процессы увидят изменение по истечении TTL
+            logger.warning("Не удалось разослать инвалидацию %s:%s: %s", cache_name, key, e)
+
+    async def apublish(self, cache_name: str, key=None) -> None:
+        try:
+            if self._async_redis is None:
+                self._async_redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+            await self._async_redis.publish(INVALIDATION_CHANNEL, json.dumps({"cache": cache_name, "key": key}))
+        except Exception as e:
+            logger.warning("Не удалось разослать инвалидацию %s:%s: %s", cache_name, key, e)
+
+    def _apply(self, data: str) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        cache = self.caches.get(message.get("cache"))
+        if cache is None:
+            return
+        key = message.get("key")
+        if key is None:
+            cache.clear()
+        else:
+            cache.delete(key)
+
+    async def _run(self):
+        if self._async_redis is None:
+            self._async_redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+        while True:
+            pubsub = self._async_redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Подписка на инвалидацию кэшей прервана, переподключение: %s", e)
+                # Пока подписки не было, изменения могли быть пропущены
+                for cache in self.caches.values():
+                    cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+invalidation_bus = CacheInvalidationBus()
+registry.add_collector("cache", invalidation_bus.stats, label="cache")
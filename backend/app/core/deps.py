@@ -2,10 +2,12 @@ from fastapi import Depends, HTTPException, status, Request
 from app.core.security import decode_access_token
 from app.db.session import get_db
 from app.db.models.user import User, UserRole
+from app.crud.users import get_principal
+from app.schemas.user import UserOut
 from sqlalchemy.orm import Session
-from sqlalchemy import select
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserOut:
+    # Возвращает снимок пользователя из кэша principals (без запроса к БД при попадании)
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Требуется авторизация")
@@ -14,14 +16,23 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     if not payload or "sub" not in payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Недействительный токен")
     user_id = payload["sub"]
-    result = db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = get_principal(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
+    if not user.is_active:
+        raise HTTPException(status_code=403, detail="Пользователь заблокирован")
     return user
 
+def get_scope_admin_id(user) -> str | None:
+    # Чьи станции видит пользователь: admin — свои, operator — своего admin, superadmin — все (None)
+    if user.role == UserRole.admin:
+        return user.id
+    if user.role == UserRole.operator:
+        return user.admin_id
+    return None
+
 def require_role(*roles):
-    def role_checker(user: User = Depends(get_current_user)):
+    def role_checker(user: UserOut = Depends(get_current_user)):
         if user.role not in roles:
             raise HTTPException(status_code=403, detail="Недостаточно прав")
         return user
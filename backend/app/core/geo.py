@@ -0,0 +1,238 @@
+# In-memory пространственный индекс точек на карте (равномерная сетка по широте/долготе).
+# Запрос по прямоугольнику перебирает только ячейки, попавшие в него, поиск ближайших — кольца ячеек
+# вокруг точки: стоимость зависит от размера результата, а не от числа точек.
+# Изменения рассылаются другим процессам через шину инвалидации кэшей (ключ — id точки).
+import heapq
+import math
+import threading
+from app.core.cache import invalidation_bus
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Предел широты проекции Web Mercator (тайлы карт z/x/y)
+MERCATOR_MAX_LAT = 85.05112878
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def tile_position(lat: float, lon: float, z: int) -> tuple[float, float]:
+    # Дробные координаты тайла z/x/y (Web Mercator), целая часть — номер тайла
+    lat = max(-MERCATOR_MAX_LAT, min(MERCATOR_MAX_LAT, lat))
+    n = 1 << z
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return min(max(x, 0.0), n - 1e-9), min(max(y, 0.0), n - 1e-9)
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    # (min_lat, min_lon, max_lat, max_lon) тайла; крайние тайлы включают полюса за пределом проекции
+    n = 1 << z
+    min_lon, max_lon = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n)))) if y else 90.0
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n)))) if y + 1 < n else -90.0
+    return min_lat, min_lon, max_lat, max_lon
+
+def cluster_points(points, z: int, grid: int = 8) -> dict[tuple[int, int], list[dict]]:
+    # Маркеры по тайлам уровня z за один проход: тайл делится на grid x grid ячеек, точки ячейки —
+    # один кластер (центр масс и число точек). На тайл не больше grid² маркеров при любом числе точек.
+    buckets: dict[tuple[int, int, int, int], list] = {}
+    for point in points:
+        fx, fy = tile_position(point.latitude, point.longitude, z)
+        x, y = int(fx), int(fy)
+        key = (x, y, int((fx - x) * grid), int((fy - y) * grid))
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [1, point.latitude, point.longitude, point]
+        else:
+            bucket[0] += 1
+            bucket[1] += point.latitude
+            bucket[2] += point.longitude
+    tiles: dict[tuple[int, int], list[dict]] = {}
+    for (x, y, _, _), (count, lat_sum, lon_sum, point) in buckets.items():
+        if count == 1:
+            marker = {"latitude": point.latitude, "longitude": point.longitude, "count": 1, "id": point.id}
+        else:
+            marker = {"latitude": round(lat_sum / count, 6), "longitude": round(lon_sum / count, 6), "count": count}
+        tiles.setdefault((x, y), []).append(marker)
+    return tiles
+
+class GridIndex:
+    """
+    Точки — объекты с атрибутами id, latitude, longitude. Индекс строится при первом запросе;
+    invalidate(id) помечает точку устаревшей здесь и в остальных процессах, её перечитывают перед следующим запросом.
+    """
+
+    def __init__(self, name: str, cell_deg: float = 0.05):
+        self.name = name
+        self.cell_deg = cell_deg
+        self.loaded = False
+        self.version = 0
+        self._points: dict = {}
+        self._cells: dict[tuple[int, int], dict] = {}
+        self._cell_of: dict = {}
+        self._dirty: set = set()
+        self._lock = threading.RLock()
+        invalidation_bus.register(self)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    # --- Изменение индекса ---
+
+    def load(self, points) -> int:
+        with self._lock:
+            self._points.clear()
+            self._cells.clear()
+            self._cell_of.clear()
+            self._dirty.clear()
+            for point in points:
+                self._add(point)
+            self.loaded = True
+            self.version += 1
+            return len(self._points)
+
+    def upsert(self, point) -> None:
+        with self._lock:
+            self._remove(point.id)
+            self._add(point)
+            self.version += 1
+
+    def remove(self, point_id) -> None:
+        with self._lock:
+            self._remove(point_id)
+            self.version += 1
+
+    def _add(self, point) -> None:
+        cell = self._cell(point.latitude, point.longitude)
+        self._points[point.id] = point
+        self._cells.setdefault(cell, {})[point.id] = point
+        self._cell_of[point.id] = cell
+
+    def _remove(self, point_id) -> None:
+        cell = self._cell_of.pop(point_id, None)
+        if cell is None:
+            return
+        del self._points[point_id]
+        points = self._cells[cell]
+        del points[point_id]
+        if not points:
+            del self._cells[cell]
+
+    def take_dirty(self) -> set:
+        # id точек, которые нужно перечитать из БД перед запросом
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+    # Интерфейс кэша для шины инвалидации
+    def delete(self, key) -> None:
+        with self._lock:
+            self._dirty.add(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.loaded = False
+
+    def invalidate(self, key) -> None:
+        self.delete(key)
+        invalidation_bus.publish(self.name, key)
+
+    # --- Запросы ---
+
+    def get(self, point_id):
+        return self._points.get(point_id)
+
+    def all(self) -> list:
+        with self._lock:
+            return list(self._points.values())
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> list:
+        # min_lon > max_lon — прямоугольник пересекает 180-й меридиан
+        if min_lon > max_lon:
+            return self.bbox(min_lat, min_lon, max_lat, 180.0) + self.bbox(min_lat, -180.0, max_lat, max_lon)
+        lat0, lon0 = self._cell(min_lat, min_lon)
+        lat1, lon1 = self._cell(max_lat, max_lon)
+        result = []
+        with self._lock:
+            if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) <= len(self._cells):
+                cells = (self._cells.get((i, j)) for i in range(lat0, lat1 + 1) for j in range(lon0, lon1 + 1))
+            else:
+                # Прямоугольник больше заполненной части сетки (мелкий масштаб) — перебираем непустые ячейки
+                cells = (
+                    points for (i, j), points in self._cells.items() if lat0 <= i <= lat1 and lon0 <= j <= lon1
+                )
+            for points in cells:
+                if not points:
+                    continue
+                for point in points.values():
+                    if min_lat <= point.latitude <= max_lat and min_lon <= point.longitude <= max_lon:
+                        result.append(point)
+        return result
+
+    def _ring(self, ci: int, cj: int, r: int):
+        if r == 0:
+            yield ci, cj
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield ci - r, j
+            yield ci + r, j
+        for i in range(ci - r + 1, ci + r):
+            yield i, cj - r
+            yield i, cj + r
+
+    def _outside_km(self, lat: float, lon: float, ci: int, cj: int, r: int) -> float:
+        # Нижняя оценка расстояния до любой точки за пределами колец 0..r
+        lat_lo, lat_hi = (ci - r) * self.cell_deg, (ci + r + 1) * self.cell_deg
+        lon_lo, lon_hi = (cj - r) * self.cell_deg, (cj + r + 1) * self.cell_deg
+        lat_gap = min(lat - lat_lo, lat_hi - lat) * KM_PER_DEGREE
+        widest = min(90.0, max(abs(lat_lo), abs(lat_hi)))
+        lon_gap = min(lon - lon_lo, lon_hi - lon) * KM_PER_DEGREE * math.cos(math.radians(widest))
+        return min(lat_gap, lon_gap)
+
+    def nearest(self, lat: float, lon: float, k: int, max_km: float | None = None, predicate=None) -> list[tuple[float, object]]:
+        # k ближайших точек (расстояние в км по большому кругу), отсортированы по расстоянию
+        ci, cj = self._cell(lat, lon)
+        heap: list[tuple[float, int, object]] = []  # max-heap по -расстоянию
+        with self._lock:
+            total = len(self._points)
+            visited = 0
+            r = 0
+            while visited < total:
+                if 8 * r > len(self._cells):
+                    # Кольцо длиннее числа непустых ячеек — досматриваем оставшиеся ячейки целиком
+                    cells = [
+                        points for (i, j), points in self._cells.items() if max(abs(i - ci), abs(j - cj)) >= r
+                    ]
+                    r = None
+                else:
+                    cells = [self._cells.get(cell) for cell in self._ring(ci, cj, r)]
+                for points in cells:
+                    if not points:
+                        continue
+                    visited += len(points)
+                    for point in points.values():
+                        if predicate is not None and not predicate(point):
+                            continue
+                        distance = haversine_km(lat, lon, point.latitude, point.longitude)
+                        if max_km is not None and distance > max_km:
+                            continue
+                        if len(heap) < k:
+                            heapq.heappush(heap, (-distance, id(point), point))
+                        elif distance < -heap[0][0]:
+                            heapq.heapreplace(heap, (-distance, id(point), point))
+                if r is None:
+                    break
+                bound = self._outside_km(lat, lon, ci, cj, r)
+                if max_km is not None and bound > max_km:
+                    break
+                if len(heap) == k and -heap[0][0] <= bound:
+                    break
+                r += 1
+        return sorted(((-distance, point) for distance, _, point in heap), key=lambda item: item[0])
+
+    def __len__(self):
+        return len(self._points)
+
+    def stats(self) -> dict:
+        return {"points": len(self._points), "cells": len(self._cells), "loaded": self.loaded}
@@ -0,0 +1,114 @@
+# Live-обновления для дашбордов: одна подписка процесса API на канал ocpp:events,
+# события раздаются подписчикам (SSE/WebSocket) по станциям из их области видимости.
+# Событие разбирается один раз на процесс, подписчику уходит исходная JSON-строка.
+import asyncio
+import json
+import logging
+import os
+from ocpp_ws_server.redis_manager import redis_manager, EVENTS_CHANNEL
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Неотправленных событий на подписчика; медленный клиент теряет самые старые
+LIVE_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("LIVE_SUBSCRIBER_QUEUE_SIZE", 1000))
+# Интервал keep-alive при отсутствии событий (секунды)
+LIVE_KEEPALIVE_INTERVAL = float(os.getenv("LIVE_KEEPALIVE_INTERVAL", 15))
+
+class LiveSubscriber:
+    __slots__ = ("station_ids", "queue", "dropped")
+
+    def __init__(self, station_ids: set[str] | None):
+        # None — все станции (superadmin)
+        self.station_ids = station_ids
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=LIVE_SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def put(self, message: str) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self) -> str | None:
+        # None — событий не было LIVE_KEEPALIVE_INTERVAL секунд, пора отправить keep-alive
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=LIVE_KEEPALIVE_INTERVAL)
+        except asyncio.TimeoutError:
+            return None
+
+class LiveHub:
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        # station_id -> подписчики; подписчики без ограничения по станциям — отдельно
+        self._by_station: dict[str, set[LiveSubscriber]] = {}
+        self._unscoped: set[LiveSubscriber] = set()
+        self.subscribers = 0
+        self.events = 0
+        self.deliveries = 0
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, station_ids: set[str] | None) -> LiveSubscriber:
+        subscriber = LiveSubscriber(station_ids)
+        if station_ids is None:
+            self._unscoped.add(subscriber)
+        else:
+            for station_id in station_ids:
+                self._by_station.setdefault(station_id, set()).add(subscriber)
+        self.subscribers += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: LiveSubscriber) -> None:
+        if subscriber.station_ids is None:
+            self._unscoped.discard(subscriber)
+        else:
+            for station_id in subscriber.station_ids:
+                subscribers = self._by_station.get(station_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._by_station[station_id]
+        self.subscribers -= 1
+
+    def _fanout(self, data: str) -> None:
+        self.events += 1
+        try:
+            station_id = json.loads(data).get("station_id")
+        except (ValueError, AttributeError):
+            return
+        for subscriber in (*self._unscoped, *self._by_station.get(station_id, ())):
+            subscriber.put(data)
+            self.deliveries += 1
+
+    async def _run(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._fanout(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Подписка на события станций прервана, переподключение: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"subscribers": self.subscribers, "events": self.events, "deliveries": self.deliveries}
+
+live_hub = LiveHub(redis_manager.redis)
+registry.add_collector("live", live_hub.stats)
@@ -0,0 +1,200 @@
+# Структурное логирование для API и OCPP-шлюза.
+# Записи попадают в ограниченную очередь (QueueHandler) и пишутся в stdout отдельным потоком —
+# event loop не блокируется на записи в stdout. При переполнении очереди записи отбрасываются (счётчик dropped).
+# Частые сообщения (Heartbeat, MeterValues) сэмплируются по полю action (LOG_SAMPLE_RATES),
+# для отдельных станций уровень можно понизить до DEBUG (StationLogLevels, рассылается между процессами).
+import asyncio
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+import redis.asyncio as aioredis
+from app.core.cache import invalidation_bus, REDIS_URL
+from app.core.metrics import registry
+
+LOG_LEVEL = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+# json — одна JSON-строка на запись (для сборщика логов), text — для локальной разработки
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Доля записей уровня ниже WARNING, которые пишутся, по типу сообщения: "Heartbeat=0.01,MeterValues=0.1"
+LOG_SAMPLE_RATES = {
+    action.strip(): float(rate)
+    for action, rate in (
+        item.split("=") for item in os.getenv("LOG_SAMPLE_RATES", "Heartbeat=0.01,MeterValues=0.1").split(",") if item.strip()
+    )
+}
+# Логгеры проекта, уровень которых понижается при переопределении уровня станции
+APP_LOGGERS = ("app", "ocpp_ws_server")
+STATION_LOG_LEVELS_KEY = "log:station_levels"
+
+# Атрибуты LogRecord, которые не являются полями extra
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение и traceback вычисляются здесь (аргументы могут измениться после вызова), поля extra сохраняются
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class StationLevelFilter(logging.Filter):
+    # Порог уровня: переопределение для станции записи или LOG_LEVEL; сэмплирование — только для станций без переопределения
+    def __init__(self, station_levels: "StationLogLevels", sample_rates: dict[str, float]):
+        super().__init__()
+        self.station_levels = station_levels
+        self.sample_rates = sample_rates
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        station_level = self.station_levels.levels.get(getattr(record, "station_id", None))
+        if station_level is not None:
+            return record.levelno >= station_level
+        if record.levelno < LOG_LEVEL:
+            return False
+        rate = self.sample_rates.get(getattr(record, "action", None))
+        if rate is not None and record.levelno < logging.WARNING:
+            if random.random() >= rate:
+                self.sampled_out += 1
+                return False
+            record.sample_rate = rate
+        return True
+
+class StationLogLevels:
+    """
+    Переопределения уровня логов по станциям: хранятся в Redis-хэше log:station_levels,
+    изменения рассылаются через шину инвалидации кэшей (канал cache:invalidate).
+    """
+
+    name = "station_log_levels"
+
+    def __init__(self):
+        self.levels: dict[str, int] = {}
+        self._redis = None
+        invalidation_bus.register(self)
+
+    def _client(self):
+        if self._redis is None:
+            self._redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+        return self._redis
+
+    def _apply(self, levels: dict[str, int]) -> None:
+        self.levels = levels
+        level = min([LOG_LEVEL, *levels.values()])
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(level)
+
+    async def reload(self, station_id: str | None = None) -> None:
+        try:
+            if station_id is None:
+                stored = await self._client().hgetall(STATION_LOG_LEVELS_KEY)
+                levels = {station: int(level) for station, level in stored.items()}
+            else:
+                level = await self._client().hget(STATION_LOG_LEVELS_KEY, station_id)
+                levels = dict(self.levels)
+                if level is None:
+                    levels.pop(station_id, None)
+                else:
+                    levels[station_id] = int(level)
+        except Exception as e:
+            logging.getLogger(__name__).warning("Не удалось загрузить уровни логов станций: %s", e)
+            return
+        self._apply(levels)
+
+    async def set_level(self, station_id: str, level: int | None) -> None:
+        # level=None снимает переопределение
+        if level is None:
+            await self._client().hdel(STATION_LOG_LEVELS_KEY, station_id)
+        else:
+            await self._client().hset(STATION_LOG_LEVELS_KEY, station_id, level)
+        await self.reload(station_id)
+        await invalidation_bus.apublish(self.name, station_id)
+
+    # Интерфейс кэша для шины инвалидации: сообщение о станции или сброс всего после переподключения
+    def delete(self, key: str) -> None:
+        self._schedule(key)
+
+    def clear(self) -> None:
+        self._schedule(None)
+
+    def _schedule(self, station_id: str | None) -> None:
+        try:
+            asyncio.get_running_loop().create_task(self.reload(station_id))
+        except RuntimeError:
+            pass
+
+station_log_levels = StationLogLevels()
+
+class LogPipeline:
+    def __init__(self):
+        self.handler: DroppingQueueHandler | None = None
+        self.filter: StationLevelFilter | None = None
+        self.listener: logging.handlers.QueueListener | None = None
+
+    def setup(self) -> None:
+        # Идемпотентно: вызывается при старте API и шлюза
+        if self.listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s %(station_id)s %(message)s", defaults={"station_id": "-"}))
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        self.filter = StationLevelFilter(station_log_levels, LOG_SAMPLE_RATES)
+        self.handler.addFilter(self.filter)
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        root.setLevel(LOG_LEVEL)
+        station_log_levels._apply(station_log_levels.levels)
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output, respect_handler_level=True)
+        self.listener.start()
+
+    def shutdown(self) -> None:
+        # Дописывает оставшиеся в очереди записи
+        if self.listener is not None:
+            self.listener.stop()
+            logging.getLogger().removeHandler(self.handler)
+            self.listener = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.handler.queue.qsize() if self.handler else 0,
+            "dropped": self.handler.dropped if self.handler else 0,
+            "sampled_out": self.filter.sampled_out if self.filter else 0,
+            "station_overrides": len(station_log_levels.levels),
+        }
+
+log_pipeline = LogPipeline()
+registry.add_collector("log", log_pipeline.stats)
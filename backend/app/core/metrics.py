@@ -0,0 +1,217 @@
+# In-process метрики в текстовом формате Prometheus (без внешних зависимостей).
+# Счётчики/гистограммы обновляются на горячем пути (O(1) + короткая блокировка), текст собирается только при
+# запросе /metrics. Метрики каждого процесса свои: при нескольких воркерах каждый отдаёт свои значения.
+import bisect
+import inspect
+import math
+import threading
+
+# Границы гистограмм задержки, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Метрика без меток отдаётся сразу (со значением 0)
+            self.labels()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Метрика без меток — один дочерний элемент с пустым набором меток
+        return self.labels()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def _render_child(self, values, child) -> list[str]:
+        return [f"{self.name}{_labels_text(self.labelnames, values)} {_number(child.value)}"]
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def _render_child(self, values, child) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), child.counts):
+            cumulative += count
+            le = 'le="' + _number(bound) + '"'
+            lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, values, le)} {cumulative}")
+        labels = _labels_text(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[tuple[str, object, str | None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        # Повторная регистрация (переимпорт модуля) возвращает существующую метрику
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, prefix: str, collect, label: str | None = None) -> None:
+        # collect() (sync или async) возвращает словарь stats(): числа становятся gauge {prefix}_{ключ};
+        # если задан label — словарь словарей, внешний ключ становится значением метки
+        self._collectors.append((prefix, collect, label))
+
+    async def _collect(self) -> list[str]:
+        families: dict[str, list[str]] = {}
+        for prefix, collect, label in self._collectors:
+            try:
+                stats = collect()
+                if inspect.isawaitable(stats):
+                    stats = await stats
+            except Exception:
+                continue
+            groups = stats.items() if label else [(None, stats)]
+            for group, values in groups:
+                for key, value in values.items():
+                    if isinstance(value, bool):
+                        value = int(value)
+                    if not isinstance(value, (int, float)):
+                        continue
+                    name = f"{prefix}_{key}"
+                    labels = _labels_text((label,), (group,)) if label else ""
+                    families.setdefault(name, []).append(f"{name}{labels} {_number(value)}")
+        lines = []
+        for name, samples in families.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+        return lines
+
+    async def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        lines.extend(await self._collect())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Метрики OCPP-шлюза (ocpp_ws_server/server.py и /ws в app/main.py) ---
+ocpp_connected_stations = registry.gauge("ocpp_connected_stations", "Станции, подключённые к этому процессу")
+ocpp_messages_total = registry.counter("ocpp_messages_total", "Входящие OCPP-вызовы от станций", ("action",))
+ocpp_message_errors_total = registry.counter("ocpp_message_errors_total", "Входящие вызовы, на которые ответили CallError", ("action",))
+ocpp_handler_seconds = registry.histogram("ocpp_handler_seconds", "Время обработки входящего вызова", ("action",))
+ocpp_remote_call_seconds = registry.histogram("ocpp_remote_call_seconds", "Время ответа станции на вызов центральной системы", ("action",))
+ocpp_remote_call_timeouts_total = registry.counter("ocpp_remote_call_timeouts_total", "Вызовы станции без ответа за response_timeout", ("action",))
+ocpp_remote_calls_pending = registry.gauge("ocpp_remote_calls_pending", "Вызовы станций, ожидающие ответа")
+ocpp_db_errors_total = registry.counter("ocpp_db_errors_total", "Ошибки БД в OCPP-обработчиках", ("action",))
+ocpp_commands_dropped_total = registry.counter("ocpp_commands_dropped_total", "Команды, вытесненные из переполненной очереди станции")
+
+# --- Хранилища ---
+redis_command_seconds = registry.histogram("redis_command_seconds", "Время команд Redis OCPP-шлюза", ("command",))
+db_query_seconds = registry.histogram("db_query_seconds", "Время SQL-запросов", ("engine",))
+db_errors_total = registry.counter("db_errors_total", "Ошибки выполнения SQL", ("engine",))
+
+# --- HTTP API ---
+http_requests_total = registry.counter("http_requests_total", "HTTP-запросы API", ("method", "route", "status"))
+http_request_seconds = registry.histogram("http_request_seconds", "Время обработки HTTP-запроса", ("method", "route"))
@@ -1,13 +1,22 @@
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import time
 import jwt
 from datetime import datetime, timedelta
 from typing import Any, Optional
+from app.core.metrics import registry
 
 # Хэширование паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt отпускает GIL, поэтому пул потоков разгружает event loop без отдельных процессов
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Сколько операций может ждать свободного потока, прежде чем новые запросы будут отклонены
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 100))
+
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "secret")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", 60))
@@ -18,6 +27,76 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    """
+    Ограниченный пул для bcrypt: не больше PASSWORD_HASH_WORKERS операций одновременно
+    и не больше PASSWORD_HASH_MAX_PENDING в очереди (сверх этого — PasswordHasherBusy).
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._semaphore: asyncio.Semaphore | None = None
+        # Метрики очереди
+        self.in_flight = 0
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.run_seconds_total = 0.0
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        queued = time.monotonic()
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            # Снимаем и при отмене ожидания (клиент отключился)
+            self.pending -= 1
+        started = time.monotonic()
+        self.wait_seconds_total += started - queued
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._semaphore.release()
+            self.in_flight -= 1
+            self.completed += 1
+            self.run_seconds_total += time.monotonic() - started
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "max_pending_seen": self.max_pending_seen,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": self.wait_seconds_total,
+            "run_seconds_total": self.run_seconds_total,
+        }
+
+password_hasher = PasswordHasher()
+registry.add_collector("password_hasher", password_hasher.stats)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(subject: str, expires_delta: Optional[timedelta] = None, extra: dict = None) -> str:
     to_encode = {"sub": subject, "iat": datetime.utcnow()}
     if extra:
@@ -0,0 +1,123 @@
+# Старт воркера API: проверка схемы, прогрев пула соединений и кэшей, состояние для /health/ready
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from app.db.session import engine, async_engine, SessionLocal
+from app.db.base_class import Base
+from app.db import models  # noqa: F401, чтобы зарегистрировать все модели
+from app.crud.ocpp import warm_tariff_cache
+from app.crud.users import warm_principal_cache
+from app.crud.locations import warm_location_index, warm_location_tiles
+
+# check — сверить ревизию БД с head миграций (по умолчанию; пустая БД поднимается `alembic upgrade head`),
+# create_all — создать таблицы по моделям и пометить БД head (локальные эксперименты), skip — ничего не проверять
+STARTUP_SCHEMA_MODE = os.getenv("STARTUP_SCHEMA_MODE", "check")
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic.ini")
+
+class StartupState:
+    def __init__(self):
+        self.ready = False
+        self.error: str | None = None
+        self.schema_revision: str | None = None
+        self.warmed: dict = {}
+        self.started_at = time.monotonic()
+        self.ready_after_seconds: float | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "schema_mode": STARTUP_SCHEMA_MODE,
+            "schema_revision": self.schema_revision,
+            "warmed": self.warmed,
+            "ready_after_seconds": self.ready_after_seconds,
+        }
+
+startup_state = StartupState()
+
+def _alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    return config
+
+def check_schema_revision() -> str | None:
+    # Одна выборка из alembic_version вместо рефлексии всех таблиц; head читается из файлов миграций
+    script = ScriptDirectory.from_config(_alembic_config())
+    head = script.get_current_head()
+    try:
+        with engine.connect() as conn:
+            revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except ProgrammingError:
+        # Таблицы alembic_version нет — БД не мигрирована
+        revision = None
+    if revision == head:
+        return revision
+    try:
+        known = script.get_revision(revision) if revision else None
+    except Exception:
+        known = None
+    if revision and known is None:
+        # БД уже мигрирована новым релизом (rolling deploy) — старый код продолжает работать
+        logger.warning("Ревизия БД %s новее head %s этого релиза", revision, head)
+        return revision
+    raise RuntimeError(f"Схема БД не обновлена: ревизия {revision}, ожидается {head}. Выполните `alembic upgrade head`")
+
+def create_all_and_stamp() -> str:
+    from alembic import command
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+    command.stamp(_alembic_config(), "head")
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+def _pool_size(pool) -> int:
+    return pool.size() if hasattr(pool, "size") else 1
+
+def warm_sync_pool() -> int:
+    # Держим сразу size соединений, чтобы пул открыл их все (TLS/аутентификация не на первых запросах)
+    size = _pool_size(engine.pool)
+    with contextlib.ExitStack() as stack:
+        for _ in range(size):
+            stack.enter_context(engine.connect()).execute(text("SELECT 1"))
+    return size
+
+async def warm_async_pool() -> int:
+    size = _pool_size(async_engine.sync_engine.pool)
+    async with contextlib.AsyncExitStack() as stack:
+        for _ in range(size):
+            conn = await stack.enter_async_context(async_engine.connect())
+            await conn.execute(text("SELECT 1"))
+    return size
+
+def warm_caches() -> dict:
+    with SessionLocal() as db:
+        return {
+            "tariffs": warm_tariff_cache(db),
+            "principals": warm_principal_cache(db),
+            "locations": warm_location_index(db),
+            "location_tiles": warm_location_tiles(db),
+        }
+
+async def run_startup() -> None:
+    # Выполняется в фоне: /health/live отвечает сразу, /health/ready — после прогрева
+    try:
+        if STARTUP_SCHEMA_MODE == "create_all":
+            startup_state.schema_revision = await asyncio.to_thread(create_all_and_stamp)
+        elif STARTUP_SCHEMA_MODE == "check":
+            startup_state.schema_revision = await asyncio.to_thread(check_schema_revision)
+        startup_state.warmed["db_pool"] = await asyncio.to_thread(warm_sync_pool)
+        startup_state.warmed["async_db_pool"] = await warm_async_pool()
+        startup_state.warmed.update(await asyncio.to_thread(warm_caches))
+        startup_state.ready = True
+        startup_state.ready_after_seconds = round(time.monotonic() - startup_state.started_at, 3)
+        logger.info("Воркер готов", extra=startup_state.as_dict())
+    except Exception as e:
+        startup_state.error = str(e)
+        logger.exception("Ошибка при старте воркера")
@@ -0,0 +1,74 @@
+# Async-версии CRUD из app/crud/clients.py
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.db.models.client import Client, ClientStatus
+from app.schemas.client import ClientCreate
+from app.core.security import get_password_hash_async, verify_password_async
+from sqlalchemy.exc import IntegrityError
+
+async def get_client_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(Client).where(Client.email == email))
+    return result.scalar_one_or_none()
+
+async def get_client_by_id(db: AsyncSession, client_id: str):
+    result = await db.execute(select(Client).where(Client.id == client_id))
+    return result.scalar_one_or_none()
+
+async def create_client(db: AsyncSession, client_in: ClientCreate):
+    hashed_password = await get_password_hash_async(client_in.password)
+    db_client = Client(
+        email=client_in.email,
+        hashed_password=hashed_password,
+        status=ClientStatus.active
+    )
+    db.add(db_client)
+    try:
+        await db.commit()
+        await db.refresh(db_client)
+    except IntegrityError:
+        await db.rollback()
+        return None
+    return db_client
+
+async def update_client(db: AsyncSession, client_id: str, client_in):
+    client = await get_client_by_id(db, client_id)
+    if not client:
+        return None
+    for field, value in client_in.model_dump(exclude_unset=True).items():
+        setattr(client, field, value)
+    try:
+        await db.commit()
+        await db.refresh(client)
+    except IntegrityError:
+        await db.rollback()
+        return None
+    return client
+
+async def change_client_password(db: AsyncSession, client_id: str, old_password: str, new_password: str):
+    client = await get_client_by_id(db, client_id)
+    if not client or not await verify_password_async(old_password, client.hashed_password):
+        return None
+    client.hashed_password = await get_password_hash_async(new_password)
+    await db.commit()
+    await db.refresh(client)
+    return client
+
+async def set_client_reset_token(db: AsyncSession, client_id: str, token: str):
+    client = await get_client_by_id(db, client_id)
+    if not client:
+        return None
+    client.reset_token = token
+    await db.commit()
+    await db.refresh(client)
+    return client
+
+async def reset_client_password(db: AsyncSession, token: str, new_password: str):
+    result = await db.execute(select(Client).where(Client.reset_token == token))
+    client = result.scalars().first()
+    if not client:
+        return None
+    client.hashed_password = await get_password_hash_async(new_password)
+    client.reset_token = None
+    await db.commit()
+    await db.refresh(client)
+    return client
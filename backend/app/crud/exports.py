@@ -0,0 +1,56 @@
+# Выгрузки больших объёмов строк (сверка для финансов): серверный курсор + чтение пачками,
+# без ORM-объектов и без накопления результата в памяти.
+import os
+from datetime import datetime
+from typing import Iterator
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.db.models.ocpp import ChargingSession, OcppTransaction
+from app.db.models.station import Station
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 2000))
+
+def charging_sessions_export_query(
+    station_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    admin_id: str | None = None
+):
+    # Период — по start_time: [since, until)
+    stmt = select(*ChargingSession.__table__.columns)
+    if admin_id:
+        stmt = stmt.join(Station, Station.id == ChargingSession.station_id).where(Station.admin_id == admin_id)
+    if station_id:
+        stmt = stmt.where(ChargingSession.station_id == station_id)
+    if since:
+        stmt = stmt.where(ChargingSession.start_time >= since)
+    if until:
+        stmt = stmt.where(ChargingSession.start_time < until)
+    return stmt.order_by(ChargingSession.start_time, ChargingSession.id)
+
+def ocpp_transactions_export_query(
+    station_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    admin_id: str | None = None
+):
+    # Период — по start_timestamp: [since, until)
+    stmt = select(*OcppTransaction.__table__.columns)
+    if admin_id:
+        stmt = stmt.join(Station, Station.id == OcppTransaction.station_id).where(Station.admin_id == admin_id)
+    if station_id:
+        stmt = stmt.where(OcppTransaction.station_id == station_id)
+    if since:
+        stmt = stmt.where(OcppTransaction.start_timestamp >= since)
+    if until:
+        stmt = stmt.where(OcppTransaction.start_timestamp < until)
+    return stmt.order_by(OcppTransaction.start_timestamp, OcppTransaction.id)
+
+def iter_export_batches(stmt, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[tuple[list[str], list]]:
+    # Генератор со своей сессией: живёт столько же, сколько StreamingResponse, а не запрос.
+    # yield_per включает серверный курсор — в памяти не больше batch_size строк.
+    with SessionLocal() as db:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+        for batch in result.partitions():
+            yield columns, batch
@@ -1,20 +1,179 @@
+import os
+from typing import NamedTuple
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.db.models.location import Location, LocationStatus
 from app.schemas.location import LocationCreate, LocationUpdate
 from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
+from app.crud.pagination import keyset_query, page_result, DEFAULT_PAGE_SIZE
+from app.core.cache import TTLCache, MISSING
+from app.core.geo import GridIndex, cluster_points, tile_bounds, tile_position
+from app.core.metrics import registry
+
+class LocationPoint(NamedTuple):
+    # Точка карты в пространственном индексе: только поля, нужные публичной карте и фильтрам
+    id: str
+    name: str
+    latitude: float
+    longitude: float
+    address: str
+    status: str
+    city: Optional[str]
+    region: Optional[str]
+    country: Optional[str]
+
+# Размер ячейки сетки в градусах (0.05° ≈ 5.5 км по широте)
+location_index = GridIndex("locations_geo", cell_deg=float(os.getenv("LOCATION_GRID_CELL_DEG", 0.05)))
+registry.add_collector("location_index", location_index.stats)
+
+# Маркеры карты по тайлам: ключ (status, z, x, y). Изменение локации сбрасывает только тайлы
+# её старой и новой позиции на каждом уровне; TTL — страховка
+LOCATION_TILE_GRID = int(os.getenv("LOCATION_TILE_GRID", 8))
+LOCATION_TILE_MAX_ZOOM = 22
+# Уровни, которые считаются заранее при старте (мелкий масштаб — самые дорогие тайлы)
+LOCATION_TILE_WARM_ZOOM = int(os.getenv("LOCATION_TILE_WARM_ZOOM", 8))
+location_tile_cache = TTLCache(
+    "location_tiles",
+    maxsize=int(os.getenv("LOCATION_TILE_CACHE_SIZE", 50000)),
+    ttl=float(os.getenv("LOCATION_TILE_CACHE_TTL", 3600))
+)
+# Фильтры статуса, для которых кэшируются тайлы (None — все статусы)
+_TILE_STATUSES = (None, *(status.value for status in LocationStatus))
+
+def _location_points_query():
+    return select(
+        Location.id, Location.name, Location.latitude, Location.longitude, Location.address,
+        Location.status, Location.city, Location.region, Location.country
+    ).where(Location.latitude.is_not(None), Location.longitude.is_not(None))
+
+def _to_point(row) -> LocationPoint:
+    status = row.status.value if hasattr(row.status, 'value') else row.status
+    return LocationPoint(row.id, row.name, row.latitude, row.longitude, row.address, status, row.city, row.region, row.country)
+
+def warm_location_index(db: Session) -> int:
+    return location_index.load(_to_point(row) for row in db.execute(_location_points_query()))
+
+def refresh_location_index(db: Session) -> None:
+    # Первый запрос строит индекс, дальше перечитываются только изменённые локации
+    if not location_index.loaded:
+        warm_location_index(db)
+        location_tile_cache.clear()
+        return
+    dirty = location_index.take_dirty()
+    if not dirty:
+        return
+    rows = {row.id: row for row in db.execute(_location_points_query().where(Location.id.in_(dirty)))}
+    for location_id in dirty:
+        row = rows.get(location_id)
+        _discard_tiles(location_index.get(location_id))
+        if row is None:
+            # Удалена или без координат
+            location_index.remove(location_id)
+        else:
+            point = _to_point(row)
+            location_index.upsert(point)
+            _discard_tiles(point)
+
+def _discard_tiles(point: Optional[LocationPoint]) -> None:
+    if point is None:
+        return
+    for z in range(LOCATION_TILE_MAX_ZOOM + 1):
+        x, y = (int(value) for value in tile_position(point.latitude, point.longitude, z))
+        for status in _TILE_STATUSES:
+            location_tile_cache.delete((status, z, x, y))
+
+def get_location_tile(db: Session, z: int, x: int, y: int, status: Optional[str] = None) -> List[dict]:
+    # Кластеризованные маркеры тайла z/x/y; пустой тайл — пустой список
+    refresh_location_index(db)
+    key = (status, z, x, y)
+    cached = location_tile_cache.get(key)
+    if cached is not MISSING:
+        return cached
+    version = location_index.version
+    matches = _point_filter(status)
+    points = [point for point in location_index.bbox(*tile_bounds(z, x, y)) if matches(point)]
+    markers = cluster_points(points, z, LOCATION_TILE_GRID).get((x, y), [])
+    # Индекс изменился во время расчёта — тайл мог устареть, не кэшируем
+    if location_index.version == version:
+        location_tile_cache.set(key, markers)
+    return markers
+
+def warm_location_tiles(db: Session, status: Optional[str] = LocationStatus.active.value) -> int:
+    # Непустые тайлы уровней 0..LOCATION_TILE_WARM_ZOOM за один проход по точкам на уровень
+    refresh_location_index(db)
+    matches = _point_filter(status)
+    points = [point for point in location_index.all() if matches(point)]
+    count = 0
+    for z in range(LOCATION_TILE_WARM_ZOOM + 1):
+        for (x, y), markers in cluster_points(points, z, LOCATION_TILE_GRID).items():
+            location_tile_cache.set((status, z, x, y), markers)
+            count += 1
+    return count
+
+def _point_filter(status=None, city=None, region=None, country=None):
+    def matches(point: LocationPoint) -> bool:
+        return (
+            (not status or point.status == status)
+            and (not city or point.city == city)
+            and (not region or point.region == region)
+            and (not country or point.country == country)
+        )
+    return matches
+
+def get_map_locations(
+    db: Session,
+    status: Optional[str] = None,
+    city: Optional[str] = None,
+    region: Optional[str] = None,
+    country: Optional[str] = None,
+    bbox: Optional[tuple[float, float, float, float]] = None
+) -> List[LocationPoint]:
+    # bbox = (min_lat, min_lon, max_lat, max_lon); без bbox — все точки с координатами
+    refresh_location_index(db)
+    points = location_index.bbox(*bbox) if bbox else location_index.all()
+    matches = _point_filter(status, city, region, country)
+    return [point for point in points if matches(point)]
+
+def get_nearest_locations(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    limit: int = 10,
+    radius_km: Optional[float] = None,
+    status: Optional[str] = None
+) -> List[tuple[float, LocationPoint]]:
+    # (расстояние в км, точка), ближайшие первыми; radius_km ограничивает поиск
+    refresh_location_index(db)
+    return location_index.nearest(latitude, longitude, limit, max_km=radius_km, predicate=_point_filter(status))
 
 def get_location_by_id(db: Session, location_id: str) -> Optional[Location]:
     result = db.execute(select(Location).where(Location.id == location_id))
     return result.scalar_one_or_none()
 
-def get_locations(db: Session, status: Optional[str] = None) -> List[Location]:
+def get_locations(
+    db: Session,
+    status: Optional[str] = None,
+    city: Optional[str] = None,
+    region: Optional[str] = None,
+    country: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order: str = "desc"
+) -> tuple[List[Location], Optional[str]]:
+    # Возвращает (страница, курсор следующей страницы); limit=None — без ограничения
     query = select(Location)
     if status:
         query = query.where(Location.status == status)
+    if city:
+        query = query.where(Location.city == city)
+    if region:
+        query = query.where(Location.region == region)
+    if country:
+        query = query.where(Location.country == country)
+    query = keyset_query(query, Location.created_at, Location.id, limit, cursor, order)
     result = db.execute(query)
-    return result.scalars().all()
+    return page_result(result.scalars().all(), Location.created_at, Location.id, limit)
 
 def create_location(db: Session, location_in: LocationCreate) -> Optional[Location]:
     db_location = Location(**location_in.model_dump())
@@ -25,6 +184,7 @@ def create_location(db: Session, location_in: LocationCreate) -> Optional[Locati
     except IntegrityError:
         db.rollback()
         return None
+    location_index.invalidate(db_location.id)
     return db_location
 
 def update_location(db: Session, location_id: str, location_in: LocationUpdate) -> Optional[Location]:
@@ -39,6 +199,7 @@ def update_location(db: Session, location_id: str, location_in: LocationUpdate)
     except IntegrityError:
         db.rollback()
         return None
+    location_index.invalidate(location_id)
     return location
 
 def delete_location(db: Session, location_id: str) -> bool:
@@ -47,4 +208,5 @@ def delete_location(db: Session, location_id: str) -> bool:
         return False
     db.delete(location)
     db.commit()
+    location_index.invalidate(location_id)
     return True
@@ -5,30 +5,50 @@ from app.schemas.maintenance import MaintenanceCreate, MaintenanceUpdate
 from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from app.db.models.station import Station
+from app.crud.pagination import keyset_query, page_result, DEFAULT_PAGE_SIZE
 
 def get_maintenance_by_id(db: Session, maintenance_id: str) -> Optional[Maintenance]:
     result = db.execute(select(Maintenance).where(Maintenance.id == maintenance_id))
     return result.scalar_one_or_none()
 
-def get_maintenances(db: Session, status: Optional[str] = None, station_id: Optional[str] = None) -> List[Maintenance]:
+def get_maintenances(
+    db: Session,
+    status: Optional[str] = None,
+    station_id: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order: str = "desc"
+) -> tuple[List[Maintenance], Optional[str]]:
+    # Возвращает (страница, курсор следующей страницы)
     query = select(Maintenance)
     if status:
         query = query.where(Maintenance.status == status)
     if station_id:
         query = query.where(Maintenance.station_id == station_id)
+    query = keyset_query(query, Maintenance.created_at, Maintenance.id, limit, cursor, order)
     result = db.execute(query)
-    return result.scalars().all()
+    return page_result(result.scalars().all(), Maintenance.created_at, Maintenance.id, limit)
 
-def get_maintenances_by_admin_id(db: Session, admin_id: str, status: Optional[str] = None) -> List[Maintenance]:
-    stations_result = db.execute(select(Station.id).where(Station.admin_id == admin_id))
-    station_ids = [row[0] for row in stations_result.all()]
-    if not station_ids:
-        return []
-    query = select(Maintenance).where(Maintenance.station_id.in_(station_ids))
+def get_maintenances_by_admin_id(
+    db: Session,
+    admin_id: str,
+    status: Optional[str] = None,
+    station_id: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order: str = "desc"
+) -> tuple[List[Maintenance], Optional[str]]:
+    # Станции admin отбираются подзапросом в том же SQL
+    query = select(Maintenance).where(
+        Maintenance.station_id.in_(select(Station.id).where(Station.admin_id == admin_id))
+    )
     if status:
         query = query.where(Maintenance.status == status)
+    if station_id:
+        query = query.where(Maintenance.station_id == station_id)
+    query = keyset_query(query, Maintenance.created_at, Maintenance.id, limit, cursor, order)
     result = db.execute(query)
-    return result.scalars().all()
+    return page_result(result.scalars().all(), Maintenance.created_at, Maintenance.id, limit)
 
 def create_maintenance(db: Session, maintenance_in: MaintenanceCreate) -> Optional[Maintenance]:
     db_maintenance = Maintenance(**maintenance_in.model_dump())
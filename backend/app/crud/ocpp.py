@@ -1,7 +1,26 @@
+import os
 from sqlalchemy.orm import Session
 from sqlalchemy import select, update, delete
 from app.db.models.ocpp import Tariff, ChargingSession
-from app.schemas.ocpp import TariffCreate, ChargingSessionCreate
+from app.schemas.ocpp import TariffCreate, ChargingSessionCreate, Tariff as TariffSnapshot
+from app.core.cache import TTLCache, MISSING
+from app.crud.pagination import keyset_query, page_result, DEFAULT_PAGE_SIZE
+
+# Активный тариф станции (station_id -> TariffSnapshot | None), сбрасывается при изменении тарифов
+tariff_cache = TTLCache(
+    "tariffs",
+    maxsize=int(os.getenv("TARIFF_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("TARIFF_CACHE_TTL", 300))
+)
+
+def active_tariff_query(station_id: str):
+    # Активный тариф — последний созданный (id разрешает совпадение created_at)
+    return (
+        select(Tariff)
+        .where(Tariff.station_id == station_id)
+        .order_by(Tariff.created_at.desc(), Tariff.id.desc())
+        .limit(1)
+    )
 
 # --- Tariff CRUD ---
 def create_tariff(db: Session, tariff_in: TariffCreate) -> Tariff:
@@ -9,6 +28,7 @@ def create_tariff(db: Session, tariff_in: TariffCreate) -> Tariff:
     db.add(tariff)
     db.commit()
     db.refresh(tariff)
+    tariff_cache.invalidate(tariff.station_id)
     return tariff
 
 def get_tariff(db: Session, tariff_id: str) -> Tariff | None:
@@ -16,20 +36,50 @@ def get_tariff(db: Session, tariff_id: str) -> Tariff | None:
     return result.scalar_one_or_none()
 
 def list_tariffs(db: Session, station_id: str | None = None) -> list[Tariff]:
-    stmt = select(Tariff)
+    stmt = select(Tariff).order_by(Tariff.created_at.desc(), Tariff.id.desc())
     if station_id:
         stmt = stmt.where(Tariff.station_id == station_id)
     result = db.execute(stmt)
     return result.scalars().all()
 
+def get_active_tariff(db: Session, station_id: str) -> TariffSnapshot | None:
+    cached = tariff_cache.get(station_id)
+    if cached is not MISSING:
+        return cached
+    tariff = db.execute(active_tariff_query(station_id)).scalar_one_or_none()
+    snapshot = TariffSnapshot.model_validate(tariff) if tariff else None
+    tariff_cache.set(station_id, snapshot)
+    return snapshot
+
+def warm_tariff_cache(db: Session) -> int:
+    # Активные тарифы всех станций одним запросом (DISTINCT ON по индексу ix_tariffs_station_created)
+    stmt = (
+        select(Tariff)
+        .distinct(Tariff.station_id)
+        .order_by(Tariff.station_id, Tariff.created_at.desc(), Tariff.id.desc())
+        .limit(tariff_cache.maxsize)
+    )
+    count = 0
+    for tariff in db.execute(stmt).scalars():
+        tariff_cache.set(tariff.station_id, TariffSnapshot.model_validate(tariff))
+        count += 1
+    return count
+
 def update_tariff(db: Session, tariff_id: str, data: dict) -> Tariff | None:
+    old_station_id = db.execute(select(Tariff.station_id).where(Tariff.id == tariff_id)).scalar_one_or_none()
     db.execute(update(Tariff).where(Tariff.id == tariff_id).values(**data))
     db.commit()
-    return get_tariff(db, tariff_id)
+    tariff = get_tariff(db, tariff_id)
+    for station_id in {old_station_id, tariff.station_id if tariff else None} - {None}:
+        tariff_cache.invalidate(station_id)
+    return tariff
 
 def delete_tariff(db: Session, tariff_id: str) -> None:
+    station_id = db.execute(select(Tariff.station_id).where(Tariff.id == tariff_id)).scalar_one_or_none()
     db.execute(delete(Tariff).where(Tariff.id == tariff_id))
     db.commit()
+    if station_id:
+        tariff_cache.invalidate(station_id)
 
 # --- ChargingSession CRUD ---
 def create_charging_session(db: Session, session_in: ChargingSessionCreate) -> ChargingSession:
@@ -43,14 +93,26 @@ def get_charging_session(db: Session, session_id: str) -> ChargingSession | None
     result = db.execute(select(ChargingSession).where(ChargingSession.id == session_id))
     return result.scalar_one_or_none()
 
-def list_charging_sessions(db: Session, user_id: str | None = None, station_id: str | None = None) -> list[ChargingSession]:
+def list_charging_sessions(
+    db: Session,
+    user_id: str | None = None,
+    station_id: str | None = None,
+    status: str | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    order: str = "desc"
+) -> tuple[list[ChargingSession], str | None]:
+    # Возвращает (страница, курсор следующей страницы)
     stmt = select(ChargingSession)
     if user_id:
         stmt = stmt.where(ChargingSession.user_id == user_id)
     if station_id:
         stmt = stmt.where(ChargingSession.station_id == station_id)
+    if status:
+        stmt = stmt.where(ChargingSession.status == status)
+    stmt = keyset_query(stmt, ChargingSession.created_at, ChargingSession.id, limit, cursor, order)
     result = db.execute(stmt)
-    return result.scalars().all()
+    return page_result(result.scalars().all(), ChargingSession.created_at, ChargingSession.id, limit)
 
 def update_charging_session(db: Session, session_id: str, data: dict) -> ChargingSession | None:
     db.execute(update(ChargingSession).where(ChargingSession.id == session_id).values(**data))
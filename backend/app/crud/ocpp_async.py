@@ -0,0 +1,166 @@
+# Async-версии CRUD из app/crud/ocpp.py для горячего пути OCPP
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.db.models.ocpp import Tariff, ChargingSession, OcppTransaction, ChargingSessionStatus
+from app.db.models.station import Station
+from app.schemas.ocpp import TariffCreate, ChargingSessionCreate, Tariff as TariffSnapshot
+from app.crud.ocpp import tariff_cache, active_tariff_query
+from app.core.cache import MISSING
+from app.crud.pagination import keyset_query, page_result, DEFAULT_PAGE_SIZE
+
+# --- Tariff CRUD ---
+async def create_tariff(db: AsyncSession, tariff_in: TariffCreate) -> Tariff:
+    tariff = Tariff(**tariff_in.model_dump())
+    db.add(tariff)
+    await db.commit()
+    await db.refresh(tariff)
+    await tariff_cache.ainvalidate(tariff.station_id)
+    return tariff
+
+async def get_tariff(db: AsyncSession, tariff_id: str) -> Tariff | None:
+    result = await db.execute(select(Tariff).where(Tariff.id == tariff_id))
+    return result.scalar_one_or_none()
+
+async def list_tariffs(db: AsyncSession, station_id: str | None = None) -> list[Tariff]:
+    stmt = select(Tariff).order_by(Tariff.created_at.desc(), Tariff.id.desc())
+    if station_id:
+        stmt = stmt.where(Tariff.station_id == station_id)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def get_active_tariff(db: AsyncSession, station_id: str) -> TariffSnapshot | None:
+    # Кэш общий с sync-версией из app/crud/ocpp.py
+    cached = tariff_cache.get(station_id)
+    if cached is not MISSING:
+        return cached
+    tariff = (await db.execute(active_tariff_query(station_id))).scalar_one_or_none()
+    snapshot = TariffSnapshot.model_validate(tariff) if tariff else None
+    tariff_cache.set(station_id, snapshot)
+    return snapshot
+
+async def update_tariff(db: AsyncSession, tariff_id: str, data: dict) -> Tariff | None:
+    old_station_id = (await db.execute(select(Tariff.station_id).where(Tariff.id == tariff_id))).scalar_one_or_none()
+    await db.execute(update(Tariff).where(Tariff.id == tariff_id).values(**data))
+    await db.commit()
+    tariff = await get_tariff(db, tariff_id)
+    for station_id in {old_station_id, tariff.station_id if tariff else None} - {None}:
+        await tariff_cache.ainvalidate(station_id)
+    return tariff
+
+async def delete_tariff(db: AsyncSession, tariff_id: str) -> None:
+    station_id = (await db.execute(select(Tariff.station_id).where(Tariff.id == tariff_id))).scalar_one_or_none()
+    await db.execute(delete(Tariff).where(Tariff.id == tariff_id))
+    await db.commit()
+    if station_id:
+        await tariff_cache.ainvalidate(station_id)
+
+# --- ChargingSession CRUD ---
+async def create_charging_session(db: AsyncSession, session_in: ChargingSessionCreate) -> ChargingSession:
+    session = ChargingSession(**session_in.model_dump())
+    db.add(session)
+    await db.commit()
+    await db.refresh(session)
+    return session
+
+async def get_charging_session(db: AsyncSession, session_id: str) -> ChargingSession | None:
+    result = await db.execute(select(ChargingSession).where(ChargingSession.id == session_id))
+    return result.scalar_one_or_none()
+
+async def list_charging_sessions(
+    db: AsyncSession,
+    user_id: str | None = None,
+    station_id: str | None = None,
+    status: str | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    order: str = "desc"
+) -> tuple[list[ChargingSession], str | None]:
+    stmt = select(ChargingSession)
+    if user_id:
+        stmt = stmt.where(ChargingSession.user_id == user_id)
+    if station_id:
+        stmt = stmt.where(ChargingSession.station_id == station_id)
+    if status:
+        stmt = stmt.where(ChargingSession.status == status)
+    stmt = keyset_query(stmt, ChargingSession.created_at, ChargingSession.id, limit, cursor, order)
+    result = await db.execute(stmt)
+    return page_result(result.scalars().all(), ChargingSession.created_at, ChargingSession.id, limit)
+
+async def update_charging_session(db: AsyncSession, session_id: str, data: dict, commit: bool = True) -> ChargingSession | None:
+    # commit=False — изменение остаётся в транзакции вызывающего (StopTransaction: сессия, баланс и агрегаты вместе)
+    await db.execute(update(ChargingSession).where(ChargingSession.id == session_id).values(**data))
+    if commit:
+        await db.commit()
+    return await get_charging_session(db, session_id)
+
+async def delete_charging_session(db: AsyncSession, session_id: str) -> None:
+    await db.execute(delete(ChargingSession).where(ChargingSession.id == session_id))
+    await db.commit()
+
+async def get_active_sessions_by_station(db: AsyncSession, station_ids: list[str]) -> dict[str, ChargingSession]:
+    # Активная сессия каждой станции одним запросом по частичному индексу ix_charging_sessions_active_station
+    if not station_ids:
+        return {}
+    result = await db.execute(
+        select(ChargingSession)
+        .where(ChargingSession.station_id.in_(station_ids), ChargingSession.status == ChargingSessionStatus.started)
+        .order_by(ChargingSession.start_time)
+    )
+    # При нескольких активных сессиях на станции (несколько коннекторов) берётся последняя начатая
+    return {session.station_id: session for session in result.scalars()}
+
+async def list_scope_station_ids(db: AsyncSession, admin_id: str) -> list[str]:
+    result = await db.execute(select(Station.id).where(Station.admin_id == admin_id))
+    return list(result.scalars())
+
+async def count_active_charging_sessions(db: AsyncSession) -> int:
+    # Частичный индекс ix_charging_sessions_active_station покрывает status = 'started'
+    result = await db.execute(
+        select(func.count()).select_from(ChargingSession).where(ChargingSession.status == ChargingSessionStatus.started)
+    )
+    return result.scalar_one()
+
+# --- OcppTransaction ---
+async def record_transaction_start(db: AsyncSession, data: dict) -> tuple[int, bool]:
+    # Возвращает (transaction_id, создана ли запись); при повторном StartTransaction — id уже сохранённой транзакции
+    stmt = (
+        pg_insert(OcppTransaction)
+        .values(**data)
+        .on_conflict_do_nothing(index_elements=['station_id', 'connector_id', 'start_timestamp'])
+        .returning(OcppTransaction.id)
+    )
+    transaction_id = (await db.execute(stmt)).scalar_one_or_none()
+    if transaction_id is not None:
+        if data.get('session_id'):
+            await db.execute(
+                update(ChargingSession)
+                .where(ChargingSession.id == data['session_id'])
+                .values(transaction_id=str(transaction_id))
+            )
+        await db.commit()
+        return transaction_id, True
+    result = await db.execute(select(OcppTransaction.id).where(
+        OcppTransaction.station_id == data['station_id'],
+        OcppTransaction.connector_id == data['connector_id'],
+        OcppTransaction.start_timestamp == data['start_timestamp'],
+    ))
+    return result.scalar_one(), False
+
+async def record_transaction_stop(db: AsyncSession, transaction_id: int, data: dict) -> tuple[OcppTransaction | None, bool]:
+    # Возвращает (транзакция, повтор ли это); повторный StopTransaction запись не меняет
+    result = await db.execute(
+        update(OcppTransaction)
+        .where(OcppTransaction.id == transaction_id, OcppTransaction.stop_timestamp.is_(None))
+        .values(**data)
+        .returning(OcppTransaction)
+    )
+    transaction = result.scalar_one_or_none()
+    if transaction is not None:
+        await db.commit()
+        return transaction, False
+    transaction = await db.get(OcppTransaction, transaction_id)
+    return transaction, transaction is not None
+
+async def get_ocpp_transaction(db: AsyncSession, transaction_id: int) -> OcppTransaction | None:
+    return await db.get(OcppTransaction, transaction_id)
@@ -0,0 +1,53 @@
+# Keyset (cursor) пагинация для списков CRUD.
+# Курсор — base64 от (значение ключа сортировки, id) последней записи страницы; следующая страница
+# выбирается условием (sort, id) < курсора (или > для asc) по индексу, без OFFSET.
+# Колонка сортировки должна быть NOT NULL: строка с NULL не проходит сравнение и выпала бы из страниц.
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_, literal
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(sort_value, id_value) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"dt": sort_value.isoformat()}
+    raw = json.dumps([sort_value, id_value], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, id_value = json.loads(raw)
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["dt"])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    return sort_value, id_value
+
+def keyset_query(query, sort_column, id_column, limit: int | None, cursor: str | None = None, order: str = "desc"):
+    # Добавляет к запросу условие курсора, сортировку (sort, id) и LIMIT limit + 1 (лишняя строка — признак следующей страницы)
+    key = tuple_(sort_column, id_column)
+    if cursor:
+        sort_value, id_value = decode_cursor(cursor)
+        bound = tuple_(literal(sort_value, sort_column.type), literal(id_value, id_column.type))
+        query = query.where(key < bound if order == "desc" else key > bound)
+    if order == "desc":
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+def page_result(rows: list, sort_column, id_column, limit: int | None) -> tuple[list, str | None]:
+    # Отрезает лишнюю строку и строит курсор следующей страницы
+    if limit is None or len(rows) <= limit:
+        return list(rows), None
+    rows = list(rows[:limit])
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
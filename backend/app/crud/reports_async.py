@@ -0,0 +1,130 @@
+# Отчёты по использованию и выручке на основе предагрегированных таблиц report_rollups_*
+# Закрытые интервалы читаются из rollup-таблиц, текущий (незакрытый) — досчитывается по charging_sessions.
+# Фильтр по admin — по текущему владельцу станции в обоих случаях: сессии станции, сменившей владельца,
+# целиком переходят к новому admin, как и в остальных ограниченных по роли списках.
+import os
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.ocpp import ChargingSession, ChargingSessionStatus
+from app.db.models.report import ReportRollupHourly, ReportRollupDaily
+from app.db.models.station import Station
+
+REPORT_TIMEZONE = ZoneInfo(os.getenv("REPORT_TIMEZONE", "Asia/Bishkek"))
+ROLLUP_MODELS = {"hour": ReportRollupHourly, "day": ReportRollupDaily}
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    # Начало часа/суток в REPORT_TIMEZONE (наивное время считается UTC)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    local = ts.astimezone(REPORT_TIMEZONE)
+    if granularity == "day":
+        local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        local = local.replace(minute=0, second=0, microsecond=0)
+    return local
+
+async def record_session_rollup(db: AsyncSession, station_id: str, stop_time: datetime, energy: float, amount: float) -> None:
+    # Инкрементально добавляет завершённую сессию в часовой и дневной агрегаты (повторный StopTransaction сюда не доходит).
+    # Не коммитит: выполняется в одной транзакции с завершением сессии и списанием баланса
+    for granularity, model in ROLLUP_MODELS.items():
+        stmt = pg_insert(model).values(
+            station_id=station_id,
+            bucket_start=bucket_start(stop_time, granularity),
+            sessions=1,
+            energy=energy or 0.0,
+            revenue=amount or 0.0,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[model.station_id, model.bucket_start],
+            set_={
+                "sessions": model.sessions + stmt.excluded.sessions,
+                "energy": model.energy + stmt.excluded.energy,
+                "revenue": model.revenue + stmt.excluded.revenue,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+
+async def _collect(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    granularity: str,
+    admin_id: str | None = None,
+    station_id: str | None = None,
+) -> list[tuple[datetime, str, int, float, float]]:
+    # (bucket_start, station_id, sessions, energy, revenue) за [start, end). start округляется вниз до начала
+    # своего интервала: первый интервал попадает в отчёт целиком, включая сессии до start
+    model = ROLLUP_MODELS[granularity]
+    start = bucket_start(start, granularity)
+    scope = select(Station.id).where(Station.admin_id == admin_id) if admin_id else None
+    current = bucket_start(datetime.now(timezone.utc), granularity)
+    rows = []
+    closed_end = min(end, current)
+    if start < closed_end:
+        stmt = select(model.bucket_start, model.station_id, model.sessions, model.energy, model.revenue).where(
+            model.bucket_start >= start, model.bucket_start < closed_end
+        )
+        if scope is not None:
+            stmt = stmt.where(model.station_id.in_(scope))
+        if station_id:
+            stmt = stmt.where(model.station_id == station_id)
+        result = await db.execute(stmt.order_by(model.bucket_start, model.station_id))
+        rows.extend(tuple(row) for row in result.all())
+    if end > current:
+        # Текущий интервал ещё не закрыт — агрегируем сырые сессии только за него
+        stmt = (
+            select(
+                ChargingSession.station_id,
+                func.count(),
+                func.coalesce(func.sum(ChargingSession.energy), 0.0),
+                func.coalesce(func.sum(ChargingSession.amount), 0.0),
+            )
+            .where(
+                ChargingSession.status == ChargingSessionStatus.stopped,
+                ChargingSession.stop_time >= max(start, current),
+                ChargingSession.stop_time < end,
+            )
+            .group_by(ChargingSession.station_id)
+            .order_by(ChargingSession.station_id)
+        )
+        if scope is not None:
+            stmt = stmt.where(ChargingSession.station_id.in_(scope))
+        if station_id:
+            stmt = stmt.where(ChargingSession.station_id == station_id)
+        result = await db.execute(stmt)
+        rows.extend((current, *row) for row in result.all())
+    return rows
+
+async def get_usage_report(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    granularity: str = "day",
+    admin_id: str | None = None,
+    station_id: str | None = None,
+) -> list[dict]:
+    rows = await _collect(db, start, end, granularity, admin_id, station_id)
+    return [
+        {"station_id": station, "usage": energy, "date": bucket.astimezone(REPORT_TIMEZONE).isoformat()}
+        for bucket, station, _, energy, _ in rows
+    ]
+
+async def get_revenue_report(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    granularity: str = "day",
+    admin_id: str | None = None,
+    station_id: str | None = None,
+) -> list[dict]:
+    totals: dict[datetime, float] = {}
+    for bucket, _, _, _, revenue in await _collect(db, start, end, granularity, admin_id, station_id):
+        totals[bucket] = totals.get(bucket, 0.0) + revenue
+    return [
+        {"revenue": revenue, "date": bucket.astimezone(REPORT_TIMEZONE).isoformat()}
+        for bucket, revenue in sorted(totals.items())
+    ]
@@ -4,12 +4,22 @@ from app.db.models.station import Station, StationStatus
 from app.schemas.station import StationCreate, StationUpdate, StationStatusUpdate
 from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
+from app.crud.pagination import keyset_query, page_result, DEFAULT_PAGE_SIZE
 
 def get_station_by_id(db: Session, station_id: str) -> Optional[Station]:
     result = db.execute(select(Station).where(Station.id == station_id))
     return result.scalar_one_or_none()
 
-def get_stations(db: Session, status: Optional[str] = None, location_id: Optional[str] = None, admin_id: Optional[str] = None) -> List[Station]:
+def get_stations(
+    db: Session,
+    status: Optional[str] = None,
+    location_id: Optional[str] = None,
+    admin_id: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order: str = "desc"
+) -> tuple[List[Station], Optional[str]]:
+    # Возвращает (страница, курсор следующей страницы)
     query = select(Station)
     if status:
         query = query.where(Station.status == status)
@@ -17,8 +27,9 @@ def get_stations(db: Session, status: Optional[str] = None, location_id: Optiona
         query = query.where(Station.location_id == location_id)
     if admin_id:
         query = query.where(Station.admin_id == admin_id)
+    query = keyset_query(query, Station.created_at, Station.id, limit, cursor, order)
     result = db.execute(query)
-    return result.scalars().all()
+    return page_result(result.scalars().all(), Station.created_at, Station.id, limit)
 
 def create_station(db: Session, station_in: StationCreate) -> Optional[Station]:
     db_station = Station(**station_in.model_dump())
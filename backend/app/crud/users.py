@@ -1,10 +1,21 @@
+import os
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.db.models.user import User, UserRole
-from app.schemas.user import UserCreate, UserCreateWithRole
+from app.schemas.user import UserCreate, UserCreateWithRole, UserOut
 from app.core.security import get_password_hash, verify_password
+from app.core.cache import TTLCache, MISSING
+from app.crud.pagination import keyset_query, page_result, DEFAULT_PAGE_SIZE
 from sqlalchemy.exc import IntegrityError
 
+# Аутентифицированные пользователи (sub -> UserOut | None) для get_current_user.
+# Короткий TTL страхует от пропущенной инвалидации (например, правки напрямую в БД)
+principal_cache = TTLCache(
+    "principals",
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+)
+
 def get_user_by_email(db: Session, email: str):
     result = db.execute(select(User).where(User.email == email))
     return result.scalar_one_or_none()
@@ -13,6 +24,29 @@ def get_user_by_id(db: Session, user_id: str):
     result = db.execute(select(User).where(User.id == user_id))
     return result.scalar_one_or_none()
 
+def get_principal(db: Session, user_id: str) -> UserOut | None:
+    cached = principal_cache.get(user_id)
+    if cached is not MISSING:
+        return cached
+    user = get_user_by_id(db, user_id)
+    principal = UserOut.model_validate(user) if user else None
+    principal_cache.set(user_id, principal)
+    return principal
+
+def warm_principal_cache(db: Session) -> int:
+    # Недавно активные пользователи (не больше размера кэша)
+    stmt = (
+        select(User)
+        .where(User.is_active.is_(True))
+        .order_by(User.updated_at.desc())
+        .limit(principal_cache.maxsize)
+    )
+    count = 0
+    for user in db.execute(stmt).scalars():
+        principal_cache.set(user.id, UserOut.model_validate(user))
+        count += 1
+    return count
+
 def create_user(db: Session, user_in: UserCreate, role: UserRole = UserRole.operator):
     hashed_password = get_password_hash(user_in.password)
     db_user = User(
@@ -44,6 +78,7 @@ def update_user(db: Session, user_id: str, user_in):
     except IntegrityError:
         db.rollback()
         return None
+    principal_cache.invalidate(user.id)
     return user
 
 def change_password(db: Session, user_id: str, old_password: str, new_password: str):
@@ -91,9 +126,20 @@ def create_operator(db: Session, user_in: UserCreate, admin_id: str):
         return None
     return db_user
 
-def get_operators_by_admin(db: Session, admin_id: str):
-    result = db.execute(select(User).where(User.role == UserRole.operator, User.admin_id == admin_id))
-    return result.scalars().all()
+def get_operators_by_admin(
+    db: Session,
+    admin_id: str | None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    order: str = "desc"
+) -> tuple[list[User], str | None]:
+    # admin_id=None — операторы всех admin (для superadmin)
+    query = select(User).where(User.role == UserRole.operator)
+    if admin_id:
+        query = query.where(User.admin_id == admin_id)
+    query = keyset_query(query, User.created_at, User.id, limit, cursor, order)
+    result = db.execute(query)
+    return page_result(result.scalars().all(), User.created_at, User.id, limit)
 
 def update_operator(db: Session, operator_id: str, user_in):
     user = get_user_by_id(db, operator_id)
@@ -107,6 +153,7 @@ def update_operator(db: Session, operator_id: str, user_in):
     except IntegrityError:
         db.rollback()
         return None
+    principal_cache.invalidate(user.id)
     return user
 
 def delete_operator(db: Session, operator_id: str):
@@ -115,5 +162,6 @@ def delete_operator(db: Session, operator_id: str):
         return None
     db.delete(user)
     db.commit()
+    principal_cache.invalidate(operator_id)
     return True
 
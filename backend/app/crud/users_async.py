@@ -0,0 +1,136 @@
+# Async-версии CRUD из app/crud/users.py
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.db.models.user import User, UserRole
+from app.schemas.user import UserCreate, UserCreateWithRole
+from app.core.security import get_password_hash_async, verify_password_async
+from app.crud.users import principal_cache
+from app.crud.pagination import keyset_query, page_result, DEFAULT_PAGE_SIZE
+from sqlalchemy.exc import IntegrityError
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalar_one_or_none()
+
+async def get_user_by_id(db: AsyncSession, user_id: str):
+    result = await db.execute(select(User).where(User.id == user_id))
+    return result.scalar_one_or_none()
+
+async def create_user(db: AsyncSession, user_in: UserCreate, role: UserRole = UserRole.operator):
+    hashed_password = await get_password_hash_async(user_in.password)
+    db_user = User(
+        email=user_in.email,
+        hashed_password=hashed_password,
+        role=role
+    )
+    db.add(db_user)
+    try:
+        await db.commit()
+        await db.refresh(db_user)
+    except IntegrityError:
+        await db.rollback()
+        return None
+    return db_user
+
+async def create_user_with_role(db: AsyncSession, user_in: UserCreateWithRole):
+    return await create_user(db, user_in, role=user_in.role)
+
+async def update_user(db: AsyncSession, user_id: str, user_in):
+    user = await get_user_by_id(db, user_id)
+    if not user:
+        return None
+    for field, value in user_in.model_dump(exclude_unset=True).items():
+        setattr(user, field, value)
+    try:
+        await db.commit()
+        await db.refresh(user)
+    except IntegrityError:
+        await db.rollback()
+        return None
+    await principal_cache.ainvalidate(user.id)
+    return user
+
+async def change_password(db: AsyncSession, user_id: str, old_password: str, new_password: str):
+    user = await get_user_by_id(db, user_id)
+    if not user or not await verify_password_async(old_password, user.hashed_password):
+        return None
+    user.hashed_password = await get_password_hash_async(new_password)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+async def set_reset_token(db: AsyncSession, user_id: str, token: str):
+    user = await get_user_by_id(db, user_id)
+    if not user:
+        return None
+    user.reset_token = token
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+async def reset_password(db: AsyncSession, token: str, new_password: str):
+    result = await db.execute(select(User).where(User.reset_token == token))
+    user = result.scalars().first()
+    if not user:
+        return None
+    user.hashed_password = await get_password_hash_async(new_password)
+    user.reset_token = None
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+async def create_operator(db: AsyncSession, user_in: UserCreate, admin_id: str):
+    hashed_password = await get_password_hash_async(user_in.password)
+    db_user = User(
+        email=user_in.email,
+        hashed_password=hashed_password,
+        role=UserRole.operator,
+        admin_id=admin_id
+    )
+    db.add(db_user)
+    try:
+        await db.commit()
+        await db.refresh(db_user)
+    except IntegrityError:
+        await db.rollback()
+        return None
+    return db_user
+
+async def get_operators_by_admin(
+    db: AsyncSession,
+    admin_id: str | None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    order: str = "desc"
+) -> tuple[list[User], str | None]:
+    # admin_id=None — операторы всех admin (для superadmin)
+    query = select(User).where(User.role == UserRole.operator)
+    if admin_id:
+        query = query.where(User.admin_id == admin_id)
+    query = keyset_query(query, User.created_at, User.id, limit, cursor, order)
+    result = await db.execute(query)
+    return page_result(result.scalars().all(), User.created_at, User.id, limit)
+
+async def update_operator(db: AsyncSession, operator_id: str, user_in):
+    user = await get_user_by_id(db, operator_id)
+    if not user:
+        return None
+    for field, value in user_in.model_dump(exclude_unset=True).items():
+        setattr(user, field, value)
+    try:
+        await db.commit()
+        await db.refresh(user)
+    except IntegrityError:
+        await db.rollback()
+        return None
+    await principal_cache.ainvalidate(user.id)
+    return user
+
+async def delete_operator(db: AsyncSession, operator_id: str):
+    user = await get_user_by_id(db, operator_id)
+    if not user:
+        return None
+    await db.delete(user)
+    await db.commit()
+    await principal_cache.ainvalidate(operator_id)
+    return True
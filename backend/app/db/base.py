@@ -4,4 +4,5 @@ from .models.station import Station
 from .models.client import Client
 from .models.location import Location
 from .models.maintenance import Maintenance
-# from .models.ocpp import Ocpp  # TODO: добавить, если появится модель
+from .models.ocpp import Tariff, ChargingSession, MeterValue, OcppTransaction
+from .models.report import ReportRollupHourly, ReportRollupDaily
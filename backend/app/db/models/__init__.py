@@ -3,5 +3,6 @@ from .station import Station
 from .client import Client
 from .location import Location
 from .maintenance import Maintenance
-# from .ocpp import Ocpp  # TODO: добавить, если появится модель
+from .ocpp import Tariff, ChargingSession, MeterValue, OcppTransaction
 
+from .report import ReportRollupHourly, ReportRollupDaily
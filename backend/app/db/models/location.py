@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, Enum as SqlEnum
+from sqlalchemy import Column, String, Float, DateTime, Enum as SqlEnum, Index
 from sqlalchemy.sql import func
 import enum
 import uuid
@@ -24,9 +24,14 @@ class Location(Base):
     client_id = Column(String)
     working_hours = Column(String)
     status = Column(SqlEnum(LocationStatus), default=LocationStatus.active, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # ключ keyset-пагинации
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
+    __table_args__ = (
+        Index('ix_locations_status_created', 'status', 'created_at', 'id'),
+        Index('ix_locations_created', 'created_at', 'id'),
+    )
+
     @property
     def geo_point(self) -> str:
         if self.latitude is not None and self.longitude is not None:
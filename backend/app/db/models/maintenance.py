@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Enum as SqlEnum, ForeignKey
+from sqlalchemy import Column, String, DateTime, Enum as SqlEnum, ForeignKey, Index
 from sqlalchemy.sql import func
 import enum
 import uuid
@@ -25,5 +25,10 @@ class Maintenance(Base):
     assigned_to = Column(String)
     notes = Column(String)
     status = Column(SqlEnum(MaintenanceStatus), default=MaintenanceStatus.pending, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # ключ keyset-пагинации
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_maintenance_station_created', 'station_id', 'created_at', 'id'),
+        Index('ix_maintenance_created', 'created_at', 'id'),
+    )
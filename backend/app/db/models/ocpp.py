@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Enum as SqlEnum
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Integer, BigInteger, Index, Sequence, UniqueConstraint, Enum as SqlEnum
+from sqlalchemy.sql import func, text
 import enum
 import uuid
 from app.db.base_class import Base
@@ -20,7 +20,12 @@ class Tariff(Base):
     station_id = Column(String, ForeignKey('stations.id'), nullable=False)
     price_per_kwh = Column(Float, nullable=False)
     currency = Column(String, default='KGS', nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # ключ выбора активного тарифа
+
+    __table_args__ = (
+        # Активный тариф станции и list_tariffs: WHERE station_id ORDER BY created_at DESC, id DESC
+        Index('ix_tariffs_station_created', 'station_id', 'created_at', 'id'),
+    )
 
 class ChargingSession(Base):
     __tablename__ = 'charging_sessions'
@@ -35,4 +40,65 @@ class ChargingSession(Base):
     transaction_id = Column(String, nullable=True)  # OCPP transaction id
     limit_type = Column(SqlEnum(LimitType), default=LimitType.none, nullable=False)
     limit_value = Column(Float, nullable=True)  # значение лимита (кВт*ч или сумма)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # ключ keyset-пагинации
+
+    __table_args__ = (
+        # Досчёт отчётов за текущий (незакрытый) интервал
+        Index('ix_charging_sessions_stop_time', 'stop_time'),
+        # Страницы list_charging_sessions: фильтр + keyset по (created_at, id)
+        Index('ix_charging_sessions_created', 'created_at', 'id'),
+        Index('ix_charging_sessions_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_charging_sessions_station_created', 'station_id', 'created_at', 'id'),
+        # Выгрузки по станции и периоду (start_time)
+        Index('ix_charging_sessions_station_start', 'station_id', 'start_time'),
+        # Активные сессии — малая доля таблицы, частичный индекс остаётся маленьким
+        Index('ix_charging_sessions_active_station', 'station_id', postgresql_where=text("status = 'started'")),
+    )
+
+class MeterValue(Base):
+    # Все сэмплы MeterValues от станций (пишутся пачками через ocpp_ws_server/meter_buffer.py)
+    __tablename__ = 'meter_values'
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    station_id = Column(String, nullable=False)
+    connector_id = Column(Integer, nullable=False)
+    transaction_id = Column(Integer, nullable=True)  # OCPP transaction id
+    timestamp = Column(DateTime(timezone=True), nullable=False)  # время замера на станции
+    measurand = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+    unit = Column(String, nullable=True)
+    phase = Column(String, nullable=True)
+    context = Column(String, nullable=True)
+    location = Column(String, nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_meter_values_station_timestamp', 'station_id', 'timestamp'),
+        Index('ix_meter_values_transaction_id', 'transaction_id'),
+    )
+
+# Идентификаторы OCPP-транзакций выдаются блоками: один nextval резервирует TRANSACTION_ID_BLOCK_SIZE id
+TRANSACTION_ID_BLOCK_SIZE = 100
+transaction_id_seq = Sequence('ocpp_transaction_id_seq', start=1, increment=TRANSACTION_ID_BLOCK_SIZE, metadata=Base.metadata)
+
+class OcppTransaction(Base):
+    __tablename__ = 'ocpp_transactions'
+    id = Column(Integer, primary_key=True, autoincrement=False)  # OCPP transactionId (int32)
+    station_id = Column(String, nullable=False)
+    connector_id = Column(Integer, nullable=False)
+    id_tag = Column(String, nullable=False)
+    session_id = Column(String, ForeignKey('charging_sessions.id'), nullable=True)
+    meter_start = Column(Float, nullable=False)  # Wh
+    start_timestamp = Column(DateTime(timezone=True), nullable=False)  # время старта на станции
+    meter_stop = Column(Float, nullable=True)  # Wh
+    stop_timestamp = Column(DateTime(timezone=True), nullable=True)
+    stop_reason = Column(String, nullable=True)
+    status = Column(SqlEnum(ChargingSessionStatus), default=ChargingSessionStatus.started, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+    __table_args__ = (
+        # Повторный StartTransaction (тот же коннектор и время старта) не создаёт новую транзакцию
+        UniqueConstraint('station_id', 'connector_id', 'start_timestamp', name='uq_ocpp_transactions_start'),
+        Index('ix_ocpp_transactions_station_start', 'station_id', 'start_timestamp'),
+        Index('ix_ocpp_transactions_start', 'start_timestamp', 'id'),
+    )
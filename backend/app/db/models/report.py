@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Float, DateTime, Integer, Index
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class ReportRollupMixin:
+    # Агрегаты завершённых сессий по станции за интервал (bucket_start — начало часа/суток в REPORT_TIMEZONE)
+    station_id = Column(String, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+    energy = Column(Float, nullable=False, default=0.0)  # kWh
+    revenue = Column(Float, nullable=False, default=0.0)  # KGS
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+class ReportRollupHourly(ReportRollupMixin, Base):
+    __tablename__ = 'report_rollups_hourly'
+    __table_args__ = (
+        Index('ix_report_rollups_hourly_bucket', 'bucket_start'),
+    )
+
+class ReportRollupDaily(ReportRollupMixin, Base):
+    __tablename__ = 'report_rollups_daily'
+    __table_args__ = (
+        Index('ix_report_rollups_daily_bucket', 'bucket_start'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, Enum as SqlEnum, ForeignKey, ARRAY
+from sqlalchemy import Column, String, Float, DateTime, Enum as SqlEnum, ForeignKey, ARRAY, Index
 from sqlalchemy.sql import func
 import enum
 import uuid
@@ -28,5 +28,12 @@ class Station(Base):
     firmware_version = Column(String)
     status = Column(SqlEnum(StationStatus), default=StationStatus.active, nullable=False)
     admin_id = Column(String, nullable=False)  # Владелец станции (admin/operator)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # ключ keyset-пагинации
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+    __table_args__ = (
+        # Станции admin (get_user_station_ids, фильтры по роли) и keyset-страницы списка
+        Index('ix_stations_admin_created', 'admin_id', 'created_at', 'id'),
+        Index('ix_stations_location_id', 'location_id'),
+        Index('ix_stations_created', 'created_at', 'id'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Enum as SqlEnum, Float
+from sqlalchemy import Column, String, Boolean, DateTime, Enum as SqlEnum, Float, Index
 from sqlalchemy.sql import func
 import enum
 import uuid
@@ -17,6 +17,11 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     role = Column(SqlEnum(UserRole), default=UserRole.operator, nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # ключ keyset-пагинации
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     admin_id = Column(String, nullable=True)  # Для operator — id admin, для других ролей — None
+
+    __table_args__ = (
+        # Операторы admin (get_operators_by_admin) с keyset по (created_at, id)
+        Index('ix_users_role_admin_created', 'role', 'admin_id', 'created_at', 'id'),
+    )
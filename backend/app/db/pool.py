@@ -0,0 +1,157 @@
+# Настройки пулов соединений с БД и метрики ожидания соединения.
+# Managed Postgres (Neon) ограничивает число соединений: на каждый воркер приходится
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) sync + (DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW) async соединений.
+# DB_PGBOUNCER=1 — режим для pgbouncer/Neon pooler в transaction pooling: без собственного пула (NullPool)
+# и без именованных server-side prepared statements у asyncpg.
+import os
+import threading
+import time
+from uuid import uuid4
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+from app.core.metrics import registry, db_query_seconds, db_errors_total
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, "1" if default else "0").lower() in ("1", "true", "yes", "on")
+
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", str(DB_POOL_SIZE)))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+# Сколько секунд ждать свободное соединение, прежде чем запрос упадёт с TimeoutError
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Neon закрывает простаивающие соединения — пересоздаём их раньше и проверяем перед выдачей
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.pool = None
+        self.checkouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe_wait(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_checkout(self, *args) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def on_checkin(self, *args) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self) -> dict:
+        pool = self.pool
+        return {
+            "pool": type(pool).__name__ if pool is not None else None,
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "idle": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+pool_metrics: dict[str, PoolMetrics] = {}
+
+class _TimedCheckoutMixin:
+    # Время _do_get — ожидание свободного соединения в очереди пула (или открытие нового)
+    def _do_get(self):
+        metrics = pool_metrics.get(self._orig_logging_name)
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if metrics is not None:
+                metrics.observe_wait(time.perf_counter() - started, timed_out)
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+class TimedNullPool(_TimedCheckoutMixin, NullPool):
+    pass
+
+def engine_options(name: str, is_async: bool = False) -> dict:
+    # Аргументы create_engine/create_async_engine для пула с именем name (sync / async)
+    options = {"pool_logging_name": name}
+    if DB_PGBOUNCER:
+        # Соединение открывается на каждый checkout, pre-ping не нужен
+        options["poolclass"] = TimedNullPool
+        if is_async:
+            # pgbouncer в transaction pooling не сохраняет prepared statements между транзакциями
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        return options
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        pool_size=DB_ASYNC_POOL_SIZE if is_async else DB_POOL_SIZE,
+        max_overflow=DB_ASYNC_MAX_OVERFLOW if is_async else DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
+
+def instrument_engine(engine, name: str) -> None:
+    # sync Engine или AsyncEngine.sync_engine; события переживают engine.dispose() (пул пересоздаётся с тем же dispatch)
+    metrics = pool_metrics.setdefault(name, PoolMetrics(name))
+    metrics.pool = engine.pool
+    event.listen(engine, "checkout", metrics.on_checkout)
+    event.listen(engine, "checkin", metrics.on_checkin)
+
+    @event.listens_for(engine, "engine_disposed")
+    def _track_recreated_pool(_engine):
+        metrics.pool = _engine.pool
+
+    # Время каждого SQL-запроса (для async-движка — вместе с ожиданием ответа asyncpg)
+    query_seconds = db_query_seconds.labels(name)
+    query_errors = db_errors_total.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _query_started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _query_finished(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        query_seconds.observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _query_failed(exception_context):
+        query_errors.inc()
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+def pool_stats() -> dict:
+    return {name: metrics.stats() for name, metrics in pool_metrics.items()}
+
+registry.add_collector("db_pool", pool_stats, label="pool")
@@ -1,17 +1,35 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from app.db.pool import engine_options, instrument_engine
+
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+def _to_async_url(url: str) -> str:
+    # postgresql+psycopg2://... -> postgresql+asyncpg://... (asyncpg понимает ssl вместо sslmode)
+    async_url = make_url(url)
+    if async_url.get_backend_name() == 'postgresql':
+        query = dict(async_url.query)
+        if 'sslmode' in query:
+            query['ssl'] = query.pop('sslmode')
+        async_url = async_url.set(drivername='postgresql+asyncpg', query=query)
+    return async_url.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or _to_async_url(DATABASE_URL)
+
 engine = create_engine(
     DATABASE_URL,
     echo=False,
-    future=True
+    future=True,
+    **engine_options("sync")
 )
+instrument_engine(engine, "sync")
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -19,6 +37,21 @@ SessionLocal = sessionmaker(
     autoflush=False
 )
 
+# Async-движок для горячего пути (OCPP-обработчики, async-эндпоинты)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    **engine_options("async", is_async=True)
+)
+instrument_engine(async_engine.sync_engine, "async")
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Dependency для FastAPI
 # Для sync-режима
 
@@ -28,3 +61,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Для async-режима
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
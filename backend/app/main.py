@@ -2,26 +2,29 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import time
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.openapi.utils import get_openapi
-from app.api import auth, clients, stations, locations, ocpp
+from app.api import auth, clients, stations, locations, maintenance, ocpp, reports, health, metrics
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from ocpp.v16 import ChargePoint as CP
-from ocpp.routing import on
-from ocpp.v16 import call_result
 from ocpp_ws_server.redis_manager import redis_manager
-from app.db.session import SessionLocal
-from app.crud.ocpp import get_charging_session, update_charging_session, list_tariffs
-from app.crud.users import get_user_by_id, update_user
-from datetime import datetime
+from ocpp_ws_server.session_store import session_store
+from ocpp_ws_server.meter_buffer import meter_buffer
+from app.core.cache import invalidation_bus
+from app.core.log import log_pipeline, station_log_levels
+from app.core.live import live_hub
+from app.core.metrics import http_requests_total, http_request_seconds, ocpp_connected_stations
+from app.core.security import PasswordHasherBusy
+from app.crud.pagination import InvalidCursor
+# Обработчики OCPP общие с автономным сервером ocpp_ws_server/server.py
+from ocpp_ws_server.server import ChargePoint, handle_pubsub_commands
 import asyncio
+from app.core.startup import run_startup
 
-# --- Импорт для автоматического создания полей ---
-from app.db.base_class import Base
-from app.db.session import engine
-from app.db import models  # noqa: F401, чтобы зарегистрировать все модели
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -60,171 +63,84 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Курсор следующей страницы в списках
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Метка — шаблон маршрута (/stations/{station_id}), а не фактический путь: число рядов метрики ограничено
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        http_requests_total.labels(request.method, path, str(status)).inc()
+        http_request_seconds.labels(request.method, path).observe(time.perf_counter() - started)
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    # Очередь bcrypt переполнена (всплеск логинов) — просим клиента повторить позже
+    return JSONResponse(status_code=503, content={"detail": "Сервис перегружен, повторите попытку"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": "Некорректный cursor"})
+
 # Подключение роутеров
 app.include_router(auth.router)
 app.include_router(clients.router)
 app.include_router(stations.router)
 app.include_router(locations.router)
+app.include_router(maintenance.router)
 app.include_router(ocpp.router)
+app.include_router(reports.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
 
-# TODO: добавить остальные роутеры (locations, maintenance, reports, ocpp)
-
-# --- Автоматическое создание полей в таблицах ---
 @app.on_event("startup")
-def on_startup():
-    with engine.begin() as conn:
-        Base.metadata.create_all(bind=conn)
-
-# --- Хранилище активных сессий и лимитов (in-memory, можно заменить на Redis) ---
-active_sessions = {}  # station_id: {session_id, energy_limit, energy_delivered}
-
-class ChargePoint(CP):
-    @on('BootNotification')
-    def on_boot_notification(self, charge_point_model, charge_point_vendor, **kwargs):
-        print(f"BootNotification from {self.id}: {charge_point_model}, {charge_point_vendor}")
-        return call_result.BootNotificationPayload(
-            current_time=datetime.utcnow().isoformat() + 'Z',
-            interval=10,
-            status='Accepted'
-        )
-
-    @on('Heartbeat')
-    def on_heartbeat(self, **kwargs):
-        print(f"Heartbeat from {self.id}")
-        return call_result.HeartbeatPayload(current_time=datetime.utcnow().isoformat())
-
-    @on('StartTransaction')
-    def on_start_transaction(self, connector_id, id_tag, meter_start, timestamp, **kwargs):
-        print(f"StartTransaction from {self.id}: connector {connector_id}, id_tag {id_tag}, meter_start {meter_start}, timestamp {timestamp}")
-        session = active_sessions.get(self.id, {})
-        session['meter_start'] = meter_start
-        session['energy_delivered'] = 0.0
-        transaction_id = int(datetime.utcnow().timestamp())
-        session['transaction_id'] = transaction_id
-        active_sessions[self.id] = session
-        transaction = {
-            "station_id": self.id,
-            "type": "start",
-            "connector_id": connector_id,
-            "id_tag": id_tag,
-            "meter_start": meter_start,
-            "timestamp": timestamp,
-            "created_at": datetime.utcnow().isoformat(),
-            "transaction_id": transaction_id
-        }
-        # TODO: если нужно, реализовать sync-логику для Redis
-        return call_result.StartTransactionPayload(
-            transaction_id=transaction_id,
-            id_tag_info={"status": "Accepted"}
-        )
-
-    @on('StopTransaction')
-    def on_stop_transaction(self, meter_stop, timestamp, transaction_id, id_tag, **kwargs):
-        print(f"StopTransaction from {self.id}: meter_stop {meter_stop}, transaction_id {transaction_id}, id_tag {id_tag}, timestamp {timestamp}")
-        session_info = active_sessions.get(self.id)
-        if self.id in active_sessions:
-            del active_sessions[self.id]
-        transaction = {
-            "station_id": self.id,
-            "type": "stop",
-            "transaction_id": transaction_id,
-            "id_tag": id_tag,
-            "meter_stop": meter_stop,
-            "timestamp": timestamp,
-            "created_at": datetime.utcnow().isoformat()
-        }
-        # TODO: если нужно, реализовать sync-логику для Redis
-        if session_info and session_info.get('session_id'):
-            session_id = session_info['session_id']
-            try:
-                db = SessionLocal()
-                charging_session = get_charging_session(db, session_id)
-                if charging_session:
-                    meter_start = session_info.get('meter_start', 0.0)
-                    energy_delivered = float(meter_stop) - float(meter_start)
-                    tariffs = list_tariffs(db, charging_session.station_id)
-                    tariff = tariffs[0] if tariffs else None
-                    amount = energy_delivered * tariff.price_per_kwh if tariff else 0.0
-                    user = get_user_by_id(db, charging_session.user_id)
-                    if user and user.balance >= amount:
-                        update_charging_session(db, session_id, {
-                            'energy': energy_delivered,
-                            'amount': amount,
-                            'status': 'stopped',
-                            'stop_time': datetime.utcnow()
-                        })
-                        user.balance -= amount
-                        db.commit()
-                    else:
-                        update_charging_session(db, session_id, {
-                            'energy': energy_delivered,
-                            'amount': amount,
-                            'status': 'error',
-                            'stop_time': datetime.utcnow()
-                        })
-                        db.commit()
-            except Exception as e:
-                print(f"[DB ERROR] Ошибка при обновлении ChargingSession/баланса: {e}")
-            finally:
-                db.close()
-        return call_result.StopTransactionPayload(
-            id_tag_info={"status": "Accepted"}
-        )
-
-    @on('MeterValues')
-    async def on_meter_values(self, connector_id, meter_value, **kwargs):
-        print(f"MeterValues from {self.id}: {meter_value}")
-        session = active_sessions.get(self.id)
-        if not session:
-            return
-        try:
-            value = meter_value[0]['sampledValue'][0]['value']
-            value = float(value)
-        except Exception:
-            return
-        meter_start = session.get('meter_start', 0.0)
-        energy_delivered = value - meter_start
-        session['energy_delivered'] = energy_delivered
-        energy_limit = session.get('energy_limit')
-        if energy_limit and energy_delivered >= energy_limit:
-            print(f"Достигнут лимит энергии {energy_delivered} >= {energy_limit}, инициируем StopTransaction!")
-            await redis_manager.publish_command(self.id, {"command": "RemoteStopTransaction"})
-        active_sessions[self.id] = session
-
-async def handle_pubsub_commands(charge_point, station_id):
-    async for command in redis_manager.listen_commands(station_id):
-        print(f"Получена команда для {station_id}: {command}")
-        if command.get("command") == "RemoteStartTransaction":
-            payload = command.get("payload", {})
-            session_id = payload.get("session_id")
-            energy_limit = payload.get("energy_limit")
-            active_sessions[station_id] = {
-                "session_id": session_id,
-                "energy_limit": energy_limit,
-                "energy_delivered": 0.0
-            }
-            response = await charge_point.call("RemoteStartTransaction", **payload)
-            print(f"Ответ на RemoteStartTransaction: {response}")
-        elif command.get("command") == "RemoteStopTransaction":
-            print(f"RemoteStopTransaction для {station_id}")
-            session = active_sessions.get(station_id, {})
-            transaction_id = session.get('transaction_id', 1)
-            await charge_point.call("StopTransaction", transaction_id=transaction_id, meter_stop=0, timestamp=datetime.utcnow().isoformat(), id_tag="system")
+async def start_background_tasks():
+    log_pipeline.setup()
+    # Подписка на инвалидацию in-process кэшей (тарифы и т.п.) от других воркеров
+    invalidation_bus.start()
+    await station_log_levels.reload()
+    redis_manager.presence.start_sweeper()
+    # Проверка ревизии схемы и прогрев в фоне: воркер сразу слушает порт, /health/ready — 503 до готовности
+    app.state.startup_task = asyncio.create_task(run_startup())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Дописываем буферизованные MeterValues перед остановкой
+    await meter_buffer.stop()
+    await redis_manager.replies.close()
+    await redis_manager.presence.close()
+    await redis_manager.events.close()
+    await live_hub.close()
+    await invalidation_bus.stop()
+    log_pipeline.shutdown()
 
 @app.websocket("/ws/{station_id}")
 async def ocpp_ws(websocket: WebSocket, station_id: str):
     await websocket.accept(subprotocol="ocpp1.6")
     charge_point = ChargePoint(station_id, websocket)
-    await redis_manager.register_station(station_id)
+    epoch = await redis_manager.register_station(station_id)
+    redis_manager.events.publish("station_status", station_id, status="connected")
     pubsub_task = asyncio.create_task(handle_pubsub_commands(charge_point, station_id))
+    ocpp_connected_stations.inc()
     try:
         await charge_point.start()
     except WebSocketDisconnect:
-        print(f"WebSocketDisconnect: {station_id}")
+        pass
     finally:
+        ocpp_connected_stations.dec()
         pubsub_task.cancel()
-        await redis_manager.unregister_station(station_id)
-        print(f"Станция отключена: {station_id}")
+        session_store.evict(station_id)
+        await redis_manager.unregister_station(station_id, epoch)
+        redis_manager.events.forget(station_id)
+        redis_manager.events.publish("station_status", station_id, status="disconnected")
+        logger.info("Станция отключена", extra={"station_id": station_id})
 
@@ -0,0 +1,38 @@
+# Кодирование пачек строк в NDJSON/CSV для потоковых выгрузок
+import csv
+import io
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Iterable, Iterator
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def iter_ndjson(batches: Iterable[tuple[list[str], list]]) -> Iterator[str]:
+    for columns, rows in batches:
+        yield "".join(
+            json.dumps({column: _plain(value) for column, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+def iter_csv(batches: Iterable[tuple[list[str], list]], columns: list[str]) -> Iterator[str]:
+    # Заголовок отдаётся сразу, даже если выборка пустая
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for _, rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(["" if value is None else _plain(value) for value in row] for row in rows)
+        yield buffer.getvalue()
@@ -13,13 +13,8 @@ try:
 except ImportError:
     pass
 
-parser = argparse.ArgumentParser(description="OCPP 1.6 WebSocket клиент")
-parser.add_argument("--chargebox_id", type=str, default=os.getenv("CHARGEBOX_ID", "DE-BERLIN-001"), help="ID станции (chargeBoxId)")
-parser.add_argument("--ocpp_url", type=str, default=os.getenv("OCPP_URL", "ws://localhost:8180/ws/DE-BERLIN-001"), help="OCPP WebSocket URL")
-args = parser.parse_args()
-
-CHARGEBOX_ID = args.chargebox_id
-OCPP_URL = args.ocpp_url
+CHARGEBOX_ID = os.getenv("CHARGEBOX_ID", "DE-BERLIN-001")
+OCPP_URL = os.getenv("OCPP_URL", "ws://localhost:8180/ws/DE-BERLIN-001")
 
 class ChargePoint(cp):
     @on('BootNotification')
@@ -37,13 +32,18 @@ class ChargePoint(cp):
         print("Heartbeat received")
         return call_result.HeartbeatPayload(current_time=datetime.utcnow().isoformat())
 
-async def main():
+async def main(chargebox_id: str = CHARGEBOX_ID, ocpp_url: str = OCPP_URL):
     async with websockets.connect(
-        OCPP_URL,
+        ocpp_url,
         subprotocols=['ocpp1.6']
     ) as ws:
-        charge_point = ChargePoint(CHARGEBOX_ID, ws)
+        charge_point = ChargePoint(chargebox_id, ws)
         await charge_point.start()
 
 if __name__ == '__main__':
-    asyncio.run(main()) 
\ No newline at end of file
+    # Разбор аргументов только при запуске скрипта: модуль импортирует нагрузочный тест (loadtest.py)
+    parser = argparse.ArgumentParser(description="OCPP 1.6 WebSocket клиент")
+    parser.add_argument("--chargebox_id", type=str, default=CHARGEBOX_ID, help="ID станции (chargeBoxId)")
+    parser.add_argument("--ocpp_url", type=str, default=OCPP_URL, help="OCPP WebSocket URL")
+    args = parser.parse_args()
+    asyncio.run(main(args.chargebox_id, args.ocpp_url)) 
\ No newline at end of file
@@ -0,0 +1,359 @@
+# Нагрузочный тест OCPP-шлюза: тысячи симулированных станций OCPP 1.6 в одном или нескольких процессах.
+# Каждая станция: BootNotification, Heartbeat с интервалом --heartbeat-interval, часть станций
+# (--charging-ratio) циклически заряжает: StartTransaction, MeterValues каждые --meter-interval, StopTransaction.
+# Отчёт: перцентили задержки ответа по типам сообщений, пропускная способность, ошибки/таймауты,
+# CPU и память сервера (по /proc, только Linux) в пересчёте на соединение.
+# Запуск из папки backend:
+#   python -m ocpp_ws_server.loadtest --stations 2000 --duration 120 --spawn-server --fake-redis
+#   python -m ocpp_ws_server.loadtest --url ws://gw:8180/ws --stations 5000 --processes 4 --server-pid 1234
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+import websockets
+from ocpp.routing import on
+from ocpp.v16 import call, call_result
+from ocpp_ws_server.client import ChargePoint
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.timeouts: dict[str, int] = {}
+        self.connected = 0
+        self.connect_failed = 0
+        self.disconnected = 0
+
+    def observe(self, action: str, seconds: float) -> None:
+        self.latencies.setdefault(action, []).append(seconds)
+
+    def error(self, action: str, timeout: bool = False) -> None:
+        target = self.timeouts if timeout else self.errors
+        target[action] = target.get(action, 0) + 1
+
+    def as_dict(self) -> dict:
+        return {
+            "latencies": self.latencies, "errors": self.errors, "timeouts": self.timeouts,
+            "connected": self.connected, "connect_failed": self.connect_failed, "disconnected": self.disconnected,
+        }
+
+    def merge(self, data: dict) -> None:
+        for action, values in data["latencies"].items():
+            self.latencies.setdefault(action, []).extend(values)
+        for name in ("errors", "timeouts"):
+            target = getattr(self, name)
+            for action, count in data[name].items():
+                target[action] = target.get(action, 0) + count
+        self.connected += data["connected"]
+        self.connect_failed += data["connect_failed"]
+        self.disconnected += data["disconnected"]
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class SimulatedChargePoint(ChargePoint):
+    # Клиент из client.py + ответы на команды центральной системы и замер задержки каждого вызова
+    def __init__(self, id, connection, stats: LoadStats, response_timeout: int = 30):
+        super().__init__(id, connection, response_timeout=response_timeout)
+        self.stats = stats
+
+    @on('RemoteStartTransaction')
+    async def on_remote_start_transaction(self, id_tag, **kwargs):
+        return call_result.RemoteStartTransactionPayload(status='Accepted')
+
+    @on('RemoteStopTransaction')
+    async def on_remote_stop_transaction(self, transaction_id, **kwargs):
+        return call_result.RemoteStopTransactionPayload(status='Accepted')
+
+    @on('StopTransaction')
+    async def on_stop_transaction(self, meter_stop, timestamp, transaction_id, **kwargs):
+        # Сервер шлёт StopTransaction станции при RemoteStopTransaction
+        return call_result.StopTransactionPayload()
+
+    async def timed_call(self, payload):
+        action = payload.__class__.__name__[:-len("Payload")]
+        started = time.perf_counter()
+        try:
+            response = await self.call(payload, suppress=False)
+        except asyncio.TimeoutError:
+            self.stats.error(action, timeout=True)
+            return None
+        except websockets.ConnectionClosed:
+            raise
+        except Exception:
+            self.stats.error(action)
+            return None
+        self.stats.observe(action, time.perf_counter() - started)
+        return response
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+async def heartbeat_loop(cp: SimulatedChargePoint, interval: float, stop_at: float):
+    await asyncio.sleep(random.uniform(0, interval))
+    while time.monotonic() < stop_at:
+        await cp.timed_call(call.HeartbeatPayload())
+        await asyncio.sleep(interval)
+
+async def charging_loop(cp: SimulatedChargePoint, args, stop_at: float):
+    meter_wh = random.randint(0, 1_000_000)
+    while True:
+        await asyncio.sleep(min(random.uniform(0.5, 1.5) * args.session_gap, max(0.0, stop_at - time.monotonic())))
+        if time.monotonic() >= stop_at:
+            return
+        response = await cp.timed_call(call.StartTransactionPayload(
+            connector_id=1, id_tag=f"{cp.id}-tag", meter_start=meter_wh, timestamp=_now()))
+        if response is None:
+            continue
+        transaction_id = response.transaction_id
+        session_end = time.monotonic() + args.session_duration
+        while time.monotonic() < min(session_end, stop_at):
+            await asyncio.sleep(args.meter_interval)
+            meter_wh += int(args.charging_power_kw * 1000 * args.meter_interval / 3600)
+            await cp.timed_call(call.MeterValuesPayload(connector_id=1, transaction_id=transaction_id, meter_value=[{
+                "timestamp": _now(),
+                "sampled_value": [{"value": str(meter_wh), "measurand": "Energy.Active.Import.Register", "unit": "Wh"}],
+            }]))
+        await cp.timed_call(call.StopTransactionPayload(
+            meter_stop=meter_wh, timestamp=_now(), transaction_id=transaction_id, reason="Local"))
+
+async def run_station(index: int, args, stats: LoadStats, start_at: float, stop_at: float):
+    # Равномерный разгон подключений за --ramp-up секунд
+    await asyncio.sleep(max(0.0, start_at + args.ramp_up * index / args.stations - time.monotonic()))
+    cp_id = f"{args.prefix}-{index:06d}"
+    try:
+        ws = await websockets.connect(f"{args.url.rstrip('/')}/{cp_id}", subprotocols=["ocpp1.6"],
+                                      ping_interval=None, open_timeout=args.timeout)
+    except Exception:
+        stats.connect_failed += 1
+        return
+    stats.connected += 1
+    cp = SimulatedChargePoint(cp_id, ws, stats, response_timeout=args.timeout)
+    listener = asyncio.create_task(cp.start())
+    tasks = []
+    try:
+        await cp.timed_call(call.BootNotificationPayload(charge_point_model="LoadTest", charge_point_vendor="EVPower"))
+        tasks.append(asyncio.create_task(heartbeat_loop(cp, args.heartbeat_interval, stop_at)))
+        charging = None
+        if index < args.stations * args.charging_ratio:
+            charging = asyncio.create_task(charging_loop(cp, args, stop_at))
+            tasks.append(charging)
+        # Станция работает до конца теста или до разрыва соединения сервером
+        await asyncio.wait([listener], timeout=max(0.0, stop_at - time.monotonic()))
+        if listener.done():
+            stats.disconnected += 1
+        elif charging:
+            # Открытая сессия успевает отправить StopTransaction
+            await asyncio.wait([charging, listener], timeout=args.timeout, return_when=asyncio.FIRST_COMPLETED)
+    except websockets.ConnectionClosed:
+        stats.disconnected += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        listener.cancel()
+        await ws.close()
+
+async def run_slice(indexes: range, args, start_wall: float) -> dict:
+    stats = LoadStats()
+    # Общее начало для всех процессов генератора: единый график разгона
+    start_at = time.monotonic() + (start_wall - time.time())
+    stop_at = start_at + args.ramp_up + args.duration
+    await asyncio.gather(*(run_station(index, args, stats, start_at, stop_at) for index in indexes))
+    return stats.as_dict()
+
+def _slice_worker(indexes: range, args, start_wall: float, results):
+    results.put(asyncio.run(run_slice(indexes, args, start_wall)))
+
+def run_generator(args) -> LoadStats:
+    start_wall = time.time() + 1.0
+    stats = LoadStats()
+    if args.processes <= 1:
+        stats.merge(asyncio.run(run_slice(range(args.stations), args, start_wall)))
+        return stats
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=_slice_worker, args=(range(i, args.stations, args.processes), args, start_wall, results))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        stats.merge(results.get())
+    for process in processes:
+        process.join()
+    return stats
+
+# --- Ресурсы сервера по /proc (процесс и все его дочерние процессы, например --workers) ---
+
+def _proc_stat(pid: int) -> tuple[int, float]:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def _proc_rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def _process_tree(root_pids: list[int]) -> list[int]:
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                parents[int(entry)] = _proc_stat(int(entry))[0]
+            except (OSError, IndexError, ValueError):
+                pass
+    tree = set(root_pids)
+    changed = True
+    while changed:
+        children = {pid for pid, ppid in parents.items() if ppid in tree}
+        changed = not children <= tree
+        tree |= children
+    return sorted(tree)
+
+def sample_server(pids: list[int]) -> dict:
+    cpu, rss = 0.0, 0
+    for pid in _process_tree(pids):
+        try:
+            cpu += _proc_stat(pid)[1]
+            rss += _proc_rss_kb(pid)
+        except (OSError, IndexError, ValueError):
+            pass
+    return {"cpu_seconds": cpu, "rss_kb": rss, "at": time.monotonic()}
+
+class ServerSampler:
+    # Замер раз в секунду в фоне: пик памяти снимается, пока станции подключены, а не после их отключения
+    def __init__(self, pids: list[int]):
+        self.pids = pids
+        self.idle = sample_server(pids)
+        self.peak_rss_kb = self.idle["rss_kb"]
+        self.last = self.idle
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(1.0):
+            self.last = sample_server(self.pids)
+            self.peak_rss_kb = max(self.peak_rss_kb, self.last["rss_kb"])
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.last = sample_server(self.pids)
+
+# --- Локальный сервер для теста ---
+
+def _wait_port(host: str, port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер не открыл порт {port} за {timeout} с")
+
+def start_fake_redis() -> str:
+    # Отдельный redis-совместимый сервер в потоке: шлюз работает с ним по TCP как с обычным Redis
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        raise SystemExit("Для --fake-redis установите fakeredis (pip install fakeredis lupa)")
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    server.daemon_threads = True
+    server.block_on_close = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return f"redis://{host}:{port}/0"
+
+def spawn_server(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    if args.fake_redis:
+        env["REDIS_URL"] = start_fake_redis()
+    port = int(args.url.rsplit(":", 1)[1].split("/")[0])
+    process = subprocess.Popen(
+        [sys.executable, "-m", "ocpp_ws_server.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.server_workers)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=None,
+    )
+    _wait_port("127.0.0.1", port, 60)
+    return process
+
+def report(stats: LoadStats, elapsed: float, sampler: ServerSampler | None, args) -> None:
+    print(f"\nСтанций: {args.stations}, подключено: {stats.connected}, ошибок подключения: {stats.connect_failed}, "
+          f"разорвано сервером: {stats.disconnected}")
+    total = sum(len(values) for values in stats.latencies.values())
+    print(f"Сообщений с ответом: {total} за {elapsed:.1f} с — {total / elapsed:.1f} msg/s")
+    print(f"\n{'сообщение':<20}{'кол-во':>10}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'max мс':>10}{'ошибки':>9}{'таймауты':>10}")
+    for action in sorted(set(stats.latencies) | set(stats.errors) | set(stats.timeouts)):
+        values = stats.latencies.get(action, [])
+        cols = [percentile(values, q) * 1000 for q in (0.5, 0.95, 0.99)] + [max(values) * 1000] if values else [0.0] * 4
+        print(f"{action:<20}{len(values):>10}" + "".join(f"{c:>10.1f}" for c in cols)
+              + f"{stats.errors.get(action, 0):>9}{stats.timeouts.get(action, 0):>10}")
+    if sampler:
+        connections = max(stats.connected, 1)
+        window = sampler.last["at"] - sampler.idle["at"]
+        cpu = sampler.last["cpu_seconds"] - sampler.idle["cpu_seconds"]
+        print(f"\nСервер: CPU {cpu:.1f} с за {window:.1f} с ({cpu / window * 100:.0f}% ядра), "
+              f"{cpu / window / connections * 1000:.3f} мс CPU/с на соединение")
+        print(f"Память: {sampler.idle['rss_kb'] / 1024:.0f} МБ до подключений, пик {sampler.peak_rss_kb / 1024:.0f} МБ, "
+              f"{(sampler.peak_rss_kb - sampler.idle['rss_kb']) / connections:.1f} КБ на соединение")
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест OCPP 1.6 шлюза")
+    parser.add_argument("--url", default="ws://127.0.0.1:8180/ws", help="Базовый URL шлюза, к нему добавляется /<id станции>")
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=1, help="Процессов генератора (станции делятся поровну)")
+    parser.add_argument("--duration", type=float, default=60, help="Секунд нагрузки после разгона")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Секунд на подключение всех станций")
+    parser.add_argument("--heartbeat-interval", type=float, default=30)
+    parser.add_argument("--charging-ratio", type=float, default=0.3, help="Доля станций, которые заряжают")
+    parser.add_argument("--session-gap", type=float, default=20, help="Средняя пауза между сессиями, с")
+    parser.add_argument("--session-duration", type=float, default=60, help="Длительность сессии, с")
+    parser.add_argument("--meter-interval", type=float, default=10, help="Интервал MeterValues во время сессии, с")
+    parser.add_argument("--charging-power-kw", type=float, default=22)
+    parser.add_argument("--timeout", type=int, default=30, help="Таймаут ответа на сообщение, с")
+    parser.add_argument("--prefix", default="LOAD", help="Префикс id станций")
+    parser.add_argument("--server-pid", type=int, action="append", default=[], help="PID процесса шлюза для замера CPU/памяти")
+    parser.add_argument("--spawn-server", action="store_true", help="Запустить ocpp_ws_server.server локально на порту из --url")
+    parser.add_argument("--server-workers", type=int, default=1, help="--workers для запускаемого сервера")
+    parser.add_argument("--fake-redis", action="store_true", help="Запустить для сервера fakeredis по TCP вместо REDIS_URL")
+    args = parser.parse_args()
+
+    server = spawn_server(args) if args.spawn_server else None
+    pids = args.server_pid + ([server.pid] if server else [])
+    try:
+        # Замер CPU начинается до разгона: подключения (handshake, BootNotification) тоже нагрузка
+        sampler = ServerSampler(pids) if pids else None
+        if sampler:
+            sampler.start()
+        started = time.monotonic()
+        stats = run_generator(args)
+        elapsed = time.monotonic() - started
+        if sampler:
+            sampler.stop()
+        report(stats, elapsed, sampler, args)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    main()
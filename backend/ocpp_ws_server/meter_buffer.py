@@ -0,0 +1,151 @@
+# meter_buffer.py
+# Write-behind буфер для MeterValues: обработчик кладёт сэмплы в ограниченную очередь,
+# фоновая задача пишет их в таблицу meter_values пачками (по размеру или по времени).
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from app.db.session import async_engine
+from app.db.models.ocpp import MeterValue
+from app.core.metrics import registry
+
+METER_BUFFER_MAX_SIZE = int(os.getenv("METER_BUFFER_MAX_SIZE", 50000))
+METER_FLUSH_BATCH_SIZE = int(os.getenv("METER_FLUSH_BATCH_SIZE", 1000))
+METER_FLUSH_INTERVAL = float(os.getenv("METER_FLUSH_INTERVAL", 2.0))
+
+logger = logging.getLogger(__name__)
+
+ENERGY_MEASURAND = 'Energy.Active.Import.Register'
+# Маркер остановки фоновой записи
+_STOP = object()
+
+def parse_timestamp(value) -> datetime:
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return datetime.now(timezone.utc)
+
+def parse_meter_values(station_id: str, connector_id: int, meter_value: list, transaction_id: int | None = None) -> list[dict]:
+    # Разворачивает payload MeterValues (ключи уже в snake_case) в строки таблицы meter_values
+    rows = []
+    for entry in meter_value or []:
+        timestamp = parse_timestamp(entry.get('timestamp'))
+        for sample in entry.get('sampled_value') or []:
+            try:
+                value = float(sample['value'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows.append({
+                'station_id': station_id,
+                'connector_id': connector_id,
+                'transaction_id': transaction_id,
+                'timestamp': timestamp,
+                'measurand': sample.get('measurand') or ENERGY_MEASURAND,
+                'value': value,
+                'unit': sample.get('unit'),
+                'phase': sample.get('phase'),
+                'context': sample.get('context'),
+                'location': sample.get('location'),
+            })
+    return rows
+
+def latest_energy_register(rows: list[dict]) -> float | None:
+    # Последнее показание счётчика активной энергии (для контроля лимита)
+    energy = [row for row in rows if row['measurand'] == ENERGY_MEASURAND]
+    if not energy:
+        return None
+    return max(energy, key=lambda row: row['timestamp'])['value']
+
+class MeterValueBuffer:
+    def __init__(self, max_size: int = METER_BUFFER_MAX_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: asyncio.Task | None = None
+        # Метрики backpressure
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+        self.max_depth = 0
+        self.last_flush_seconds = 0.0
+
+    def put(self, rows: list[dict]) -> None:
+        # Никогда не блокирует обработчик станции: при переполнении сэмплы отбрасываются и учитываются в dropped
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        for row in rows:
+            try:
+                self.queue.put_nowait(row)
+                self.enqueued += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def _collect_batch(self) -> tuple[list[dict], bool]:
+        # Пачка закрывается по размеру METER_FLUSH_BATCH_SIZE или через METER_FLUSH_INTERVAL секунд
+        batch = []
+        deadline = None
+        while len(batch) < METER_FLUSH_BATCH_SIZE:
+            if deadline is None:
+                row = await self.queue.get()
+                deadline = time.monotonic() + METER_FLUSH_INTERVAL
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._collect_batch()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[dict]) -> None:
+        started = time.monotonic()
+        try:
+            # Список параметров -> executemany одним multi-row INSERT
+            async with async_engine.begin() as conn:
+                await conn.execute(insert(MeterValue), batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Не удалось записать %d MeterValues: %s", len(batch), e)
+        finally:
+            self.flushes += 1
+            self.last_flush_seconds = time.monotonic() - started
+
+    async def stop(self) -> None:
+        # Дописывает всё, что уже в очереди, и останавливает фоновую задачу
+        if self._task is None or self._task.done():
+            return
+        await self.queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_max_size": self.queue.maxsize,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+meter_buffer = MeterValueBuffer()
+registry.add_collector("meter_buffer", meter_buffer.stats)
@@ -1,52 +1,657 @@
 # redis_manager.py
 # Асинхронный менеджер для работы с Redis: хранение подключённых станций и Pub/Sub для команд
 import redis.asyncio as redis
+import asyncio
 import json
+import logging
 import os
+import re
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from redis.asyncio.client import Pipeline
+from app.core.metrics import redis_command_seconds, ocpp_commands_dropped_total, registry
+from app.crud.pagination import InvalidCursor
+
+logger = logging.getLogger(__name__)
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Соединений с Redis на процесс шлюза и сколько ждать свободное (секунды)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 100))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 20))
+# Узел шлюза = процесс; pid различает воркеры одного хоста (OCPP_NODE_ID задаёт имя хоста/пода)
+NODE_ID = f"{os.getenv('OCPP_NODE_ID') or socket.gethostname()}:{os.getpid()}"
+# station_id -> NODE_ID процесса, к которому подключена станция
+STATION_NODES_KEY = "ocpp:station_nodes"
+# station_id -> номер подключения (растёт при каждом подключении): владение восстанавливает только последнее
+STATION_EPOCHS_KEY = "ocpp:station_epochs"
+# Команды публикуются в канал узла-владельца станции: ocpp:node:<NODE_ID>
+NODE_CHANNEL_PREFIX = "ocpp:node:"
+# Время последнего сообщения от станции: sorted set station_id -> unix time (секунды)
+PRESENCE_KEY = "ocpp:presence"
+# Станция без сообщений дольше N секунд считается отключённой и снимается sweeper'ом (Heartbeat — раз в 10 с)
+PRESENCE_TTL = float(os.getenv("OCPP_PRESENCE_TTL", 90))
+# Отметки присутствия копятся в процессе и пишутся одной пачкой раз в N секунд
+PRESENCE_FLUSH_INTERVAL = float(os.getenv("OCPP_PRESENCE_FLUSH_INTERVAL", 1))
+PRESENCE_SWEEP_INTERVAL = float(os.getenv("OCPP_PRESENCE_SWEEP_INTERVAL", 30))
+PRESENCE_SWEEP_BATCH = 1000
+# События для live-обновлений дашбордов (статусы станций, старт/стоп сессий, показания счётчиков)
+EVENTS_CHANNEL = "ocpp:events"
+# Показания счётчика одного коннектора публикуются не чаще раза в N секунд
+METER_EVENT_INTERVAL = float(os.getenv("OCPP_METER_EVENT_INTERVAL", 5))
+EVENT_QUEUE_SIZE = 10000
+# Ответы станций на команды приходят в канал процесса, отправившего команду: ocpp:reply:<NODE_ID>
+REPLY_CHANNEL_PREFIX = "ocpp:reply:"
+# Сколько API ждёт ответа станции на команду (секунды); python-ocpp ждёт ответ станции 30 секунд
+COMMAND_REPLY_TIMEOUT = float(os.getenv("OCPP_COMMAND_REPLY_TIMEOUT", 35))
+# Сколько ждать подписки на канал узла при подключении станции (секунды)
+SUBSCRIBE_TIMEOUT = float(os.getenv("OCPP_SUBSCRIBE_TIMEOUT", 5))
+# Максимум необработанных команд на одну станцию (при переполнении вытесняются самые старые)
+COMMAND_QUEUE_SIZE = int(os.getenv("OCPP_COMMAND_QUEUE_SIZE", 100))
+# Транзакции хранятся в Redis Streams: общий поток + поток на станцию (id потока упорядочены по времени)
+TRANSACTIONS_STREAM = "ocpp:tx:all"
+TRANSACTIONS_STREAM_MAXLEN = int(os.getenv("OCPP_TRANSACTIONS_MAXLEN", 1000000))
+# Курсор страницы транзакций — id записи потока (<ms>-<seq>)
+STREAM_ID_RE = re.compile(r"[0-9]+-[0-9]+")
+
+# Подключение станции: новый номер подключения и владение узлом одной операцией
+CLAIM_STATION_SCRIPT = """
+local epoch = redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('SADD', KEYS[3], ARGV[1])
+redis.call('ZADD', KEYS[4], ARGV[3], ARGV[1])
+return epoch
+"""
+
+# Восстановить владение (после снятия sweeper'ом или разрыва подписки) только для станций, чей номер
+# подключения не сменился; возвращает станции, переподключившиеся к другому узлу/соединению
+REASSERT_STATIONS_SCRIPT = """
+local lost = {}
+for i = 2, #ARGV, 2 do
+    local station_id = ARGV[i]
+    if redis.call('HGET', KEYS[2], station_id) == ARGV[i + 1] then
+        redis.call('HSET', KEYS[1], station_id, ARGV[1])
+        redis.call('SADD', KEYS[3], station_id)
+    else
+        table.insert(lost, station_id)
+    end
+end
+return lost
+"""
+
+# Отключение станции: снять владение, только если после этого соединения станция не подключалась заново
+RELEASE_CONNECTION_SCRIPT = """
+if redis.call('HGET', KEYS[4], ARGV[1]) == ARGV[2] then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('SREM', KEYS[2], ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Снять владение станцией, только если она всё ещё за этим узлом (станция могла переподключиться к другому)
+RELEASE_STATION_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('SREM', KEYS[2], ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Снять станции, молчащие дольше PRESENCE_TTL (узел упал, не сняв владение): атомарно, sweeper'ы узлов не мешают друг другу
+SWEEP_STALE_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, station_id in ipairs(stale) do
+    redis.call('ZREM', KEYS[1], station_id)
+    redis.call('SREM', KEYS[2], station_id)
+    redis.call('HDEL', KEYS[3], station_id)
+end
+return stale
+"""
+
+class StationOwnership:
+    """
+    Владение станциями этого узла: номер подключения каждой локальной станции. Запись в ocpp:station_nodes
+    делается при подключении, а повторно (присутствие, переподписка) — только если номер подключения
+    в Redis всё ещё наш: узел с устаревшей очередью не забирает станцию, переподключившуюся к другому.
+    """
+
+    def __init__(self, redis_client, node_id: str = NODE_ID):
+        self.redis = redis_client
+        self.node_id = node_id
+        self.epochs: dict[str, int] = {}
+
+    async def claim(self, station_id: str) -> int:
+        epoch = int(await self.redis.eval(
+            CLAIM_STATION_SCRIPT, 4, STATION_NODES_KEY, STATION_EPOCHS_KEY, "ocpp:stations", PRESENCE_KEY,
+            station_id, self.node_id, time.time()))
+        self.epochs[station_id] = epoch
+        return epoch
+
+    def is_current(self, station_id: str, epoch: int) -> bool:
+        return self.epochs.get(station_id) == epoch
+
+    async def release(self, station_id: str, epoch: int) -> bool:
+        if self.is_current(station_id, epoch):
+            del self.epochs[station_id]
+        return bool(await self.redis.eval(
+            RELEASE_CONNECTION_SCRIPT, 4, STATION_NODES_KEY, "ocpp:stations", PRESENCE_KEY, STATION_EPOCHS_KEY,
+            station_id, epoch))
+
+    def reassert_args(self, station_ids) -> list:
+        # Аргументы REASSERT_STATIONS_SCRIPT для станций, подключённых к этому узлу
+        args = [self.node_id]
+        for station_id in station_ids:
+            epoch = self.epochs.get(station_id)
+            if epoch is not None:
+                args += [station_id, epoch]
+        return args
+
+    def forget_lost(self, lost: list[str]) -> None:
+        for station_id in lost:
+            self.epochs.pop(station_id, None)
+        if lost:
+            logger.info("Станции переподключились к другому узлу", extra={"stations": lost})
+
+    async def reassert(self, station_ids) -> list[str]:
+        args = self.reassert_args(station_ids)
+        if len(args) == 1:
+            return []
+        lost = await self.redis.eval(
+            REASSERT_STATIONS_SCRIPT, 3, STATION_NODES_KEY, STATION_EPOCHS_KEY, "ocpp:stations", *args)
+        self.forget_lost(lost)
+        return lost
+
+class CommandDispatcher:
+    """
+    Одна подписка на канал своего узла ocpp:node:<NODE_ID> на процесс: команды получает только процесс,
+    к которому подключена станция. Входящие команды раскладываются по локальным очередям станций.
+    """
+
+    def __init__(self, redis_client, node_id: str = NODE_ID, ownership: StationOwnership | None = None):
+        self.redis = redis_client
+        self.node_id = node_id
+        self.ownership = ownership or StationOwnership(redis_client, node_id)
+        self.queues: dict[str, asyncio.Queue] = {}
+        self._task: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+        # Ответы {"status": "dropped"} на вытесненные команды (ссылки держим до завершения публикации)
+        self._drop_replies: set[asyncio.Task] = set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_subscribed(self):
+        # Владение станцией записывается только после подписки — иначе команда уйдёт в пустой канал
+        self.start()
+        await asyncio.wait_for(self._subscribed.wait(), timeout=SUBSCRIBE_TIMEOUT)
+
+    def register(self, station_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=COMMAND_QUEUE_SIZE)
+        # При переподключении станции новая очередь замещает старую
+        self.queues[station_id] = queue
+        self.start()
+        return queue
+
+    def unregister(self, station_id: str, queue: asyncio.Queue):
+        if self.queues.get(station_id) is queue:
+            del self.queues[station_id]
+
+    async def _run(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(f"{NODE_CHANNEL_PREFIX}{self.node_id}")
+                if self.queues:
+                    # После разрыва подписки публикация могла снять владение станциями — восстанавливаем,
+                    # кроме станций, успевших переподключиться к другому узлу
+                    await self.ownership.reassert(list(self.queues))
+                self._subscribed.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Подписка на команды прервана, переподключение: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                self._subscribed.clear()
+                await pubsub.aclose()
+
+    def _dispatch(self, data: str):
+        try:
+            message = json.loads(data)
+            station_id, command = message["station_id"], message["command"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Некорректная команда: %s", data)
+            return
+        queue = self.queues.get(station_id)
+        if queue is None:
+            # Станция уже отключилась от этого узла
+            return
+        if queue.full():
+            self._drop(station_id, queue.get_nowait())
+        queue.put_nowait(command)
+
+    def _drop(self, station_id: str, command: dict):
+        # Вытесненная команда не выполнится: отправитель сразу получает dropped, а не ждёт таймаута
+        ocpp_commands_dropped_total.inc()
+        logger.warning("Очередь команд станции переполнена, команда отброшена",
+                       extra={"station_id": station_id, "action": command.get("command")})
+        if not command.get("reply_to") or not command.get("correlation_id"):
+            return
+        reply = {"status": "dropped", "error": "Очередь команд станции переполнена",
+                 "correlation_id": command["correlation_id"]}
+        task = asyncio.create_task(self.redis.publish(command["reply_to"], json.dumps(reply)))
+        self._drop_replies.add(task)
+        task.add_done_callback(self._drop_replies.discard)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class ReplyWaiter:
+    """
+    Одна подписка на канал ответов ocpp:reply:<NODE_ID> на процесс. Ответ шлюза сопоставляется
+    с ожидающим запросом по correlation_id; ответы на уже брошенные (по таймауту) запросы отбрасываются.
+    """
+
+    def __init__(self, redis_client, node_id: str = NODE_ID):
+        self.redis = redis_client
+        self.channel = f"{REPLY_CHANNEL_PREFIX}{node_id}"
+        self.pending: dict[str, asyncio.Future] = {}
+        self._task: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_subscribed(self):
+        # Команда публикуется только после подписки — иначе быстрый ответ уйдёт в пустой канал
+        self.start()
+        await asyncio.wait_for(self._subscribed.wait(), timeout=SUBSCRIBE_TIMEOUT)
+
+    def expect(self, correlation_id: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[correlation_id] = future
+        return future
+
+    def discard(self, correlation_id: str):
+        self.pending.pop(correlation_id, None)
+
+    async def _run(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._subscribed.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._resolve(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Подписка на ответы станций прервана, переподключение: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                self._subscribed.clear()
+                await pubsub.aclose()
+
+    def _resolve(self, data: str):
+        try:
+            reply = json.loads(data)
+            correlation_id = reply.pop("correlation_id")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.warning("Некорректный ответ на команду: %s", data)
+            return
+        future = self.pending.pop(correlation_id, None)
+        if future is not None and not future.done():
+            future.set_result(reply)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class EventPublisher:
+    """
+    События OCPP-обработчиков копятся в локальной очереди и публикуются фоновой задачей пачками
+    (один pipeline PUBLISH) — обработчик станции не ждёт Redis. Доставка best effort: при переполнении
+    очереди старые события вытесняются.
+    """
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.queue: deque[str] = deque(maxlen=EVENT_QUEUE_SIZE)
+        self.published = 0
+        self.dropped = 0
+        self.throttled = 0
+        self._meter_sent: dict[tuple[str, int], float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def publish(self, event_type: str, station_id: str, **fields):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        event = {"type": event_type, "station_id": station_id, "ts": datetime.now(timezone.utc).isoformat(), **fields}
+        self.queue.append(json.dumps(event, default=str))
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def publish_meter(self, station_id: str, connector_id: int, **fields):
+        # Не чаще METER_EVENT_INTERVAL на коннектор: промежуточные показания дашборду не нужны
+        now = time.monotonic()
+        key = (station_id, connector_id)
+        if now - self._meter_sent.get(key, float("-inf")) < METER_EVENT_INTERVAL:
+            self.throttled += 1
+            return
+        self._meter_sent[key] = now
+        self.publish("meter", station_id, connector_id=connector_id, **fields)
+
+    def forget(self, station_id: str):
+        for key in [key for key in self._meter_sent if key[0] == station_id]:
+            del self._meter_sent[key]
+
+    async def flush(self):
+        while self.queue:
+            batch = [self.queue.popleft() for _ in range(min(len(self.queue), 500))]
+            pipe = self.redis.pipeline(transaction=False)
+            for message in batch:
+                pipe.publish(EVENTS_CHANNEL, message)
+            await pipe.execute()
+            self.published += len(batch)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Не удалось опубликовать события: %s", e)
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("Не удалось опубликовать события: %s", e)
+
+    def stats(self) -> dict:
+        return {"queued": len(self.queue), "published": self.published, "dropped": self.dropped, "throttled": self.throttled}
+
+class PresenceTracker:
+    """
+    Отметки «станция на связи» (любое входящее сообщение) копятся в словаре — на станцию хранится
+    только последняя — и раз в PRESENCE_FLUSH_INTERVAL пишутся одним ZADD в ocpp:presence.
+    Sweeper снимает станции, молчащие дольше PRESENCE_TTL.
+    """
+
+    def __init__(self, redis_client, node_id: str = NODE_ID, events: EventPublisher | None = None,
+                 ownership: StationOwnership | None = None):
+        self.redis = redis_client
+        self.node_id = node_id
+        self.events = events
+        self.ownership = ownership or StationOwnership(redis_client, node_id)
+        self.pending: dict[str, float] = {}
+        self.flushes = 0
+        self.swept = 0
+        self._flush_task: asyncio.Task | None = None
+        self._sweep_task: asyncio.Task | None = None
+
+    def touch(self, station_id: str):
+        self.pending[station_id] = time.time()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def forget(self, station_id: str):
+        # Станция отключилась: неотправленная отметка не должна вернуть ей владение
+        self.pending.pop(station_id, None)
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            # GT: отметка другого узла (станция переподключилась) не откатывается назад
+            pipe.zadd(PRESENCE_KEY, batch, gt=True)
+            # Sweeper мог снять станцию, пока она молчала, — она снова на связи с этим узлом
+            # (если с тех пор не переподключилась к другому)
+            args = self.ownership.reassert_args(batch)
+            if len(args) > 1:
+                pipe.eval(REASSERT_STATIONS_SCRIPT, 3, STATION_NODES_KEY, STATION_EPOCHS_KEY, "ocpp:stations", *args)
+            results = await pipe.execute()
+            if len(args) > 1:
+                self.ownership.forget_lost(results[-1])
+            self.flushes += 1
+        except Exception as e:
+            logger.warning("Не удалось записать присутствие станций: %s", e)
+            for station_id, seen_at in batch.items():
+                self.pending.setdefault(station_id, seen_at)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(PRESENCE_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def sweep(self) -> list[str]:
+        stale = await self.redis.eval(
+            SWEEP_STALE_SCRIPT, 3, PRESENCE_KEY, "ocpp:stations", STATION_NODES_KEY,
+            time.time() - PRESENCE_TTL, PRESENCE_SWEEP_BATCH)
+        if stale:
+            self.swept += len(stale)
+            logger.info("Сняты молчащие станции", extra={"stations": stale})
+            if self.events is not None:
+                for station_id in stale:
+                    self.events.publish("station_status", station_id, status="stale")
+        return stale
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(PRESENCE_SWEEP_INTERVAL)
+            try:
+                # Пачками, пока есть устаревшие
+                while len(await self.sweep()) == PRESENCE_SWEEP_BATCH:
+                    pass
+            except Exception as e:
+                logger.warning("Ошибка очистки присутствия станций: %s", e)
+
+    def start_sweeper(self):
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        for task in (self._flush_task, self._sweep_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._flush_task = self._sweep_task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {"pending": len(self.pending), "flushes": self.flushes, "swept": self.swept}
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            redis_command_seconds.labels("PIPELINE").observe(time.perf_counter() - started)
+
+class InstrumentedRedis(redis.Redis):
+    # Время каждой команды Redis по имени команды (метрика redis_command_seconds)
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            redis_command_seconds.labels(str(args[0]).upper()).observe(time.perf_counter() - started)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
 
 class RedisOcppManager:
     def __init__(self):
-        self.redis = redis.from_url(REDIS_URL, decode_responses=True)
+        # При всплеске подключений команды ждут свободное соединение, а не падают с MaxConnectionsError
+        pool = redis.BlockingConnectionPool.from_url(
+            REDIS_URL, decode_responses=True, max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT)
+        self.redis = InstrumentedRedis(connection_pool=pool)
+        self.node_id = NODE_ID
+        self.ownership = StationOwnership(self.redis, self.node_id)
+        self.dispatcher = CommandDispatcher(self.redis, self.node_id, self.ownership)
+        self.replies = ReplyWaiter(self.redis, self.node_id)
+        self.events = EventPublisher(self.redis)
+        self.presence = PresenceTracker(self.redis, self.node_id, self.events, self.ownership)
+
+    async def register_station(self, station_id: str) -> int:
+        # Возвращает номер подключения — его передают в unregister_station при отключении
+        await self.dispatcher.wait_subscribed()
+        return await self.ownership.claim(station_id)
 
-    async def register_station(self, station_id: str):
-        await self.redis.sadd("ocpp:stations", station_id)
+    async def unregister_station(self, station_id: str, epoch: int):
+        if self.ownership.is_current(station_id, epoch):
+            # Неотправленная отметка не должна вернуть владение; при переподключении к этому же узлу её не трогаем
+            self.presence.forget(station_id)
+        await self.ownership.release(station_id, epoch)
 
-    async def unregister_station(self, station_id: str):
-        await self.redis.srem("ocpp:stations", station_id)
+    async def _release_station(self, station_id: str, node_id: str) -> bool:
+        return bool(await self.redis.eval(
+            RELEASE_STATION_SCRIPT, 3, STATION_NODES_KEY, "ocpp:stations", PRESENCE_KEY, station_id, node_id))
 
     async def get_stations(self):
         return await self.redis.smembers("ocpp:stations")
 
-    async def publish_command(self, station_id: str, command: dict):
-        channel = f"ocpp:cmd:{station_id}"
-        await self.redis.publish(channel, json.dumps(command))
+    async def get_presence(self, seen_within: float | None = None) -> list[tuple[str, float]]:
+        # (station_id, время последнего сообщения); seen_within — только станции, писавшие за последние N секунд
+        since = time.time() - seen_within if seen_within is not None else "-inf"
+        return await self.redis.zrangebyscore(PRESENCE_KEY, since, "+inf", withscores=True)
+
+    async def get_last_seen(self, station_id: str) -> float | None:
+        return await self.redis.zscore(PRESENCE_KEY, station_id)
+
+    async def get_station_statuses(self, station_ids: list[str]) -> list[tuple[bool, float | None]]:
+        # (подключена, время последнего сообщения) для каждой станции за один round-trip
+        if not station_ids:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.smismember("ocpp:stations", station_ids)
+        pipe.zmscore(PRESENCE_KEY, station_ids)
+        connected, last_seen = await pipe.execute()
+        return [(bool(member), seen) for member, seen in zip(connected, last_seen)]
+
+    async def get_station_node(self, station_id: str) -> str | None:
+        return await self.redis.hget(STATION_NODES_KEY, station_id)
+
+    async def publish_command(self, station_id: str, command: dict) -> int:
+        # Команда уходит только узлу-владельцу станции; возвращает число получателей (0 — станция не подключена)
+        node_id = await self.get_station_node(station_id)
+        if node_id is None:
+            return 0
+        message = json.dumps({"station_id": station_id, "command": command})
+        receivers = await self.redis.publish(f"{NODE_CHANNEL_PREFIX}{node_id}", message)
+        if receivers == 0:
+            # Узел упал, не сняв владение: чистим запись, чтобы станция не числилась подключённой
+            await self._release_station(station_id, node_id)
+        return receivers
+
+    async def call_station(self, station_id: str, command: dict, timeout: float = COMMAND_REPLY_TIMEOUT) -> dict:
+        # Команда с correlation_id и каналом ответа; ждём, пока шлюз опубликует ответ станции.
+        # Ответ: {"status": "completed" | "rejected" | "error" | "timeout" | "not_connected" | "dropped", "result"?, "error"?}
+        await self.replies.wait_subscribed()
+        correlation_id = uuid.uuid4().hex
+        future = self.replies.expect(correlation_id)
+        try:
+            receivers = await self.publish_command(
+                station_id, {**command, "correlation_id": correlation_id, "reply_to": self.replies.channel})
+            if not receivers:
+                return {"status": "not_connected"}
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return {"status": "timeout"}
+        finally:
+            self.replies.discard(correlation_id)
+
+    async def publish_reply(self, channel: str, correlation_id: str, reply: dict):
+        await self.redis.publish(channel, json.dumps({**reply, "correlation_id": correlation_id}, default=str))
 
     async def listen_commands(self, station_id: str):
-        channel = f"ocpp:cmd:{station_id}"
-        pubsub = self.redis.pubsub()
-        await pubsub.subscribe(channel)
-        async for message in pubsub.listen():
-            if message["type"] == "message":
-                yield json.loads(message["data"])
+        queue = self.dispatcher.register(station_id)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.dispatcher.unregister(station_id, queue)
 
     async def add_transaction(self, station_id: str, transaction: dict):
-        key = f"ocpp:transactions:{station_id}"
-        await self.redis.rpush(key, json.dumps(transaction))
-
-    async def get_transactions(self, station_id: str = None):
-        if station_id:
-            key = f"ocpp:transactions:{station_id}"
-            txs = await self.redis.lrange(key, 0, -1)
-            return [json.loads(tx) for tx in txs]
+        data = json.dumps(transaction)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xadd(TRANSACTIONS_STREAM, {"station_id": station_id, "data": data},
+                  maxlen=TRANSACTIONS_STREAM_MAXLEN, approximate=True)
+        pipe.xadd(f"ocpp:tx:station:{station_id}", {"data": data},
+                  maxlen=TRANSACTIONS_STREAM_MAXLEN, approximate=True)
+        await pipe.execute()
+
+    async def get_transactions(
+        self,
+        station_id: str = None,
+        since_ms: int = None,
+        until_ms: int = None,
+        cursor: str = None,
+        limit: int = 100,
+        reverse: bool = False
+    ) -> tuple[list[dict], str | None]:
+        # Страница транзакций по курсору (id записи потока) с фильтром по времени [since_ms, until_ms]
+        if cursor and not STREAM_ID_RE.fullmatch(cursor):
+            raise InvalidCursor(cursor)
+        key = f"ocpp:tx:station:{station_id}" if station_id else TRANSACTIONS_STREAM
+        lower = str(since_ms) if since_ms is not None else "-"
+        upper = str(until_ms) if until_ms is not None else "+"
+        if reverse:
+            if cursor:
+                upper = f"({cursor}"
+            entries = await self.redis.xrevrange(key, max=upper, min=lower, count=limit)
         else:
-            # Получить все ключи транзакций
-            keys = await self.redis.keys("ocpp:transactions:*")
-            all_txs = []
-            for key in keys:
-                txs = await self.redis.lrange(key, 0, -1)
-                all_txs.extend([json.loads(tx) for tx in txs])
-            return all_txs
-
-redis_manager = RedisOcppManager() 
\ No newline at end of file
+            if cursor:
+                lower = f"({cursor}"
+            entries = await self.redis.xrange(key, min=lower, max=upper, count=limit)
+        transactions = []
+        for entry_id, fields in entries:
+            transaction = json.loads(fields["data"])
+            transaction["id"] = entry_id
+            transactions.append(transaction)
+        next_cursor = entries[-1][0] if len(entries) == limit else None
+        return transactions, next_cursor
+
+redis_manager = RedisOcppManager()
+registry.add_collector("ocpp_presence", redis_manager.presence.stats)
+registry.add_collector("ocpp_events", redis_manager.events.stats)
@@ -3,71 +3,197 @@ import asyncio
 from websockets.server import serve
 from ocpp.v16 import ChargePoint as CP
 from ocpp.routing import on
-from ocpp.v16 import call_result
+from ocpp.v16 import call, call_result
+from ocpp.charge_point import camel_to_snake_case, snake_to_camel_case, remove_nones
+from ocpp.exceptions import OCPPError
 from ocpp_ws_server.redis_manager import redis_manager
+from ocpp_ws_server.session_store import session_store, DEFAULT_CONNECTOR_ID
+from ocpp_ws_server.meter_buffer import meter_buffer, parse_meter_values, latest_energy_register, parse_timestamp
+from ocpp_ws_server.transaction_ids import transaction_id_allocator
+from app.core.cache import invalidation_bus
+from app.core.log import log_pipeline, station_log_levels
+from app.core.metrics import (
+    registry, CONTENT_TYPE, ocpp_connected_stations, ocpp_messages_total, ocpp_message_errors_total,
+    ocpp_handler_seconds, ocpp_remote_call_seconds, ocpp_remote_call_timeouts_total, ocpp_remote_calls_pending,
+    ocpp_db_errors_total
+)
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from app.db.session import SessionLocal
-from app.crud.ocpp import get_charging_session, update_charging_session, list_tariffs
-from app.crud.users import get_user_by_id, update_user
-from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
+from app.db.session import AsyncSessionLocal
+from app.crud.ocpp_async import (
+    get_charging_session, update_charging_session, get_active_tariff,
+    record_transaction_start, record_transaction_stop, count_active_charging_sessions
+)
+from app.crud.users_async import get_user_by_id
+from app.crud.reports_async import record_session_rollup
+from dataclasses import asdict
+from datetime import datetime, timezone
+import argparse
+import logging
+import time
+from http import HTTPStatus
+import multiprocessing
+import signal
+from websockets.exceptions import ConnectionClosed
 
-# --- Хранилище активных сессий и лимитов (in-memory, можно заменить на Redis) ---
-active_sessions = {}  # station_id: {session_id, energy_limit, energy_delivered}
+OCPP_WS_HOST = os.getenv("OCPP_WS_HOST", "0.0.0.0")
+OCPP_WS_PORT = int(os.getenv("OCPP_WS_PORT", 8180))
+OCPP_WS_WORKERS = int(os.getenv("OCPP_WS_WORKERS", 1))
+# Отдельный порт /metrics для каждого воркера (порт + номер воркера); без него /metrics отдаётся на порту шлюза
+OCPP_METRICS_PORT = int(os.getenv("OCPP_METRICS_PORT", 0)) or None
+# Число активных сессий берётся из БД не чаще раза в N секунд
+ACTIVE_SESSIONS_REFRESH_SECONDS = float(os.getenv("ACTIVE_SESSIONS_REFRESH_SECONDS", 15))
+
+# Явное имя: при запуске файлом __name__ == "__main__"
+logger = logging.getLogger("ocpp_ws_server.server")
 
 class ChargePoint(CP):
+    # Входящие вызовы станции обрабатываются по одному (route_message ждёт обработчик),
+    # поэтому текущий action можно держать в атрибуте — по нему _send считает ответы CallError
+    _handling_action = None
+
+    async def _handle_call(self, msg):
+        self._handling_action = msg.action
+        # Любое входящее сообщение — отметка присутствия (пишется в Redis пачкой)
+        redis_manager.presence.touch(self.id)
+        ocpp_messages_total.labels(msg.action).inc()
+        started = time.perf_counter()
+        try:
+            return await super()._handle_call(msg)
+        finally:
+            ocpp_handler_seconds.labels(msg.action).observe(time.perf_counter() - started)
+            self._handling_action = None
+
+    async def _send(self, message):
+        if self._handling_action and message.startswith("[4"):
+            ocpp_message_errors_total.labels(self._handling_action).inc()
+        await super()._send(message)
+
+    async def call(self, payload, *args, **kwargs):
+        # Вызов центральной системы на станцию: время ответа, таймауты, число ожидающих ответа
+        action = payload.__class__.__name__[:-len("Payload")]
+        ocpp_remote_calls_pending.inc()
+        started = time.perf_counter()
+        try:
+            response = await super().call(payload, *args, **kwargs)
+        except asyncio.TimeoutError:
+            ocpp_remote_call_timeouts_total.labels(action).inc()
+            raise
+        finally:
+            ocpp_remote_calls_pending.dec()
+        ocpp_remote_call_seconds.labels(action).observe(time.perf_counter() - started)
+        return response
+
     @on('BootNotification')
     async def on_boot_notification(self, charge_point_model, charge_point_vendor, **kwargs):
-        print(f"BootNotification from {self.id}: {charge_point_model}, {charge_point_vendor}")
+        logger.info("BootNotification", extra={"station_id": self.id, "action": "BootNotification",
+                                               "model": charge_point_model, "vendor": charge_point_vendor})
         return call_result.BootNotificationPayload(
-            current_time='2024-06-01T12:00:00Z',
+            current_time=datetime.utcnow().isoformat() + 'Z',
             interval=10,
             status='Accepted'
         )
 
     @on('Heartbeat')
     async def on_heartbeat(self, **kwargs):
-        from datetime import datetime
-        print(f"Heartbeat from {self.id}")
+        logger.info("Heartbeat", extra={"station_id": self.id, "action": "Heartbeat"})
         return call_result.HeartbeatPayload(current_time=datetime.utcnow().isoformat())
 
+    @on('StatusNotification')
+    async def on_status_notification(self, connector_id, error_code, status, **kwargs):
+        logger.info("StatusNotification", extra={"station_id": self.id, "action": "StatusNotification",
+                                                 "connector_id": connector_id, "status": status, "error_code": error_code})
+        redis_manager.events.publish("connector_status", self.id, connector_id=connector_id, status=status, error_code=error_code)
+        return call_result.StatusNotificationPayload()
+
     @on('StartTransaction')
     async def on_start_transaction(self, connector_id, id_tag, meter_start, timestamp, **kwargs):
-        from datetime import datetime
-        print(f"StartTransaction from {self.id}: connector {connector_id}, id_tag {id_tag}, meter_start {meter_start}, timestamp {timestamp}")
-        # Сохраняем стартовые данные сессии
-        session = active_sessions.get(self.id, {})
-        session['meter_start'] = meter_start
-        session['energy_delivered'] = 0.0
-        # Генерируем и сохраняем transaction_id
-        transaction_id = int(datetime.utcnow().timestamp())  # Простой вариант, можно заменить на UUID/int
-        session['transaction_id'] = transaction_id
-        active_sessions[self.id] = session
-        transaction = {
-            "station_id": self.id,
-            "type": "start",
-            "connector_id": connector_id,
-            "id_tag": id_tag,
-            "meter_start": meter_start,
-            "timestamp": timestamp,
-            "created_at": datetime.utcnow().isoformat(),
-            "transaction_id": transaction_id
-        }
-        await redis_manager.add_transaction(self.id, transaction)
+        logger.info("StartTransaction", extra={"station_id": self.id, "action": "StartTransaction", "connector_id": connector_id,
+                                               "id_tag": id_tag, "meter_start": meter_start, "timestamp": timestamp})
+        session = await session_store.get(self.id, connector_id) or {}
+        transaction_id, created = None, True
+        try:
+            # Уникальный transaction_id из блока, зарезервированного в последовательности Postgres
+            transaction_id = await transaction_id_allocator.allocate()
+            async with AsyncSessionLocal() as db:
+                # Повторный StartTransaction получает id уже сохранённой транзакции
+                transaction_id, created = await record_transaction_start(db, {
+                    'id': transaction_id,
+                    'station_id': self.id,
+                    'connector_id': connector_id,
+                    'id_tag': id_tag,
+                    'session_id': session.get('session_id'),
+                    'meter_start': meter_start,
+                    'start_timestamp': parse_timestamp(timestamp),
+                })
+        except Exception:
+            ocpp_db_errors_total.labels("StartTransaction").inc()
+            logger.exception("Ошибка при сохранении OcppTransaction", extra={"station_id": self.id, "action": "StartTransaction"})
+            if transaction_id is None:
+                # Postgres недоступен и блок id не зарезервирован — станция всё равно получает уникальный id
+                transaction_id = await transaction_id_allocator.allocate_fallback()
+        # Сохраняем стартовые данные сессии (дополняют session_id/energy_limit из RemoteStartTransaction)
+        await session_store.update(
+            self.id, connector_id,
+            meter_start=meter_start,
+            energy_delivered=0.0,
+            transaction_id=transaction_id
+        )
+        if created:
+            transaction = {
+                "station_id": self.id,
+                "type": "start",
+                "connector_id": connector_id,
+                "id_tag": id_tag,
+                "meter_start": meter_start,
+                "timestamp": timestamp,
+                "created_at": datetime.utcnow().isoformat(),
+                "transaction_id": transaction_id
+            }
+            await redis_manager.add_transaction(self.id, transaction)
+            redis_manager.events.publish("session_started", self.id, connector_id=connector_id, transaction_id=transaction_id,
+                                         session_id=session.get('session_id'), meter_start=meter_start)
+        else:
+            logger.warning("Повторный StartTransaction", extra={"station_id": self.id, "action": "StartTransaction",
+                                                               "transaction_id": transaction_id})
         return call_result.StartTransactionPayload(
             transaction_id=transaction_id,
             id_tag_info={"status": "Accepted"}
         )
 
     @on('StopTransaction')
-    async def on_stop_transaction(self, meter_stop, timestamp, transaction_id, id_tag, **kwargs):
-        from datetime import datetime
-        print(f"StopTransaction from {self.id}: meter_stop {meter_stop}, transaction_id {transaction_id}, id_tag {id_tag}, timestamp {timestamp}")
-        session_info = active_sessions.get(self.id)
-        if self.id in active_sessions:
-            del active_sessions[self.id]
+    async def on_stop_transaction(self, meter_stop, timestamp, transaction_id, id_tag=None, reason=None, **kwargs):
+        logger.info("StopTransaction", extra={"station_id": self.id, "action": "StopTransaction", "meter_stop": meter_stop,
+                                              "transaction_id": transaction_id, "id_tag": id_tag, "timestamp": timestamp})
+        ocpp_transaction, duplicate = None, False
+        try:
+            async with AsyncSessionLocal() as db:
+                ocpp_transaction, duplicate = await record_transaction_stop(db, transaction_id, {
+                    'meter_stop': meter_stop,
+                    'stop_timestamp': parse_timestamp(timestamp),
+                    'stop_reason': reason,
+                    'status': 'stopped',
+                })
+        except Exception:
+            ocpp_db_errors_total.labels("StopTransaction").inc()
+            logger.exception("Ошибка при сохранении OcppTransaction", extra={"station_id": self.id, "action": "StopTransaction"})
+        if duplicate:
+            # Повторный StopTransaction: транзакция уже закрыта и оплачена
+            logger.warning("Повторный StopTransaction", extra={"station_id": self.id, "action": "StopTransaction",
+                                                              "transaction_id": transaction_id})
+            return call_result.StopTransactionPayload(
+                id_tag_info={"status": "Accepted"}
+            )
+        connector_id, session_info = await session_store.find(self.id, transaction_id=transaction_id)
+        if connector_id is not None:
+            await session_store.pop(self.id, connector_id)
+        if not session_info and ocpp_transaction:
+            # Состояние в Redis потеряно — восстанавливаем из сохранённой транзакции
+            session_info = {
+                'session_id': ocpp_transaction.session_id,
+                'meter_start': ocpp_transaction.meter_start,
+            }
         transaction = {
             "station_id": self.id,
             "type": "stop",
@@ -78,110 +204,253 @@ class ChargePoint(CP):
             "created_at": datetime.utcnow().isoformat()
         }
         await redis_manager.add_transaction(self.id, transaction)
+        meter_start = (session_info or {}).get('meter_start')
+        redis_manager.events.publish(
+            "session_stopped", self.id, connector_id=connector_id, transaction_id=transaction_id, reason=reason,
+            session_id=(session_info or {}).get('session_id'), meter_stop=meter_stop,
+            energy_delivered=float(meter_stop) - float(meter_start) if meter_start is not None else None)
         # --- Интеграция с БД ---
         if session_info and session_info.get('session_id'):
             session_id = session_info['session_id']
             try:
-                db = SessionLocal()
-                charging_session = await get_charging_session(db, session_id)
-                if charging_session:
-                    meter_start = session_info.get('meter_start', 0.0)
-                    energy_delivered = float(meter_stop) - float(meter_start)
-                    tariffs = await list_tariffs(db, charging_session.station_id)
-                    tariff = tariffs[0] if tariffs else None
-                    amount = energy_delivered * tariff.price_per_kwh if tariff else 0.0
-                    # Проверяем хватает ли средств
-                    user = await get_user_by_id(db, charging_session.user_id)
-                    if user and user.balance >= amount:
-                        # Обновляем сессию и списываем средства
-                        await update_charging_session(db, session_id, {
-                            'energy': energy_delivered,
-                            'amount': amount,
-                            'status': 'stopped',
-                            'stop_time': datetime.utcnow()
-                        })
-                        user.balance -= amount
-                        await db.commit()
-                    else:
-                        # Недостаточно средств: помечаем сессию как error, средства не списываем
-                        await update_charging_session(db, session_id, {
-                            'energy': energy_delivered,
-                            'amount': amount,
-                            'status': 'error',
-                            'stop_time': datetime.utcnow()
-                        })
-                        await db.commit()
-            except Exception as e:
-                print(f"[DB ERROR] Ошибка при обновлении ChargingSession/баланса: {e}")
-            finally:
-                db.close()
+                async with AsyncSessionLocal() as db:
+                    charging_session = await get_charging_session(db, session_id)
+                    if charging_session:
+                        meter_start = session_info.get('meter_start', 0.0)
+                        energy_delivered = float(meter_stop) - float(meter_start)
+                        # Активный тариф из кэша: без обращения к БД на горячем пути
+                        tariff = await get_active_tariff(db, charging_session.station_id)
+                        amount = energy_delivered * tariff.price_per_kwh if tariff else 0.0
+                        # Проверяем хватает ли средств
+                        user = await get_user_by_id(db, charging_session.user_id)
+                        stop_time = datetime.now(timezone.utc)
+                        if user and user.balance >= amount:
+                            # Обновляем сессию, списываем средства и добавляем сессию в агрегаты отчётов —
+                            # одной транзакцией, чтобы оплаченная сессия не выпала из отчётов
+                            await update_charging_session(db, session_id, {
+                                'energy': energy_delivered,
+                                'amount': amount,
+                                'status': 'stopped',
+                                'stop_time': stop_time
+                            }, commit=False)
+                            user.balance -= amount
+                            await record_session_rollup(db, charging_session.station_id, stop_time, energy_delivered, amount)
+                            await db.commit()
+                        else:
+                            # Недостаточно средств: помечаем сессию как error, средства не списываем
+                            await update_charging_session(db, session_id, {
+                                'energy': energy_delivered,
+                                'amount': amount,
+                                'status': 'error',
+                                'stop_time': stop_time
+                            })
+                            await db.commit()
+            except Exception:
+                ocpp_db_errors_total.labels("StopTransaction").inc()
+                logger.exception("Ошибка при обновлении ChargingSession/баланса",
+                                 extra={"station_id": self.id, "action": "StopTransaction", "session_id": session_id})
         return call_result.StopTransactionPayload(
             id_tag_info={"status": "Accepted"}
         )
 
     @on('MeterValues')
-    async def on_meter_values(self, connector_id, meter_value, **kwargs):
-        # Обработка показаний счетчика для контроля лимита
-        print(f"MeterValues from {self.id}: {meter_value}")
-        session = active_sessions.get(self.id)
-        if not session:
-            return
-        try:
-            value = meter_value[0]['sampledValue'][0]['value']
-            value = float(value)
-        except Exception:
-            return
+    async def on_meter_values(self, connector_id, meter_value, transaction_id=None, **kwargs):
+        # Все сэмплы сохраняются через write-behind буфер, последнее показание энергии — для контроля лимита
+        if connector_id:
+            session = await session_store.get(self.id, connector_id)
+        else:
+            # connector_id=0 — общий счётчик станции
+            connector_id, session = await session_store.find(self.id)
+        if transaction_id is None and session:
+            transaction_id = session.get('transaction_id')
+        samples = parse_meter_values(self.id, connector_id or 0, meter_value, transaction_id)
+        # Полный payload — только на DEBUG (например, при переопределении уровня для станции)
+        logger.info("MeterValues", extra={"station_id": self.id, "action": "MeterValues", "connector_id": connector_id,
+                                          "transaction_id": transaction_id, "samples": len(samples)})
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("MeterValues payload", extra={"station_id": self.id, "action": "MeterValues", "payload": meter_value})
+        meter_buffer.put(samples)
+        value = latest_energy_register(samples)
+        if not session or value is None:
+            if value is not None:
+                redis_manager.events.publish_meter(self.id, connector_id or 0, transaction_id=transaction_id, energy_register=value)
+            return call_result.MeterValuesPayload()
         meter_start = session.get('meter_start', 0.0)
         energy_delivered = value - meter_start
-        session['energy_delivered'] = energy_delivered
+        redis_manager.events.publish_meter(self.id, connector_id, transaction_id=transaction_id, energy_register=value,
+                                           energy_delivered=energy_delivered, session_id=session.get('session_id'))
+        await session_store.update(self.id, connector_id, energy_delivered=energy_delivered)
         energy_limit = session.get('energy_limit')
         # --- Автоматическая остановка при достижении лимита ---
         if energy_limit and energy_delivered >= energy_limit:
-            print(f"Достигнут лимит энергии {energy_delivered} >= {energy_limit}, инициируем StopTransaction!")
+            logger.info("Достигнут лимит энергии, инициируем StopTransaction", extra={
+                "station_id": self.id, "action": "MeterValues", "energy_delivered": energy_delivered, "energy_limit": energy_limit})
             # Инициируем StopTransaction через Pub/Sub (чтобы обработать в on_stop_transaction)
-            await redis_manager.publish_command(self.id, {"command": "RemoteStopTransaction"})
-        active_sessions[self.id] = session
+            await redis_manager.publish_command(self.id, {
+                "command": "RemoteStopTransaction",
+                "payload": {"connectorId": connector_id}
+            })
+        return call_result.MeterValuesPayload()
+
+_active_sessions = {"value": None, "at": 0.0}
+
+async def active_sessions_stats() -> dict:
+    if _active_sessions["value"] is None or time.monotonic() - _active_sessions["at"] > ACTIVE_SESSIONS_REFRESH_SECONDS:
+        async with AsyncSessionLocal() as db:
+            _active_sessions["value"] = await count_active_charging_sessions(db)
+        _active_sessions["at"] = time.monotonic()
+    return {"active": _active_sessions["value"]}
+
+registry.add_collector("charging_sessions", active_sessions_stats)
+
+async def metrics_request(path, request_headers):
+    # HTTP-запрос к порту шлюза до WebSocket-рукопожатия: /metrics отдаётся без апгрейда соединения
+    if path == "/metrics":
+        body = await registry.render()
+        return HTTPStatus.OK, [("Content-Type", CONTENT_TYPE)], body.encode()
+    return None
+
+async def _metrics_only(path, request_headers):
+    response = await metrics_request(path, request_headers)
+    return response or (HTTPStatus.NOT_FOUND, [], b"")
+
+# Поля команды RemoteStartTransaction для шлюза (лимит сессии), не передаются станции
+SESSION_PAYLOAD_FIELDS = ("session_id", "energy_limit")
+
+async def execute_command(charge_point, station_id: str, command: dict) -> dict:
+    # Выполняет команду на станции и возвращает её ответ (OCPP camelCase); CallError станции — OCPPError
+    action = command.get("command")
+    payload = command.get("payload") or {}
+    if action == "RemoteStartTransaction":
+        await session_store.replace(station_id, payload.get("connectorId", DEFAULT_CONNECTOR_ID), {
+            "session_id": payload.get("session_id"),
+            "energy_limit": payload.get("energy_limit"),
+            "energy_delivered": 0.0
+        })
+        payload = {key: value for key, value in payload.items() if key not in SESSION_PAYLOAD_FIELDS}
+    elif action == "RemoteStopTransaction" and "transactionId" not in payload:
+        # Используем сохранённый transaction_id
+        connector_id = payload.get("connectorId")
+        if connector_id is not None:
+            session = await session_store.get(station_id, connector_id)
+        else:
+            connector_id, session = await session_store.find(station_id)
+        payload = {"transactionId": (session or {}).get('transaction_id', 1)}
+    payload_class = getattr(call, f"{action}Payload", None)
+    if payload_class is None:
+        raise ValueError(f"Неизвестная команда: {action}")
+    response = await charge_point.call(payload_class(**camel_to_snake_case(payload)), suppress=False)
+    return snake_to_camel_case(remove_nones(asdict(response)))
 
 async def handle_pubsub_commands(charge_point, station_id):
     async for command in redis_manager.listen_commands(station_id):
-        print(f"Получена команда для {station_id}: {command}")
-        if command.get("command") == "RemoteStartTransaction":
-            payload = command.get("payload", {})
-            session_id = payload.get("session_id")
-            energy_limit = payload.get("energy_limit")
-            active_sessions[station_id] = {
-                "session_id": session_id,
-                "energy_limit": energy_limit,
-                "energy_delivered": 0.0
-            }
-            response = await charge_point.call("RemoteStartTransaction", **payload)
-            print(f"Ответ на RemoteStartTransaction: {response}")
-        elif command.get("command") == "RemoteStopTransaction":
-            print(f"RemoteStopTransaction для {station_id}")
-            # Используем сохранённый transaction_id
-            session = active_sessions.get(station_id, {})
-            transaction_id = session.get('transaction_id', 1)
-            await charge_point.call("StopTransaction", transaction_id=transaction_id, meter_stop=0, timestamp=datetime.utcnow().isoformat(), id_tag="system")
-        # TODO: добавить обработку других команд
+        action = command.get("command")
+        logger.info("Получена команда", extra={"station_id": station_id, "action": action, "payload": command.get("payload")})
+        try:
+            result = await execute_command(charge_point, station_id, command)
+            reply = {"status": "completed", "result": result}
+        except asyncio.TimeoutError:
+            reply = {"status": "timeout"}
+        except OCPPError as e:
+            # Станция ответила CallError
+            reply = {"status": "rejected", "error": f"{e.__class__.__name__}: {e.description}"}
+        except (ValueError, TypeError) as e:
+            # Неизвестная команда или payload не по схеме OCPP
+            reply = {"status": "error", "error": str(e)}
+        except Exception as e:
+            logger.exception("Ошибка выполнения команды", extra={"station_id": station_id, "action": action})
+            reply = {"status": "error", "error": str(e)}
+        logger.info("Ответ на команду", extra={"station_id": station_id, "action": action, "response": reply})
+        # Команды из call_station ждут ответ в канале отправителя
+        if command.get("reply_to"):
+            try:
+                await redis_manager.publish_reply(command["reply_to"], command["correlation_id"], reply)
+            except Exception as e:
+                logger.warning("Не удалось отправить ответ на команду: %s", e, extra={"station_id": station_id, "action": action})
 
 async def handler(websocket):
     # Получаем cp_id из пути подключения
     cp_id = websocket.path.split('/')[-1]
-    print(f"Новое подключение: {cp_id}")
+    logger.info("Новое подключение", extra={"station_id": cp_id})
     charge_point = ChargePoint(cp_id, websocket)
-    await redis_manager.register_station(cp_id)
+    epoch = await redis_manager.register_station(cp_id)
+    redis_manager.events.publish("station_status", cp_id, status="connected")
     pubsub_task = asyncio.create_task(handle_pubsub_commands(charge_point, cp_id))
+    ocpp_connected_stations.inc()
     try:
         await charge_point.start()
+    except ConnectionClosed:
+        # Обычное отключение станции, не ошибка обработчика
+        pass
     finally:
         pubsub_task.cancel()
-        await redis_manager.unregister_station(cp_id)
-        print(f"Станция отключена: {cp_id}")
+        session_store.evict(cp_id)
+        ocpp_connected_stations.dec()
+        await redis_manager.unregister_station(cp_id, epoch)
+        redis_manager.events.forget(cp_id)
+        redis_manager.events.publish("station_status", cp_id, status="disconnected")
+        logger.info("Станция отключена", extra={"station_id": cp_id})
+
+async def main(host: str = OCPP_WS_HOST, port: int = OCPP_WS_PORT, reuse_port: bool = False, metrics_port: int | None = None):
+    log_pipeline.setup()
+    invalidation_bus.start()
+    await station_log_levels.reload()
+    redis_manager.presence.start_sweeper()
+    if metrics_port:
+        await serve(handler, host, metrics_port, process_request=_metrics_only)
+    # reuse_port: несколько процессов слушают один порт, ядро распределяет между ними новые подключения
+    async with serve(handler, host, port, subprotocols=["ocpp1.6"], reuse_port=reuse_port, process_request=metrics_request):
+        logger.info("OCPP-шлюз запущен", extra={"node_id": redis_manager.node_id, "url": f"ws://{host}:{port}/ws/{{cp_id}}"})
+        try:
+            await asyncio.Future()  # run forever
+        finally:
+            await meter_buffer.stop()
+            await redis_manager.presence.close()
+            await redis_manager.events.close()
+            log_pipeline.shutdown()
+
+def run_worker(host: str, port: int, metrics_port: int | None = None):
+    # Точка входа процесса-воркера (spawn): свой event loop, свои соединения и свой NODE_ID
+    try:
+        asyncio.run(main(host, port, reuse_port=True, metrics_port=metrics_port))
+    except KeyboardInterrupt:
+        pass
 
-async def main():
-    async with serve(handler, "0.0.0.0", 8180, subprotocols=["ocpp1.6"]):
-        print("======== Running on ws://0.0.0.0:8180/ws/{cp_id} ========")
-        await asyncio.Future()  # run forever
+def run_workers(workers: int, host: str, port: int, metrics_port: int | None = None):
+    # Каждый воркер — отдельный узел шлюза: владеет своими станциями (ocpp:station_nodes) и получает
+    # команды только для них через свой канал ocpp:node:<NODE_ID>
+    # SIGTERM (systemd/docker stop) завершает и воркеры, а не оставляет их сиротами
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    context = multiprocessing.get_context("spawn")
+    # Метрики у каждого воркера свои: воркер i отдаёт /metrics на metrics_port + i
+    processes = [
+        context.Process(target=run_worker, args=(host, port, metrics_port + i if metrics_port else None), daemon=True)
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
 
 if __name__ == '__main__':
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="OCPP 1.6 WebSocket шлюз")
+    parser.add_argument("--host", default=OCPP_WS_HOST)
+    parser.add_argument("--port", type=int, default=OCPP_WS_PORT)
+    parser.add_argument("--workers", type=int, default=OCPP_WS_WORKERS,
+                        help="Число процессов на одном порту (SO_REUSEPORT, только Linux/BSD)")
+    parser.add_argument("--metrics-port", type=int, default=OCPP_METRICS_PORT,
+                        help="Порт /metrics первого воркера (воркер i — порт + i)")
+    args = parser.parse_args()
+    if args.workers > 1:
+        run_workers(args.workers, args.host, args.port, args.metrics_port)
+    else:
+        asyncio.run(main(args.host, args.port, metrics_port=args.metrics_port)) 
\ No newline at end of file
@@ -0,0 +1,111 @@
+# session_store.py
+# Состояние активных сессий зарядки в Redis (hash на коннектор) с локальным write-through кэшем.
+# Позволяет обслуживать OCPP несколькими процессами и не терять лимиты/transaction_id при рестарте.
+import json
+import os
+from ocpp_ws_server.redis_manager import redis_manager
+
+SESSION_STATE_TTL = int(os.getenv("OCPP_SESSION_STATE_TTL", 7 * 24 * 3600))
+DEFAULT_CONNECTOR_ID = 1
+
+class SessionStateStore:
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        # (station_id, connector_id) -> state; кэшируется только полное состояние
+        self._cache: dict[tuple[str, int], dict] = {}
+        # station_id -> set(connector_id) с активным состоянием
+        self._connectors: dict[str, set[int]] = {}
+
+    @staticmethod
+    def _key(station_id: str, connector_id: int) -> str:
+        return f"ocpp:session:{station_id}:{connector_id}"
+
+    @staticmethod
+    def _connectors_key(station_id: str) -> str:
+        return f"ocpp:session:{station_id}:connectors"
+
+    @staticmethod
+    def _encode(state: dict) -> dict:
+        return {field: json.dumps(value) for field, value in state.items()}
+
+    @staticmethod
+    def _decode(raw: dict) -> dict:
+        return {field: json.loads(value) for field, value in raw.items()}
+
+    async def get(self, station_id: str, connector_id: int = DEFAULT_CONNECTOR_ID) -> dict | None:
+        cached = self._cache.get((station_id, connector_id))
+        if cached is not None:
+            return dict(cached)
+        raw = await self.redis.hgetall(self._key(station_id, connector_id))
+        if not raw:
+            return None
+        state = self._decode(raw)
+        self._cache[(station_id, connector_id)] = state
+        return dict(state)
+
+    async def get_connectors(self, station_id: str) -> set[int]:
+        connectors = self._connectors.get(station_id)
+        if connectors is None:
+            members = await self.redis.smembers(self._connectors_key(station_id))
+            connectors = {int(c) for c in members}
+            self._connectors[station_id] = connectors
+        return set(connectors)
+
+    async def find(self, station_id: str, transaction_id=None) -> tuple[int | None, dict | None]:
+        # Поиск состояния по transaction_id, либо первого активного коннектора станции
+        for connector_id in sorted(await self.get_connectors(station_id)):
+            state = await self.get(station_id, connector_id)
+            if state is None:
+                continue
+            if transaction_id is None or str(state.get("transaction_id")) == str(transaction_id):
+                return connector_id, state
+        return None, None
+
+    async def update(self, station_id: str, connector_id: int = DEFAULT_CONNECTOR_ID, **fields) -> None:
+        key = self._key(station_id, connector_id)
+        connectors_key = self._connectors_key(station_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(key, mapping=self._encode(fields))
+        pipe.expire(key, SESSION_STATE_TTL)
+        pipe.sadd(connectors_key, connector_id)
+        pipe.expire(connectors_key, SESSION_STATE_TTL)
+        await pipe.execute()
+        cached = self._cache.get((station_id, connector_id))
+        if cached is not None:
+            cached.update(fields)
+        if station_id in self._connectors:
+            self._connectors[station_id].add(connector_id)
+
+    async def replace(self, station_id: str, connector_id: int, state: dict) -> None:
+        key = self._key(station_id, connector_id)
+        connectors_key = self._connectors_key(station_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(key)
+        if state:
+            pipe.hset(key, mapping=self._encode(state))
+            pipe.expire(key, SESSION_STATE_TTL)
+        pipe.sadd(connectors_key, connector_id)
+        pipe.expire(connectors_key, SESSION_STATE_TTL)
+        await pipe.execute()
+        self._cache[(station_id, connector_id)] = dict(state)
+        if station_id in self._connectors:
+            self._connectors[station_id].add(connector_id)
+
+    async def pop(self, station_id: str, connector_id: int) -> dict | None:
+        state = await self.get(station_id, connector_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(self._key(station_id, connector_id))
+        pipe.srem(self._connectors_key(station_id), connector_id)
+        await pipe.execute()
+        self._cache.pop((station_id, connector_id), None)
+        if station_id in self._connectors:
+            self._connectors[station_id].discard(connector_id)
+        return state
+
+    def evict(self, station_id: str) -> None:
+        # Сброс локального кэша при отключении станции: она может переподключиться к другому процессу
+        self._connectors.pop(station_id, None)
+        for key in [k for k in self._cache if k[0] == station_id]:
+            del self._cache[key]
+
+session_store = SessionStateStore(redis_manager.redis)
@@ -0,0 +1,39 @@
+# transaction_ids.py
+# Выдача уникальных OCPP transactionId для нескольких процессов/узлов.
+# Каждый процесс резервирует блок id одним nextval из последовательности Postgres и раздаёт его локально.
+# Если Postgres недоступен — запасной id из счётчика Redis в отдельном диапазоне, не пересекающемся с последовательностью.
+import asyncio
+from sqlalchemy import select
+from app.db.session import async_engine
+from app.db.models.ocpp import transaction_id_seq, TRANSACTION_ID_BLOCK_SIZE
+from ocpp_ws_server.redis_manager import redis_manager
+
+# transactionId в OCPP 1.6 — int32: последовательность выдаёт id ниже FALLBACK_BASE, запасные — выше
+FALLBACK_TRANSACTION_ID_BASE = 2_000_000_000
+FALLBACK_COUNTER_KEY = "ocpp:transaction_id_fallback"
+
+class TransactionIdAllocator:
+    def __init__(self, block_size: int = TRANSACTION_ID_BLOCK_SIZE):
+        # block_size должен совпадать с INCREMENT последовательности
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def _reserve_block(self) -> None:
+        async with async_engine.connect() as conn:
+            start = (await conn.execute(select(transaction_id_seq.next_value()))).scalar_one()
+        self._next, self._end = start, start + self.block_size
+
+    async def allocate(self) -> int:
+        async with self._lock:
+            if self._next >= self._end:
+                await self._reserve_block()
+            transaction_id = self._next
+            self._next += 1
+            return transaction_id
+
+    async def allocate_fallback(self) -> int:
+        return FALLBACK_TRANSACTION_ID_BASE + await redis_manager.redis.incr(FALLBACK_COUNTER_KEY)
+
+transaction_id_allocator = TransactionIdAllocator()
@@ -0,0 +1,131 @@
+# EXPLAIN ANALYZE горячих запросов CRUD до и после индексов из миграции alembic/versions/0001.
+# Режим --compare удаляет индексы миграции внутри транзакции (план «до»), затем делает ROLLBACK
+# и снимает план «после». DROP INDEX берёт эксклюзивную блокировку таблиц — только для тестовой/staging БД.
+# Запуск из папки backend:
+#   python scripts/explain_hot_queries.py --seed 1000000 --compare   # пустая тестовая БД
+#   python scripts/explain_hot_queries.py                           # только текущие планы
+import argparse
+import importlib.util
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from app.db.session import engine
+from app.db.models.ocpp import ChargingSession, ChargingSessionStatus
+from app.db.models.station import Station
+from app.db.models.maintenance import Maintenance
+from app.db.models.location import Location, LocationStatus
+from app.db.models.user import User, UserRole
+from app.crud.ocpp import active_tariff_query
+from app.crud.pagination import keyset_query, DEFAULT_PAGE_SIZE
+
+MIGRATION_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic", "versions", "0001_hot_query_indexes.py")
+
+SEED_SQL = [
+    "INSERT INTO users (id, email, hashed_password, role, is_active, admin_id) "
+    "SELECT 'bench-admin-' || g, 'bench-admin-' || g || '@example.com', '-', 'admin', true, NULL FROM generate_series(1, :admins) g",
+    "INSERT INTO users (id, email, hashed_password, role, is_active, admin_id) "
+    "SELECT 'bench-user-' || g, 'bench-user-' || g || '@example.com', '-', 'operator', true, 'bench-admin-' || (g % :admins + 1) "
+    "FROM generate_series(1, :users) g",
+    "INSERT INTO locations (id, name, address, status) "
+    "SELECT 'bench-loc-' || g, 'loc ' || g, 'addr', CASE WHEN g % 10 = 0 THEN 'inactive' ELSE 'active' END::locationstatus "
+    "FROM generate_series(1, :stations) g",
+    "INSERT INTO stations (id, serial_number, model, manufacturer, location_id, power_capacity, connector_types, status, admin_id) "
+    "SELECT 'bench-st-' || g, 'bench-st-' || g, 'm', 'm', 'bench-loc-' || g, 50, '{Type2}', 'active', 'bench-admin-' || (g % :admins + 1) "
+    "FROM generate_series(1, :stations) g",
+    "INSERT INTO tariffs (id, station_id, price_per_kwh, currency, created_at) "
+    "SELECT 'bench-tariff-' || g, 'bench-st-' || (g % :stations + 1), 10 + g % 5, 'KGS', now() - (g || ' minutes')::interval "
+    "FROM generate_series(1, :stations * 5) g",
+    "INSERT INTO maintenance (id, station_id, description, status) "
+    "SELECT 'bench-mnt-' || g, 'bench-st-' || (g % :stations + 1), 'bench', 'pending' FROM generate_series(1, :stations * 3) g",
+    "INSERT INTO charging_sessions (id, user_id, station_id, start_time, stop_time, energy, amount, status, limit_type, created_at) "
+    "SELECT 'bench-cs-' || g, 'bench-user-' || (g % :users + 1), 'bench-st-' || (g % :stations + 1), "
+    "now() - (g || ' seconds')::interval, now() - (g || ' seconds')::interval + interval '40 minutes', 10, 100, "
+    "CASE WHEN g % 500 = 0 THEN 'started' ELSE 'stopped' END::chargingsessionstatus, 'none', now() - (g || ' seconds')::interval "
+    "FROM generate_series(1, :sessions) g",
+]
+
+def seed(sessions: int) -> None:
+    params = {"sessions": sessions, "stations": max(sessions // 1000, 10), "users": max(sessions // 100, 10), "admins": 20}
+    with engine.begin() as conn:
+        for statement in SEED_SQL:
+            conn.execute(text(statement), params)
+        conn.execute(text("ANALYZE"))
+    print(f"Сгенерировано: {params}")
+
+def sample_params(conn) -> dict:
+    # Реальные значения из БД, чтобы планы соответствовали распределению данных
+    def one(sql):
+        return conn.execute(text(sql)).scalar()
+    return {
+        "admin_id": one("SELECT admin_id FROM stations WHERE admin_id IS NOT NULL GROUP BY admin_id ORDER BY count(*) DESC LIMIT 1"),
+        "station_id": one("SELECT station_id FROM charging_sessions GROUP BY station_id ORDER BY count(*) DESC LIMIT 1"),
+        "user_id": one("SELECT user_id FROM charging_sessions GROUP BY user_id ORDER BY count(*) DESC LIMIT 1"),
+    }
+
+def hot_queries(params: dict) -> dict:
+    # Те же запросы, что строят CRUD-модули
+    return {
+        "get_user_station_ids (admin)": select(Station.id).where(Station.admin_id == params["admin_id"]),
+        "stations page (admin)": keyset_query(
+            select(Station).where(Station.admin_id == params["admin_id"]), Station.created_at, Station.id, DEFAULT_PAGE_SIZE),
+        "active tariff": active_tariff_query(params["station_id"]),
+        "maintenance page by admin": keyset_query(
+            select(Maintenance).where(Maintenance.station_id.in_(select(Station.id).where(Station.admin_id == params["admin_id"]))),
+            Maintenance.created_at, Maintenance.id, DEFAULT_PAGE_SIZE),
+        "sessions page by station": keyset_query(
+            select(ChargingSession).where(ChargingSession.station_id == params["station_id"]),
+            ChargingSession.created_at, ChargingSession.id, DEFAULT_PAGE_SIZE),
+        "sessions page by user": keyset_query(
+            select(ChargingSession).where(ChargingSession.user_id == params["user_id"]),
+            ChargingSession.created_at, ChargingSession.id, DEFAULT_PAGE_SIZE),
+        "active sessions at station": select(ChargingSession).where(
+            ChargingSession.station_id == params["station_id"], ChargingSession.status == ChargingSessionStatus.started),
+        "locations page (active)": keyset_query(
+            select(Location).where(Location.status == LocationStatus.active), Location.created_at, Location.id, DEFAULT_PAGE_SIZE),
+        "operators page by admin": keyset_query(
+            select(User).where(User.role == UserRole.operator, User.admin_id == params["admin_id"]), User.created_at, User.id, DEFAULT_PAGE_SIZE),
+    }
+
+def explain(conn, stmt) -> list[str]:
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    return [row[0] for row in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))]
+
+def print_plans(title: str, plans: dict) -> None:
+    print(f"\n===== {title} =====")
+    for name, lines in plans.items():
+        print(f"\n--- {name}")
+        for line in lines:
+            print(f"  {line}")
+
+def migration_indexes() -> list[str]:
+    spec = importlib.util.spec_from_file_location("hot_query_indexes", MIGRATION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return [name for name, _, _, _ in module.HOT_INDEXES]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Планы горячих запросов до/после индексов")
+    parser.add_argument("--seed", type=int, help="Сгенерировать N сессий (и связанные данные) в ПУСТОЙ тестовой БД")
+    parser.add_argument("--compare", action="store_true", help="Показать планы без индексов миграции 0001 и с ними")
+    args = parser.parse_args()
+    if args.seed:
+        seed(args.seed)
+    with engine.connect() as conn:
+        params = sample_params(conn)
+        queries = hot_queries(params)
+        if args.compare:
+            for name in migration_indexes():
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            before = {name: explain(conn, stmt) for name, stmt in queries.items()}
+            conn.rollback()
+            print_plans("Без индексов 0001", before)
+        after = {name: explain(conn, stmt) for name, stmt in queries.items()}
+        print_plans("С индексами", after)
+        conn.rollback()
+
+if __name__ == "__main__":
+    main()
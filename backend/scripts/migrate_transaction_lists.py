@@ -0,0 +1,108 @@
+# Перенос истории транзакций из старых списков ocpp:transactions:<station_id> в потоки ocpp:tx:*.
+# Старые записи получают id потока по своему created_at и встают перед уже записанными в поток;
+# поток пересобирается во временном ключе и подменяется атомарно (Lua), новые записи не теряются.
+# Готовые ключи отмечаются в ocpp:tx:backfill — повторный запуск после сбоя не дублирует записи.
+# Запуск из папки backend: python scripts/migrate_transaction_lists.py [--keep-lists]
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocpp_ws_server.redis_manager import redis_manager, TRANSACTIONS_STREAM, TRANSACTIONS_STREAM_MAXLEN
+
+LEGACY_PREFIX = "ocpp:transactions:"
+DONE_KEY = "ocpp:tx:backfill"
+COPY_BATCH = 1000
+
+# Дописать во временный поток записи, появившиеся после last_id, и подменить им основной
+SWAP_STREAM_SCRIPT = """
+local rest = redis.call('XRANGE', KEYS[2], '(' .. ARGV[1], '+')
+for _, entry in ipairs(rest) do
+    redis.call('XADD', KEYS[1], entry[1], unpack(entry[2]))
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+return #rest
+"""
+
+def _entry_ms(transaction: dict) -> int:
+    # created_at пишется как datetime.utcnow().isoformat(); без него — в начало потока (id 0-0 Redis не принимает)
+    try:
+        created = datetime.fromisoformat(transaction["created_at"])
+    except (KeyError, TypeError, ValueError):
+        return 1
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return max(1, int(created.timestamp() * 1000))
+
+def _assign_ids(entries: list[tuple[int, dict]], first_id: str | None) -> list[tuple[str, dict]]:
+    # Возрастающие id <ms>-<seq>, строго меньше первой записи потока
+    limit_ms = int(first_id.split("-")[0]) if first_id else None
+    result, last_ms, seq = [], -1, 0
+    for ms, fields in sorted(entries, key=lambda item: item[0]):
+        if limit_ms is not None and ms >= limit_ms:
+            ms = limit_ms - 1
+        ms = max(ms, last_ms)
+        seq = seq + 1 if ms == last_ms else 0
+        last_ms = ms
+        result.append((f"{ms}-{seq}", fields))
+    return result
+
+async def _rebuild_stream(key: str, entries: list[tuple[int, dict]]) -> int:
+    redis = redis_manager.redis
+    if not entries or await redis.hexists(DONE_KEY, key):
+        return 0
+    first = await redis.xrange(key, count=1)
+    tmp = f"{key}:backfill"
+    await redis.delete(tmp)
+    pipe = redis.pipeline(transaction=False)
+    for entry_id, fields in _assign_ids(entries, first[0][0] if first else None):
+        pipe.xadd(tmp, fields, id=entry_id)
+    await pipe.execute()
+    # Текущие записи потока копируются с теми же id (курсоры клиентов остаются валидными)
+    last_id = "0-0"
+    while True:
+        batch = await redis.xrange(key, min=f"({last_id}", count=COPY_BATCH)
+        if not batch:
+            break
+        pipe = redis.pipeline(transaction=False)
+        for entry_id, fields in batch:
+            pipe.xadd(tmp, fields, id=entry_id)
+        await pipe.execute()
+        last_id = batch[-1][0]
+    await redis.eval(SWAP_STREAM_SCRIPT, 2, tmp, key, last_id)
+    await redis.xtrim(key, maxlen=TRANSACTIONS_STREAM_MAXLEN, approximate=True)
+    await redis.hset(DONE_KEY, key, len(entries))
+    return len(entries)
+
+async def migrate(keep_lists: bool = False) -> None:
+    redis = redis_manager.redis
+    legacy_keys = [key async for key in redis.scan_iter(match=f"{LEGACY_PREFIX}*", count=COPY_BATCH)]
+    all_entries = []
+    for key in sorted(legacy_keys):
+        station_id = key[len(LEGACY_PREFIX):]
+        station_entries = []
+        for raw in await redis.lrange(key, 0, -1):
+            try:
+                ms = _entry_ms(json.loads(raw))
+            except ValueError:
+                print(f"{key}: пропущена некорректная запись")
+                continue
+            station_entries.append((ms, {"data": raw}))
+            all_entries.append((ms, {"station_id": station_id, "data": raw}))
+        copied = await _rebuild_stream(f"ocpp:tx:station:{station_id}", station_entries)
+        print(f"{key}: {copied} записей")
+    copied = await _rebuild_stream(TRANSACTIONS_STREAM, all_entries)
+    print(f"{TRANSACTIONS_STREAM}: {copied} записей")
+    if legacy_keys and not keep_lists:
+        await redis.delete(*legacy_keys)
+    await redis.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенос истории транзакций из списков Redis в потоки")
+    parser.add_argument("--keep-lists", action="store_true", help="Не удалять старые списки ocpp:transactions:*")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.keep_lists))
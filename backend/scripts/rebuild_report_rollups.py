@@ -0,0 +1,52 @@
+# Полный (или начиная с --since) пересчёт таблиц report_rollups_hourly/daily по charging_sessions.
+# Нужен после первого деплоя агрегатов и после ручных правок сессий в БД.
+# Запуск из папки backend: python scripts/rebuild_report_rollups.py [--since 2024-01-01]
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.db.session import engine
+from app.crud.reports_async import REPORT_TIMEZONE
+
+ROLLUP_TABLES = {"hour": "report_rollups_hourly", "day": "report_rollups_daily"}
+
+REBUILD_SQL = """
+INSERT INTO {table} (station_id, bucket_start, sessions, energy, revenue)
+SELECT cs.station_id,
+       date_trunc(:unit, cs.stop_time AT TIME ZONE :tz) AT TIME ZONE :tz AS bucket_start,
+       count(*),
+       coalesce(sum(cs.energy), 0),
+       coalesce(sum(cs.amount), 0)
+FROM charging_sessions cs
+WHERE cs.status = 'stopped' AND cs.stop_time IS NOT NULL {since_filter}
+GROUP BY cs.station_id, 2
+"""
+
+def rebuild(since: str | None = None) -> None:
+    tz = REPORT_TIMEZONE.key
+    with engine.begin() as conn:
+        for unit, table in ROLLUP_TABLES.items():
+            # Блокируем инкрементальные обновления на время пересчёта: они дождутся коммита
+            conn.execute(text(f"LOCK TABLE {table} IN EXCLUSIVE MODE"))
+            params = {"unit": unit, "tz": tz}
+            if since:
+                params["since"] = since
+                conn.execute(
+                    text(f"DELETE FROM {table} WHERE bucket_start >= date_trunc(:unit, CAST(:since AS timestamp)) AT TIME ZONE :tz"),
+                    params,
+                )
+                since_filter = "AND cs.stop_time >= date_trunc(:unit, CAST(:since AS timestamp)) AT TIME ZONE :tz"
+            else:
+                conn.execute(text(f"DELETE FROM {table}"))
+                since_filter = ""
+            result = conn.execute(text(REBUILD_SQL.format(table=table, since_filter=since_filter)), params)
+            print(f"{table}: {result.rowcount} интервалов")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчёт агрегатов для отчётов")
+    parser.add_argument("--since", help="Пересчитать начиная с даты (YYYY-MM-DD, в REPORT_TIMEZONE)")
+    args = parser.parse_args()
+    rebuild(args.since)